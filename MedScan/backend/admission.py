@@ -0,0 +1,109 @@
+"""Control de admisión por carriles para las peticiones de extracción.
+
+Cada carril limita cuántos documentos se procesan a la vez y cuántos pueden
+esperar turno. Con la cola llena la petición se rechaza al momento con una
+estimación de cuándo reintentar, en lugar de quedarse esperando detrás de
+todo lo anterior. Los documentos baratos y los que necesitan OCR van por
+carriles separados para que un escaneo largo no retrase a los pequeños.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+class Overloaded(Exception):
+    """El carril está saturado: la petición se rechaza sin encolarla."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Servidor saturado (carril {lane}); reintenta en {retry_after} s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    """Carril con un límite de documentos en proceso y una cola de espera acotada."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, initial_seconds: float = 1.0):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Media móvil del tiempo de servicio, para estimar Retry-After
+        self.service_seconds = initial_seconds
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def full(self) -> bool:
+        return self.semaphore.locked() and self.waiting >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se libere un hueco para una petición nueva."""
+        rounds = (self.waiting + 1) / self.concurrency
+        return max(1, math.ceil(rounds * self.service_seconds))
+
+    def record(self, seconds: float):
+        self.service_seconds = 0.8 * self.service_seconds + 0.2 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "activos": self.active,
+            "en_cola": self.waiting,
+            "limite": self.concurrency,
+            "max_cola": self.max_queue,
+            "admitidas": self.admitted,
+            "rechazadas": self.rejected,
+            "servicio_medio_s": self.service_seconds,
+        }
+
+
+class AdmissionController:
+    """Reparte las peticiones entre carriles y rechaza las que no caben."""
+
+    def __init__(self, lanes: Dict[str, Lane]):
+        self.lanes = dict(lanes)
+
+    def check(self, lane_name: str):
+        """Lanza Overloaded si el carril no admite más peticiones, sin ocupar ningún hueco."""
+        lane = self.lanes[lane_name]
+        if lane.full():
+            lane.rejected += 1
+            raise Overloaded(lane.name, lane.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, lane_name: str, wait: bool = False) -> AsyncIterator[None]:
+        """Ocupa un hueco del carril mientras dura el bloque.
+
+        Lanza Overloaded si no hay hueco y la cola está llena. Con `wait=True`
+        se espera turno sin límite de cola (para trabajos en segundo plano y
+        archivos de un lote ya admitido, que tienen su propio límite).
+        """
+        lane = self.lanes[lane_name]
+        if not wait:
+            self.check(lane_name)
+        lane.waiting += 1
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+        lane.active += 1
+        lane.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.active -= 1
+            lane.semaphore.release()
+            lane.record(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
@@ -0,0 +1,275 @@
+"""Cachés de resultados: LRU en memoria y almacén persistente en SQLite."""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """Estima en bytes la memoria ocupada por un resultado (dicts, listas y escalares)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class Cache:
+    """Caché LRU con TTL en tiempo constante.
+
+    Las entradas se guardan en un OrderedDict en orden de uso (LRU) y en otro en
+    orden de inserción; como el TTL es fijo, el segundo está ordenado por
+    vencimiento y la purga solo recorre las entradas ya vencidas.
+    """
+
+    def __init__(self, max_size: int = 100, ttl_hours: float = 24, max_bytes: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        # clave -> (valor, vencimiento, tamaño)
+        self._entries: "OrderedDict[str, Tuple[Dict, float, int]]" = OrderedDict()
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Dict):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # Un resultado más grande que todo el presupuesto no se guarda
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl
+            self._entries[key] = (value, expires_at, size)
+            self._expiry[key] = expires_at
+            self._bytes += size
+            while len(self._entries) > self.max_size or self._bytes > self.max_bytes:
+                # Eliminar la entrada usada hace más tiempo
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas vencidas y devuelve cuántas se eliminaron."""
+        now = time.monotonic()
+        purged = 0
+        with self._lock:
+            while self._expiry:
+                key, expires_at = next(iter(self._expiry.items()))
+                if expires_at > now:
+                    break
+                self._remove(key)
+                purged += 1
+            self.expirations += purged
+        return purged
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        del self._expiry[key]
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los contadores de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entradas": len(self._entries),
+                "bytes": self._bytes,
+                "max_entradas": self.max_size,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "desalojos": self.evictions,
+                "expiraciones": self.expirations,
+                "tasa_aciertos": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SQLiteCache:
+    """Caché persistente en SQLite compartida por todos los workers del host.
+
+    Usa modo WAL para que varios procesos lean y escriban a la vez, y aplica el
+    mismo TTL y los mismos límites de entradas y bytes que `Cache`. Como los
+    datos sobreviven a los reinicios, un despliegue no empieza con la caché fría.
+
+    Todas las operaciones son E/S bloqueante: desde la aplicación se ejecutan en
+    el pool de E/S (ver `TieredCache`). Los límites se aplican en `compact`, que
+    se llama periódicamente en segundo plano y no en cada escritura.
+    """
+
+    def __init__(self, path: str, max_size: int = 10000, ttl_hours: float = 24,
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        # Entradas y bytes de la tabla, llevados con las operaciones de este worker;
+        # cada compactación los recalcula e incorpora las de los demás workers
+        self.entries, self.bytes = self._totals()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _totals(self) -> Tuple[int, int]:
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at, size FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= now:
+                if self._conn.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount:
+                    self.entries -= 1
+                    self.bytes -= row[2]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, data, now + self.ttl, now, len(data)),
+            )
+            if previous is None:
+                self.entries += 1
+            else:
+                self.bytes -= previous[0]
+            self.bytes += len(data)
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas vencidas y aplica los límites; devuelve cuántas vencieron."""
+        return self.compact()
+
+    def compact(self) -> int:
+        """Elimina entradas vencidas, desaloja las menos usadas y recupera espacio del archivo."""
+        with self._lock:
+            expired = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            self.expirations += expired
+            count, total = self._totals()
+            if count > self.max_size or total > self.max_bytes:
+                # Recorrer de la menos usada a la más usada hasta volver a los límites
+                to_delete = []
+                for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                    if count <= self.max_size and total <= self.max_bytes:
+                        break
+                    to_delete.append((key,))
+                    count -= 1
+                    total -= size
+                self._conn.executemany("DELETE FROM cache WHERE key = ?", to_delete)
+                self.evictions += len(to_delete)
+            self.entries, self.bytes = count, total
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los contadores de uso de la caché (los aciertos son de este worker)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entradas": self.entries,
+                "bytes": self.bytes,
+                "max_entradas": self.max_size,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "desalojos": self.evictions,
+                "expiraciones": self.expirations,
+                "tasa_aciertos": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TieredCache:
+    """Caché de dos niveles: memoria del worker delante de la caché persistente.
+
+    El nivel persistente hace E/S bloqueante, así que sus operaciones se pasan
+    a `run(func, *args)`, que las ejecuta fuera del event loop (en la aplicación,
+    en el pool de E/S). Sin nivel persistente es solo la caché en memoria.
+    """
+
+    def __init__(self, memory: Cache, persistent: Optional[SQLiteCache] = None,
+                 run: Optional[Callable[..., Awaitable[Any]]] = None):
+        if persistent is not None and run is None:
+            raise ValueError("La caché persistente necesita una función para ejecutar sus operaciones")
+        self.memory = memory
+        self.persistent = persistent
+        self.run = run
+
+    async def get(self, key: str) -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            value = await self.run(self.persistent.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Dict):
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            await self.run(self.persistent.set, key, value)
+
+    async def purge_expired(self) -> int:
+        purged = self.memory.purge_expired()
+        if self.persistent is not None:
+            purged += await self.run(self.persistent.purge_expired)
+        return purged
+
+    def stats(self) -> Dict[str, Any]:
+        if self.persistent is None:
+            return self.memory.stats()
+        return {"memoria": self.memory.stats(), "persistente": self.persistent.stats()}
@@ -0,0 +1,128 @@
+"""Capa de ejecución para sacar el trabajo bloqueante del event loop.
+
+El trabajo de CPU (OCR, lectura de PDF) se envía a un pool de procesos y el
+trabajo ligero o de E/S (reglas, llamadas bloqueantes) a un pool de hilos. Cada
+etapa tiene su propio límite de concurrencia para que una etapa saturada no
+acapare los trabajadores de las demás.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .ocr import warm_up as warm_up_ocr
+
+logger = logging.getLogger(__name__)
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 1))
+IO_WORKERS = int(os.getenv("IO_WORKERS", 16))
+# "process" usa un pool de procesos para el trabajo de CPU; "thread" lo ejecuta
+# en hilos (útil en desarrollo o donde no se pueden crear procesos).
+EXECUTOR_MODE = os.getenv("EXECUTOR_MODE", "process")
+
+# Etapa -> (tipo de pool, límite de concurrencia)
+STAGES: Dict[str, Tuple[str, int]] = {
+    "pdf": ("cpu", int(os.getenv("PDF_CONCURRENCY", CPU_WORKERS))),
+    "ocr": ("cpu", int(os.getenv("OCR_CONCURRENCY", CPU_WORKERS))),
+    "rules": ("io", int(os.getenv("RULES_CONCURRENCY", CPU_WORKERS))),
+    "history": ("io", int(os.getenv("HISTORY_CONCURRENCY", 2))),
+    "cache": ("io", int(os.getenv("CACHE_CONCURRENCY", 4))),
+}
+
+
+class ExecutionLayer:
+    """Ejecuta funciones bloqueantes en pools con límites por etapa."""
+
+    def __init__(self, stages: Dict[str, Tuple[str, int]], cpu_workers: int = CPU_WORKERS,
+                 io_workers: int = IO_WORKERS, mode: str = EXECUTOR_MODE,
+                 initializer: Optional[Callable[[], None]] = None):
+        self.stages = dict(stages)
+        # Se ejecuta al arrancar cada trabajador de CPU (p. ej. para cargar los motores de OCR)
+        self.initializer = initializer
+        self.cpu_workers = max(1, cpu_workers)
+        self.io_workers = max(1, io_workers)
+        self.mode = mode
+        self._cpu_pool: Optional[Executor] = None
+        self._cpu_pool_lock = threading.Lock()
+        self._io_pool: Optional[Executor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._active: Dict[str, int] = {name: 0 for name in self.stages}
+        self._waiting: Dict[str, int] = {name: 0 for name in self.stages}
+
+    def start(self):
+        """Crea los pools y los semáforos de cada etapa."""
+        if self._cpu_pool is None:
+            self._cpu_pool = self._new_cpu_pool()
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="medscan-io")
+        for name, (_, limit) in self.stages.items():
+            self._semaphores[name] = asyncio.Semaphore(max(1, limit))
+        logger.info(f"Capa de ejecución iniciada (modo={self.mode}, cpu={self.cpu_workers}, io={self.io_workers})")
+
+    def shutdown(self):
+        """Libera los pools de trabajo."""
+        for pool in (self._cpu_pool, self._io_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._cpu_pool = None
+        self._io_pool = None
+
+    def _new_cpu_pool(self) -> Executor:
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix="medscan-cpu",
+                                      initializer=self.initializer)
+        return ProcessPoolExecutor(max_workers=self.cpu_workers, initializer=self.initializer)
+
+    async def run(self, stage: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta `func` en el pool de la etapa respetando su límite de concurrencia."""
+        if stage not in self.stages:
+            raise KeyError(f"Etapa desconocida: {stage}")
+        if self._cpu_pool is None or self._io_pool is None:
+            self.start()
+        kind = self.stages[stage][0]
+        call = functools.partial(func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores[stage]
+        self._waiting[stage] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[stage] -= 1
+        self._active[stage] += 1
+        pool = self._cpu_pool if kind == "cpu" else self._io_pool
+        try:
+            return await loop.run_in_executor(pool, call)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. por falta de memoria); se recrea el pool
+            self._replace_cpu_pool(pool, stage)
+            raise
+        finally:
+            self._active[stage] -= 1
+            semaphore.release()
+
+    def _replace_cpu_pool(self, broken: Executor, stage: str):
+        """Sustituye el pool de procesos roto y libera el anterior.
+
+        Todas las llamadas en curso fallan a la vez cuando el pool se rompe;
+        solo la primera lo sustituye, las demás ven que ya no es el actual.
+        """
+        with self._cpu_pool_lock:
+            if broken is not self._cpu_pool:
+                return
+            logger.error(f"Pool de procesos roto en la etapa '{stage}', recreándolo")
+            self._cpu_pool = self._new_cpu_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Devuelve la ocupación actual de cada etapa."""
+        return {
+            name: {"activos": self._active[name], "en_cola": self._waiting[name], "limite": limit}
+            for name, (_, limit) in self.stages.items()
+        }
+
+
+execution = ExecutionLayer(STAGES, initializer=warm_up_ocr)
@@ -0,0 +1,264 @@
+"""Funciones de extracción de texto que se ejecutan fuera del event loop.
+
+Este módulo no depende de FastAPI para que los procesos del pool de trabajo
+puedan importarlo sin levantar la aplicación completa. PyMuPDF y Pillow se
+importan dentro de las funciones: el proceso principal solo envía el trabajo a
+los trabajadores y así arranca sin cargarlos.
+"""
+import io
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .ocr import image_to_text
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Versión del extractor; cambiarla invalida los resultados en caché
+EXTRACTOR_VERSION = "3"
+
+# Límite de páginas por documento y parámetros del OCR de páginas escaneadas
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 50))
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", 20))
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", 300))
+
+# Preprocesamiento de imágenes antes del OCR
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") == "1"
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+OCR_PAGE_WIDTH_IN = float(os.getenv("OCR_PAGE_WIDTH_IN", 8.27))  # ancho de página supuesto (A4)
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "1") == "1"
+OCR_DESKEW = os.getenv("OCR_DESKEW", "1") == "1"
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5))  # grados
+OCR_DESKEW_STEP = float(os.getenv("OCR_DESKEW_STEP", 0.5))  # grados
+OCR_CROP = os.getenv("OCR_CROP", "1") == "1"
+OCR_CROP_MARGIN = int(os.getenv("OCR_CROP_MARGIN", 20))  # píxeles
+
+# Lado de la miniatura con la que se estima la inclinación
+_DESKEW_SIZE = 800
+# Media de una fila o columna a partir de la cual se considera borde y no texto (50 % de tinta)
+_DENSE_INK = 128
+
+
+def pdf_text_layer(contents: bytes,
+                   max_pages: int = PDF_MAX_PAGES) -> Tuple[int, List[Optional[str]], Dict[int, bytes]]:
+    """Lee la capa de texto de cada página del PDF.
+
+    Devuelve el número total de páginas, el texto de cada una y, para las
+    páginas sin capa de texto (escaneadas, marcadas con None), un PDF con solo
+    esa página. Así el OCR de cada página recibe y abre esa página y no el
+    documento entero. Si el documento supera `max_pages` no se lee ninguna página.
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=contents, filetype="pdf")
+    try:
+        page_count = doc.page_count
+        if page_count > max_pages:
+            return page_count, [], {}
+        pages: List[Optional[str]] = []
+        scanned: Dict[int, bytes] = {}
+        for page in doc:
+            text = page.get_text()
+            if len(text.strip()) >= PDF_MIN_TEXT_CHARS:
+                pages.append(text)
+                continue
+            pages.append(None)
+            single = fitz.open()
+            try:
+                # Copia solo los objetos que usa la página (su imagen, sus fuentes)
+                single.insert_pdf(doc, from_page=page.number, to_page=page.number)
+                scanned[page.number] = single.tobytes()
+            finally:
+                single.close()
+        return page_count, pages, scanned
+    finally:
+        doc.close()
+
+
+def ocr_pdf_page(page_pdf: bytes, dpi: int = PDF_OCR_DPI) -> str:
+    """Renderiza un PDF de una sola página (ver `pdf_text_layer`) y le aplica OCR."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    doc = fitz.open(stream=page_pdf, filetype="pdf")
+    try:
+        pix = doc[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    finally:
+        doc.close()
+    try:
+        return image_to_text(image)
+    finally:
+        image.close()
+
+
+def _otsu_threshold(histogram: List[int]) -> int:
+    """Umbral que mejor separa el histograma en fondo y tinta (método de Otsu)."""
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    weight_dark = 0
+    sum_dark = 0
+    best_threshold, best_variance = 0, -1.0
+    for level, count in enumerate(histogram):
+        weight_dark += count
+        if weight_dark == 0:
+            continue
+        weight_light = total - weight_dark
+        if weight_light == 0:
+            break
+        sum_dark += level * count
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_all - sum_dark) / weight_light
+        variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+
+def _skew_angle(image: "Image.Image", max_angle: float, step: float) -> float:
+    """Estima la inclinación del texto por perfiles de proyección sobre una miniatura.
+
+    Con las líneas de texto horizontales, la tinta se concentra en unas filas y
+    la varianza de la suma por filas es máxima.
+    """
+    from PIL import Image, ImageOps
+
+    ink = ImageOps.invert(image)
+    ink.thumbnail((_DESKEW_SIZE, _DESKEW_SIZE))
+    best_angle, best_score = 0.0, -1.0
+    steps = int(max_angle / step)
+    # De menor a mayor giro: ante un empate (p. ej. una imagen en blanco) no se gira
+    for index in sorted(range(-steps, steps + 1), key=abs):
+        angle = index * step
+        rotated = ink.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True)
+        # Reducir a una columna deja la media de cada fila
+        rows = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).getdata())
+        mean = sum(rows) / len(rows)
+        score = sum((row - mean) ** 2 for row in rows) / len(rows)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def _trim_profile(profile: List[int]) -> Tuple[int, int]:
+    """Descarta desde los extremos las filas o columnas vacías o casi llenas de tinta."""
+    start, end = 0, len(profile)
+    while start < end and (profile[start] == 0 or profile[start] >= _DENSE_INK):
+        start += 1
+    while end > start and (profile[end - 1] == 0 or profile[end - 1] >= _DENSE_INK):
+        end -= 1
+    return start, end
+
+
+def _content_box(ink: "Image.Image") -> Optional[Tuple[int, int, int, int]]:
+    """Caja del texto en una máscara de tinta (255 = tinta).
+
+    Los bordes oscuros de una foto (la mesa alrededor del papel) quedan como
+    franjas casi llenas de tinta en los extremos y se excluyen de la caja. Se
+    recortan columnas y filas dos veces, porque cada borde también añade tinta
+    a los perfiles del otro eje, y al final se ajusta la caja a la tinta.
+    """
+    from PIL import Image
+
+    left, top, right, bottom = 0, 0, ink.width, ink.height
+    for _ in range(2):
+        region = ink.crop((left, top, right, bottom))
+        columns = list(region.resize((region.width, 1), Image.Resampling.BOX).getdata())
+        start, end = _trim_profile(columns)
+        left, right = left + start, left + end
+        if left >= right:
+            return None
+        region = ink.crop((left, top, right, bottom))
+        rows = list(region.resize((1, region.height), Image.Resampling.BOX).getdata())
+        start, end = _trim_profile(rows)
+        top, bottom = top + start, top + end
+        if top >= bottom:
+            return None
+    inner = ink.crop((left, top, right, bottom)).getbbox()
+    if inner is None:
+        return None
+    return left + inner[0], top + inner[1], left + inner[2], top + inner[3]
+
+
+def preprocess_image(image: "Image.Image", target_dpi: int = OCR_TARGET_DPI, binarize: bool = OCR_BINARIZE,
+                     deskew: bool = OCR_DESKEW, crop: bool = OCR_CROP,
+                     timings: Optional[Dict[str, float]] = None) -> "Image.Image":
+    """Prepara una foto o escaneo para el OCR.
+
+    Reduce la imagen a `target_dpi` suponiendo una página de OCR_PAGE_WIDTH_IN
+    pulgadas de ancho, la pasa a escala de grises y, según la configuración, la
+    binariza, corrige la inclinación y la recorta al contenido. Si se pasa
+    `timings`, guarda ahí los segundos de cada etapa.
+    """
+    from PIL import Image, ImageOps
+
+    def mark(stage: str, start: float) -> float:
+        now = time.perf_counter()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + now - start
+        return now
+
+    start = time.perf_counter()
+    target_width = int(target_dpi * OCR_PAGE_WIDTH_IN)
+    short_side = min(image.size)
+    if image.format == "JPEG" and short_side > target_width:
+        # El decodificador JPEG puede reducir 2, 4 u 8 veces y dar grises directamente
+        image.draft("L", (target_width, target_width))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+    short_side = min(image.size)
+    if short_side > target_width:
+        scale = target_width / short_side
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    start = mark("escala_grises", start)
+
+    threshold = None
+    if binarize:
+        threshold = _otsu_threshold(image.histogram())
+        image = image.point([0 if level <= threshold else 255 for level in range(256)])
+        start = mark("binarizacion", start)
+
+    if deskew:
+        angle = _skew_angle(image, OCR_DESKEW_MAX_ANGLE, OCR_DESKEW_STEP)
+        if angle:
+            image = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+        start = mark("enderezado", start)
+
+    if crop:
+        if threshold is None:
+            threshold = _otsu_threshold(image.histogram())
+        box = _content_box(image.point([255 if level <= threshold else 0 for level in range(256)]))
+        if box:
+            left, top, right, bottom = box
+            image = image.crop((
+                max(0, left - OCR_CROP_MARGIN),
+                max(0, top - OCR_CROP_MARGIN),
+                min(image.width, right + OCR_CROP_MARGIN),
+                min(image.height, bottom + OCR_CROP_MARGIN),
+            ))
+        mark("recorte", start)
+    return image
+
+
+def image_bytes_to_text(contents: bytes) -> str:
+    """Aplica OCR a una imagen a partir de su contenido en bytes."""
+    from PIL import Image
+
+    source = Image.open(io.BytesIO(contents))
+    image = source
+    try:
+        if OCR_PREPROCESS:
+            image = preprocess_image(source)
+        return image_to_text(image)
+    finally:
+        image.close()
+        source.close()
+
+
+def check_pdf_engine() -> str:
+    """Carga PyMuPDF y devuelve su versión (comprobación de arranque)."""
+    import fitz  # PyMuPDF
+
+    return fitz.VersionBind
@@ -0,0 +1,208 @@
+"""Extracción de los campos del encabezado (paciente y datos médicos) en una sola pasada.
+
+Cada campo se describe con una lista de reglas en orden de prioridad. Una regla
+es la tupla (palabras clave, patrón): el patrón debe empezar por alguna de sus
+palabras clave. Al importar el módulo se compilan todos los patrones y una única
+expresión que localiza las palabras clave; así el texto se recorre una vez y
+cada patrón solo se prueba en las posiciones donde puede empezar, en lugar de
+lanzar un `re.search` por patrón sobre el documento completo.
+"""
+import re
+from typing import Dict, List, Pattern, Tuple
+
+Rule = Tuple[Tuple[str, ...], str]
+
+_LETRAS = r"[A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?"
+
+PATRONES_PACIENTE: Dict[str, List[Rule]] = {
+    "nombre": [
+        (("paciente", "nombre"), rf"(?:paciente|nombre)\s*[:=]\s*({_LETRAS})(?=\n|\s*(?:edad|fecha|id|$))"),
+        (("nombre",), rf"nombre\s+del\s+paciente\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("paciente",), rf"paciente\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "edad": [
+        (("edad",), r"(?:edad)\s*[:=]\s*(\d+(?:\s*años)?)"),
+        (("edad",), r"edad\s+del\s+paciente\s*[:=]\s*(\d+(?:\s*años)?)"),
+        (("años",), r"años\s*[:=]\s*(\d+)"),
+    ],
+    "sexo": [
+        (("sexo",), r"(?:sexo)\s*[:=]\s*([MF])"),
+        (("sexo",), r"sexo\s+del\s+paciente\s*[:=]\s*([MF])"),
+        (("genero",), r"genero\s*[:=]\s*([MF])"),
+    ],
+    "fecha": [
+        (("fecha",), r"(?:fecha)\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"),
+        (("fecha",), r"fecha\s+del\s+examen\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"),
+        (("fecha",), r"fecha\s+de\s+muestra\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"),
+    ],
+    "id": [
+        (("id", "identificación", "cedula", "cédula"), r"(?:id|identificación|cedula|cédula)\s*[:=]\s*([A-Z0-9-]+)"),
+        (("historia",), r"historia\s+clínica\s*[:=]\s*([A-Z0-9-]+)"),
+        (("no",), r"no\.?\s*de\s+identificación\s*[:=]\s*([A-Z0-9-]+)"),
+    ],
+}
+
+PATRONES_MEDICOS: Dict[str, List[Rule]] = {
+    "medico": [
+        (("médico", "doctor", "dr"), rf"(?:médico|doctor|dr\.?|dra\.?)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("interpretado",), rf"interpretado\s+por\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("firmado",), rf"firmado\s+por\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "especialidad": [
+        (("especialidad",), rf"(?:especialidad)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("especialista",), rf"especialista\s+en\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "clinica": [
+        (("clínica", "hospital", "centro", "laboratorio"),
+         rf"(?:clínica|hospital|centro|laboratorio)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("institución",), rf"institución\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "numero_registro": [
+        (("registro", "licencia", "matrícula"), r"(?:registro|licencia|matrícula)\s*[:=]\s*([A-Z0-9-]+)"),
+        (("no",), r"no\.?\s*de\s+registro\s*[:=]\s*([A-Z0-9-]+)"),
+    ],
+    "tipo_muestra": [
+        (("tipo", "muestra"), rf"(?:tipo\s+de\s+muestra|muestra)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("material",), rf"material\s+analizado\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "condiciones": [
+        (("condiciones", "estado"), rf"(?:condiciones|estado)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("estado",), rf"estado\s+de\s+la\s+muestra\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+    "metodo_analisis": [
+        (("método", "metodo"), rf"(?:método|metodo)\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+        (("técnica",), rf"técnica\s+utilizada\s*[:=]\s*({_LETRAS})(?=\n|$)"),
+    ],
+}
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Construye una expresión en forma de trie que reconoce la palabra más larga de la lista."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # El final de palabra va después de las continuaciones: gana la más larga
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class FieldMatcher:
+    """Extractor compilado de un conjunto de campos.
+
+    El resultado es el mismo que probar cada patrón con `re.search` en orden de
+    prioridad: para cada campo gana el patrón de mayor prioridad que aparezca, y
+    entre sus apariciones la primera del texto.
+    """
+
+    CHUNK_SIZE = 4096
+
+    def __init__(self, fields: Dict[str, List[Rule]]):
+        self.fields = list(fields)
+        self._patterns = [
+            (field, [re.compile(pattern, re.IGNORECASE) for _, pattern in rules])
+            for field, rules in fields.items()
+        ]
+        by_keyword: Dict[str, List[Tuple[str, int, Pattern]]] = {}
+        for field, rules in fields.items():
+            for priority, (keywords, pattern) in enumerate(rules):
+                compiled = re.compile(pattern, re.IGNORECASE)
+                for keyword in keywords:
+                    by_keyword.setdefault(keyword, []).append((field, priority, compiled))
+
+        # En cada posición el buscador reconoce la palabra clave más larga, así que
+        # una palabra también dispara las reglas de las palabras que son su prefijo
+        # (p. ej. "nombre" dispara las reglas de "no").
+        self._rules: Dict[str, List[Tuple[str, int, Pattern]]] = {}
+        for keyword in by_keyword:
+            self._rules[keyword] = [
+                rule
+                for other, rules in by_keyword.items() if keyword.startswith(other)
+                for rule in rules
+            ]
+
+        # Palabras clave que pueden empezar dentro de otra (p. ej. "id" en
+        # "especialidad"): el buscador las consume, así que se comprueban aparte.
+        keywords = sorted(by_keyword, key=len, reverse=True)
+        self._inner: Dict[str, List[Tuple[int, List[str]]]] = {}
+        for keyword in keywords:
+            for offset in range(1, len(keyword)):
+                tail = keyword[offset:]
+                candidates = [other for other in keywords if other.startswith(tail) or tail.startswith(other)]
+                if candidates:
+                    self._inner.setdefault(keyword, []).append((offset, candidates))
+
+        # Se busca sobre el texto en minúsculas: una expresión sin IGNORECASE y en
+        # forma de trie es un orden de magnitud más rápida que una alternancia.
+        self._keywords = re.compile(_trie_pattern(keywords))
+        self._max_keyword = len(keywords[0])
+
+    def extract(self, text: str) -> Dict[str, str]:
+        """Recorre el texto una vez y devuelve el valor de cada campo ("" si no aparece)."""
+        best: Dict[str, Tuple[int, str]] = {}
+        pending = len(self.fields)  # campos sin coincidencia de prioridad máxima
+        # El texto se pasa a minúsculas por bloques para no convertir el informe
+        # completo cuando todos los campos aparecen en el encabezado. Cada bloque
+        # incluye un margen para las palabras que cruzan su final.
+        margin = 2 * self._max_keyword
+        for chunk_start in range(0, len(text), self.CHUNK_SIZE):
+            window = text[chunk_start:chunk_start + self.CHUNK_SIZE + margin]
+            lowered = window.lower()
+            if len(lowered) != len(window):
+                # Algunos caracteres cambian de longitud al pasar a minúsculas y las
+                # posiciones no coincidirían; se usa la búsqueda patrón por patrón
+                return self._extract_per_pattern(text)
+            for hit in self._keywords.finditer(lowered):
+                keyword, position = hit.group(), hit.start()
+                if position >= self.CHUNK_SIZE:
+                    break
+                hits = [(position, keyword)]
+                for offset, candidates in self._inner.get(keyword, ()):
+                    for candidate in candidates:
+                        if lowered.startswith(candidate, position + offset):
+                            hits.append((position + offset, candidate))
+                            break
+                for start, found_keyword in hits:
+                    for field, priority, pattern in self._rules[found_keyword]:
+                        found = best.get(field)
+                        if found is not None and found[0] <= priority:
+                            continue
+                        match = pattern.match(text, chunk_start + start)
+                        if match:
+                            best[field] = (priority, match.group(1).strip())
+                            if priority == 0:
+                                pending -= 1
+                if not pending:
+                    # Todos los campos ya tienen su mejor patrón; en informes normales
+                    # esto ocurre al terminar el encabezado y no se lee el resto
+                    return self._result(best)
+        return self._result(best)
+
+    def _result(self, best: Dict[str, Tuple[int, str]]) -> Dict[str, str]:
+        return {field: best[field][1] if field in best else "" for field in self.fields}
+
+    def _extract_per_pattern(self, text: str) -> Dict[str, str]:
+        info = {}
+        for field, patterns in self._patterns:
+            info[field] = ""
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match:
+                    info[field] = match.group(1).strip()
+                    break
+        return info
+
+
+patient_matcher = FieldMatcher(PATRONES_PACIENTE)
+medical_matcher = FieldMatcher(PATRONES_MEDICOS)
+# Ambos grupos de campos en una sola pasada, para el procesamiento completo del informe
+header_matcher = FieldMatcher({**PATRONES_PACIENTE, **PATRONES_MEDICOS})
@@ -0,0 +1,337 @@
+"""Historial longitudinal de resultados por paciente, guardado en SQLite.
+
+Cada documento procesado con identificación de paciente guarda sus resultados
+en una tabla agrupada físicamente por (paciente, examen, fecha): la serie de un
+examen de un paciente es un recorrido contiguo del índice primario, así que se
+responde en milisegundos aunque la tabla tenga millones de filas. Los resultados
+fuera de rango tienen además un índice parcial por (paciente, fecha).
+
+Los resúmenes (media, extremos, tendencia anual...) se calculan con NumPy sobre
+columnas enteras en lugar de recorrer las filas en Python. NumPy se importa al
+consultar, no al arrancar.
+"""
+import datetime
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .normalization import convert, normalize_name
+from .responses import row_from_dict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Valores de fuera_rango (NULL si el resultado no tiene rango de referencia)
+BAJO = -1
+NORMAL = 0
+ALTO = 1
+
+_FECHA = re.compile(r"(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})")
+
+
+def parse_date(text: str) -> Optional[str]:
+    """Fecha del informe (dd/mm/aaaa, dd-mm-aa...) en formato ISO, o None si no es válida."""
+    match = _FECHA.search(text or "")
+    if match is None:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    if year < 100:
+        # Dos cifras: del siglo actual salvo que quede en el futuro
+        year += 2000 if year <= datetime.date.today().year % 100 else 1900
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def range_flag(valor: float, minimo: Optional[float], maximo: Optional[float]) -> Optional[int]:
+    if minimo is None and maximo is None:
+        return None
+    if minimo is not None and valor < minimo:
+        return BAJO
+    if maximo is not None and valor > maximo:
+        return ALTO
+    return NORMAL
+
+
+class HistoryStore:
+    """Resultados de exámenes por paciente con consultas de series, fuera de rango y resumen."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documentos ("
+            " clave TEXT PRIMARY KEY,"
+            " paciente TEXT NOT NULL,"
+            " fecha TEXT NOT NULL,"
+            " fecha_estimada INTEGER NOT NULL,"
+            " guardado REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pacientes ("
+            " id TEXT PRIMARY KEY,"
+            " nombre TEXT NOT NULL,"
+            " sexo TEXT NOT NULL,"
+            " actualizado REAL NOT NULL)"
+        )
+        # Sin rowid: las filas se guardan en el orden de la clave primaria
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            " paciente TEXT NOT NULL,"
+            " examen TEXT NOT NULL,"
+            " fecha TEXT NOT NULL,"
+            " documento TEXT NOT NULL,"
+            " orden INTEGER NOT NULL,"
+            " nombre TEXT NOT NULL,"
+            " valor REAL NOT NULL,"
+            " unidad TEXT NOT NULL,"
+            " minimo REAL,"
+            " maximo REAL,"
+            " fuera_rango INTEGER,"
+            " PRIMARY KEY (paciente, examen, fecha, documento, orden)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS resultados_fuera_rango ON resultados (paciente, fecha)"
+            " WHERE fuera_rango != 0"
+        )
+        self.documents = 0
+        self.results = 0
+        self.duplicates = 0
+        self.without_patient = 0
+
+    def record(self, document_key: str, response: Dict[str, Any]) -> int:
+        """Guarda los resultados de un documento procesado; devuelve cuántos se guardaron.
+
+        Los documentos sin identificación de paciente no se guardan y los ya
+        guardados (misma clave) se ignoran. Sin fecha válida en el informe se
+        usa la de hoy y el documento queda marcado como de fecha estimada.
+        """
+        patient_info = response.get("info_paciente") or {}
+        patient = (patient_info.get("id") or "").strip()
+        if not patient:
+            self.without_patient += 1
+            return 0
+        date = parse_date(patient_info.get("fecha", ""))
+        estimated = date is None
+        if estimated:
+            date = datetime.date.today().isoformat()
+        rows = []
+        for order, item in enumerate(response.get("datos_estructurados") or []):
+            # ExamResult (o su lista, si viene de la caché) o un resultado en formato completo
+            _, nombre, valor, unidad, minimo, maximo = row_from_dict(item) if isinstance(item, dict) else item
+            try:
+                valor = float(valor)
+            except (TypeError, ValueError):
+                continue
+            rows.append((patient, normalize_name(nombre), date, document_key, order, nombre, valor,
+                         unidad, minimo, maximo, range_flag(valor, minimo, maximo)))
+        now = time.time()
+        with self._lock:
+            # Un documento ya guardado (p. ej. reprocesado tras un fallo del
+            # modelo) no abre una transacción de escritura
+            if self._conn.execute("SELECT 1 FROM documentos WHERE clave = ?", (document_key,)).fetchone():
+                self.duplicates += 1
+                return 0
+            self._conn.execute("BEGIN")
+            try:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO documentos (clave, paciente, fecha, fecha_estimada, guardado)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (document_key, patient, date, int(estimated), now),
+                ).rowcount
+                if inserted:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO pacientes (id, nombre, sexo, actualizado) VALUES (?, ?, ?, ?)",
+                        (patient, patient_info.get("nombre", ""), patient_info.get("sexo", ""), now),
+                    )
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO resultados (paciente, examen, fecha, documento, orden, nombre,"
+                        " valor, unidad, minimo, maximo, fuera_rango) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not inserted:
+            self.duplicates += 1
+            return 0
+        self.documents += 1
+        self.results += len(rows)
+        return len(rows)
+
+    def _query(self, sql: str, params: Sequence[Any]) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def series(self, patient: str, exam: str, since: Optional[str] = None, until: Optional[str] = None,
+               unit: str = "") -> Dict[str, Any]:
+        """Serie temporal de un examen de un paciente, en una sola unidad.
+
+        Los valores se convierten a `unit` o, si no se indica, a la unidad del
+        resultado más reciente; los que no se pueden convertir se omiten.
+        """
+        rows = self._query(
+            "SELECT fecha, valor, unidad, minimo, maximo, fuera_rango, nombre FROM resultados"
+            " WHERE paciente = ? AND examen = ? AND fecha >= ? AND fecha <= ? ORDER BY fecha, documento, orden",
+            (patient, normalize_name(exam), since or "0000-00-00", until or "9999-99-99"),
+        )
+        if not rows:
+            return {"paciente": patient, "examen": exam, "unidad": unit, "puntos": [], "omitidos": 0, "resumen": None}
+        import numpy as np
+
+        fechas, valores, unidades, minimos, maximos, flags, nombres = zip(*rows)
+        unit = unit or unidades[-1]
+        factors = _conversion_factors(np, [exam] * len(rows), unidades, {exam: unit})
+        valid = ~np.isnan(factors)
+        values = np.asarray(valores, dtype=float) * factors
+        scaled_min = np.asarray(minimos, dtype=float) * factors
+        scaled_max = np.asarray(maximos, dtype=float) * factors
+        days = np.asarray(fechas, dtype="datetime64[D]").astype(np.int64)
+        flag_array = np.asarray([NORMAL if flag is None else flag for flag in flags])
+        summary = [None]
+        if valid.any():
+            summary = _aggregate(np, values[valid], days[valid], flag_array[valid], np.array([0]))
+        puntos = [
+            {
+                "fecha": fechas[index],
+                "valor": float(values[index]),
+                "min": _optional(scaled_min[index]),
+                "max": _optional(scaled_max[index]),
+                "fuera_rango": flags[index],
+                "examen": nombres[index],
+            }
+            for index in np.flatnonzero(valid).tolist()
+        ]
+        return {
+            "paciente": patient,
+            "examen": exam,
+            "unidad": unit,
+            "puntos": puntos,
+            "omitidos": int(len(rows) - valid.sum()),
+            "resumen": summary[0],
+        }
+
+    def out_of_range(self, patient: str, since: Optional[str] = None, until: Optional[str] = None,
+                     limit: int = 500) -> List[Dict[str, Any]]:
+        """Resultados fuera de rango de un paciente, del más reciente al más antiguo."""
+        rows = self._query(
+            "SELECT fecha, nombre, valor, unidad, minimo, maximo, fuera_rango FROM resultados"
+            " INDEXED BY resultados_fuera_rango"
+            " WHERE paciente = ? AND fuera_rango != 0 AND fecha >= ? AND fecha <= ?"
+            " ORDER BY fecha DESC LIMIT ?",
+            (patient, since or "0000-00-00", until or "9999-99-99", limit),
+        )
+        return [
+            {"fecha": fecha, "examen": nombre, "valor": valor, "unidad": unidad, "min": minimo, "max": maximo,
+             "fuera_rango": "bajo" if flag == BAJO else "alto"}
+            for fecha, nombre, valor, unidad, minimo, maximo, flag in rows
+        ]
+
+    def summary(self, patient: str) -> List[Dict[str, Any]]:
+        """Resumen por examen de todo el historial de un paciente, en la unidad más reciente de cada examen."""
+        rows = self._query(
+            "SELECT examen, fecha, valor, unidad, fuera_rango, nombre FROM resultados"
+            " WHERE paciente = ? ORDER BY examen, fecha, documento, orden",
+            (patient,),
+        )
+        if not rows:
+            return []
+        import numpy as np
+
+        exams, fechas, valores, unidades, flags, nombres = zip(*rows)
+        exam_array = np.asarray(exams, dtype=object)
+        # Unidad del resultado más reciente de cada examen (las filas van por examen y fecha)
+        last_of_exam = np.flatnonzero(np.r_[exam_array[1:] != exam_array[:-1], True])
+        targets = {exams[index]: unidades[index] for index in last_of_exam.tolist()}
+        factors = _conversion_factors(np, exams, unidades, targets)
+        valid = ~np.isnan(factors)
+        exam_array = exam_array[valid]
+        values = (np.asarray(valores, dtype=float) * factors)[valid]
+        days = np.asarray(fechas, dtype="datetime64[D]").astype(np.int64)[valid]
+        flag_array = np.asarray([NORMAL if flag is None else flag for flag in flags])[valid]
+        if not len(values):
+            return []
+        starts = np.flatnonzero(np.r_[True, exam_array[1:] != exam_array[:-1]])
+        names = np.asarray(nombres, dtype=object)[valid]
+        summaries = _aggregate(np, values, days, flag_array, starts)
+        for start, item in zip(starts.tolist(), summaries):
+            item["examen"] = names[start]
+            item["unidad"] = targets[exam_array[start]]
+        return summaries
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de escritura de este worker."""
+        return {
+            "documentos": self.documents,
+            "resultados": self.results,
+            "duplicados": self.duplicates,
+            "sin_paciente": self.without_patient,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else float(value)
+
+
+def _conversion_factors(np, exams: Sequence[str], units: Sequence[str], targets: Dict[str, str]) -> "np.ndarray":
+    """Factor de cada fila para pasar a la unidad de destino de su examen (NaN si no es convertible).
+
+    Todas las conversiones son proporcionales, así que basta con convertir 1.0
+    una vez por cada pareja (examen, unidad) distinta.
+    """
+    pairs: Dict[Tuple[str, str], float] = {}
+    factors = np.empty(len(units))
+    for index, pair in enumerate(zip(exams, units)):
+        factor = pairs.get(pair)
+        if factor is None:
+            converted = convert(1.0, pair[1], targets[pair[0]], pair[0])
+            factor = pairs[pair] = float("nan") if converted is None else converted
+        factors[index] = factor
+    return factors
+
+
+def _aggregate(np, values: "np.ndarray", days: "np.ndarray", flags: "np.ndarray",
+               starts: "np.ndarray") -> List[Dict[str, Any]]:
+    """Estadísticas de cada grupo de filas consecutivas que empieza en `starts`.
+
+    La tendencia es la pendiente de mínimos cuadrados del valor frente al
+    tiempo, en unidades por año.
+    """
+    counts = np.diff(np.r_[starts, len(values)])
+    ends = starts + counts - 1
+    mean = np.add.reduceat(values, starts) / counts
+    mean_day = np.add.reduceat(days.astype(float), starts) / counts
+    centered = days - np.repeat(mean_day, counts)
+    spread = np.add.reduceat(centered * centered, starts)
+    covariance = np.add.reduceat(centered * (values - np.repeat(mean, counts)), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(spread > 0, covariance / spread * 365.25, np.nan)
+    columns = {
+        "n": counts,
+        "media": mean,
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+        "primero": values[starts],
+        "ultimo": values[ends],
+        "tendencia_anual": slope,
+        "bajos": np.add.reduceat(flags == BAJO, starts),
+        "altos": np.add.reduceat(flags == ALTO, starts),
+        "desde": days[starts].astype("datetime64[D]").astype(str),
+        "hasta": days[ends].astype("datetime64[D]").astype(str),
+    }
+    lists = {name: column.tolist() for name, column in columns.items()}
+    # Sin tendencia (una sola fecha) queda NaN, que no es JSON válido
+    lists["tendencia_anual"] = [None if value != value else value for value in lists["tendencia_anual"]]
+    return [dict(zip(lists, row)) for row in zip(*lists.values())]
@@ -0,0 +1,253 @@
+"""Cliente HTTP asíncrono para el modelo de inferencia con circuit breaker y agrupación en lotes."""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: no se intenta la llamada remota."""
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un servicio remoto tras varios fallos seguidos.
+
+    - cerrado: las llamadas pasan; cada fallo suma y un éxito reinicia la cuenta.
+    - abierto: tras `failure_threshold` fallos seguidos las llamadas se rechazan
+      sin tocar la red durante `reset_timeout` segundos.
+    - semiabierto: pasado ese tiempo se deja pasar una única llamada de prueba;
+      si funciona el circuito se cierra y si falla vuelve a abrirse.
+
+    Solo la llamada de prueba cierra o reabre el circuito: los resultados de
+    llamadas que empezaron antes de abrirse y terminan con el circuito abierto
+    o semiabierto se ignoran.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "cerrado"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "semiabierto"
+        return "abierto"
+
+    def allow_request(self) -> Tuple[bool, bool]:
+        """Devuelve (se permite la llamada, es la llamada de prueba)."""
+        state = self.state
+        if state == "cerrado":
+            return True, False
+        if state == "semiabierto" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True, True
+        self.rejected += 1
+        return False, False
+
+    def record_success(self, trial: bool):
+        if trial:
+            self.opened_at = None
+            self.trial_in_flight = False
+        elif self.opened_at is not None:
+            return
+        self.failures = 0
+
+    def release_trial(self, trial: bool):
+        """Libera la llamada de prueba sin contarla como éxito ni como fallo (p. ej. si se canceló)."""
+        if trial:
+            self.trial_in_flight = False
+
+    def record_failure(self, trial: bool):
+        if not trial and self.opened_at is not None:
+            return
+        self.failures += 1
+        if trial or self.failures >= self.failure_threshold:
+            logger.warning(f"Circuito de inferencia abierto tras {self.failures} fallos seguidos")
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "estado": self.state,
+            "fallos_seguidos": self.failures,
+            "rechazadas": self.rejected,
+        }
+
+
+class InferenceClient:
+    """Cliente con conexiones persistentes y tiempos de espera para el endpoint de inferencia."""
+
+    def __init__(self, url: str, api_key: str, connect_timeout: float = 3.0, read_timeout: float = 20.0,
+                 max_connections: int = 20, breaker: Optional[CircuitBreaker] = None):
+        self.url = url
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    async def start(self):
+        if self._client is None:
+            # httpx se importa al crear el cliente y no al importar la aplicación
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                # Sin clave (p. ej. con el servidor de prueba) no se envía la cabecera: "Bearer " no es válida
+                headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def infer(self, payload: Any) -> Any:
+        """Envía `{"inputs": payload}` al modelo y devuelve la respuesta JSON.
+
+        Lanza CircuitOpenError sin llamar a la red si el circuito está abierto.
+        """
+        allowed, trial = self.breaker.allow_request()
+        if not allowed:
+            raise CircuitOpenError("Servicio de inferencia no disponible (circuito abierto)")
+        try:
+            if self._client is None:
+                await self.start()
+            response = await self._client.post(self.url, json={"inputs": payload})
+            if response.status_code != 200:
+                raise Exception(f"Error en la API de Hugging Face: {response.text}")
+            result = response.json()
+        except Exception:
+            self.breaker.record_failure(trial)
+            raise
+        except BaseException:
+            # Una cancelación (CancelledError no hereda de Exception) no dice nada del
+            # servicio, pero si era la llamada de prueba hay que liberarla: si no, el
+            # circuito rechazaría todas las llamadas siguientes
+            self.breaker.release_trial(trial)
+            raise
+        self.breaker.record_success(trial)
+        return result
+
+    async def check(self) -> int:
+        """Consulta el endpoint con GET (sin pasar por el circuito) y devuelve el código de estado."""
+        if self._client is None:
+            await self.start()
+        response = await self._client.get(self.url)
+        return response.status_code
+
+    def stats(self) -> Dict[str, Any]:
+        return {"circuito": self.breaker.stats()}
+
+
+class InferenceBatcher:
+    """Agrupa en un solo lote los textos que llegan en una ventana corta de tiempo.
+
+    Cada petición deja su texto en la cola y espera su resultado. El lote se
+    envía al cumplirse `window_ms` desde el primer texto pendiente o al llegar a
+    `max_batch` textos, como `{"inputs": [texto, ...]}`, y la respuesta (una
+    lista de resultados en el mismo orden) se reparte entre quienes esperan. Un
+    error del lote se propaga a todas sus peticiones. Un lote de un solo texto
+    se envía como petición individual, `{"inputs": texto}`.
+    """
+
+    def __init__(self, client: InferenceClient, window_ms: float = 10.0, max_batch: int = 8):
+        self.client = client
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[Any, "asyncio.Future[Any]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: "set[asyncio.Task[Any]]" = set()
+        self.batches = 0
+        self.texts = 0
+        self.max_size = 0
+        self.failed_batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    async def infer(self, text: Any) -> Any:
+        """Encola un texto y devuelve el resultado del modelo para ese texto."""
+        if self.max_batch == 1:
+            # Sin agrupación: la misma petición individual de siempre
+            return await self.client.infer(text)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Las peticiones canceladas mientras esperaban no se envían
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[Any, "asyncio.Future[Any]"]]):
+        start = time.monotonic()
+        try:
+            if len(batch) == 1:
+                results = [await self.client.infer(batch[0][0])]
+            else:
+                results = await self.client.infer([text for text, _ in batch])
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise Exception("Respuesta de inferencia por lotes con un número de resultados distinto")
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            latency = time.monotonic() - start
+            self.batches += 1
+            self.texts += len(batch)
+            self.max_size = max(self.max_size, len(batch))
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Envía los textos pendientes y espera a que terminen los lotes en curso."""
+        if self._pending:
+            self._flush()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ventana_ms": self.window * 1000,
+            "max_lote": self.max_batch,
+            "lotes": self.batches,
+            "lotes_fallidos": self.failed_batches,
+            "textos": self.texts,
+            "pendientes": len(self._pending),
+            "tamano_medio": self.texts / self.batches if self.batches else 0.0,
+            "tamano_max": self.max_size,
+            "latencia_media_ms": self.total_latency / self.batches * 1000 if self.batches else 0.0,
+            "latencia_max_ms": self.max_latency * 1000,
+        }
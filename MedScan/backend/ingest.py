@@ -0,0 +1,352 @@
+"""Ingesta masiva de informes sin pasar por la API.
+
+Recorre un directorio (o lee un manifiesto con una ruta por línea) y procesa
+cada PDF o imagen en un pool de procesos con la misma extracción que el
+servidor y el análisis por plantillas o `process_text_with_rules` (sin el
+modelo), tomados de backend/pipeline.py para que los procesos no levanten la
+aplicación. Los resultados se escriben en JSONL o en Parquet (`pip install
+pyarrow`), un registro por documento.
+
+La ingesta se puede reanudar: el checkpoint guarda la clave (versión del
+pipeline y resumen del contenido) de cada documento ya escrito. Al repetir la
+orden se saltan sin leerlos los archivos que no cambiaron de tamaño ni de fecha,
+y sin procesarlos los que tienen el contenido de uno ya hecho. Los errores no se
+guardan en el checkpoint, así que se reintentan en la siguiente ejecución. Un
+corte justo después de escribir un documento puede hacer que se vuelva a
+procesar y aparezca dos veces en la salida.
+
+Uso:
+    python -m backend.ingest informes/ --salida resultados.jsonl
+    python -m backend.ingest --manifiesto lista.txt --formato parquet --salida resultados/ --procesos 8
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from .executor import CPU_WORKERS
+from .extraction import PDF_MAX_PAGES, image_bytes_to_text, ocr_pdf_page, pdf_text_layer
+from .fields import medical_matcher, patient_matcher
+from .ocr import warm_up as warm_up_ocr
+from .pipeline import (
+    ALLOWED_EXTENSIONS,
+    PIPELINE_VERSION,
+    build_extraction_response,
+    describe_lab_templates,
+    get_document_key,
+    lab_templates,
+    process_text_with_rules,
+)
+from .responses import TEXTOS, render
+
+logger = logging.getLogger(__name__)
+
+# pyarrow es opcional: solo hace falta para escribir Parquet
+PYARROW_INSTALLED = importlib.util.find_spec("pyarrow") is not None
+
+OK = "ok"
+ERROR = "error"
+OMITIDO = "omitido"
+
+# Claves ya procesadas, fijadas en cada proceso de trabajo al arrancar
+_done: FrozenSet[str] = frozenset()
+
+
+def _init_worker(done: FrozenSet[str]):
+    global _done
+    _done = done
+    warm_up_ocr()
+
+
+def extract_text(contents: bytes, path: str) -> str:
+    """Texto de un PDF (capa de texto y OCR de las páginas escaneadas) o de una imagen."""
+    if not path.lower().endswith(".pdf"):
+        return image_bytes_to_text(contents)
+    page_count, pages, scanned = pdf_text_layer(contents, PDF_MAX_PAGES)
+    if page_count > PDF_MAX_PAGES:
+        raise ValueError(f"El PDF tiene {page_count} páginas; el máximo permitido es {PDF_MAX_PAGES}")
+    return "".join(text if text is not None else ocr_pdf_page(scanned[number]) for number, text in enumerate(pages))
+
+
+def ingest_file(path: str, with_text: bool = True) -> Dict[str, Any]:
+    """Procesa un archivo en un proceso de trabajo y devuelve su registro de salida."""
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"archivo": path, "clave": None, "estado": OK, "error": None}
+    try:
+        with open(path, "rb") as file:
+            contents = file.read()
+        record["clave"] = get_document_key(contents)
+        if record["clave"] in _done:
+            record["estado"] = OMITIDO
+            return record
+        text = extract_text(contents, path)
+        processed_data = lab_templates.extract(text) or process_text_with_rules(text)
+        response = render(build_extraction_response(text, processed_data))
+        if not with_text:
+            response = {key: value for key, value in response.items() if key not in TEXTOS}
+        record.update(response)
+    except Exception as e:
+        record["estado"] = ERROR
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+    record["segundos"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def iter_directory(root: str) -> Iterator[str]:
+    """Archivos con extensión permitida bajo `root`, en orden estable."""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.rsplit(".", 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def iter_manifest(path: str) -> Iterator[str]:
+    """Rutas de un manifiesto (una por línea, relativas a su directorio; '#' comenta)."""
+    base = os.path.dirname(path)
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield os.path.join(base, line)
+
+
+class Checkpoint:
+    """Documentos ya escritos en la salida, en un JSONL al que se añade una línea por documento."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys: Set[str] = set()
+        # Ruta absoluta -> (tamaño, fecha de modificación en ns)
+        self.files: Dict[str, Tuple[int, int]] = {}
+        prefix = f"doc:{PIPELINE_VERSION}:"
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # última línea cortada por una interrupción
+                    # Lo procesado con otra versión del pipeline se vuelve a procesar
+                    if entry["clave"].startswith(prefix):
+                        self.keys.add(entry["clave"])
+                        self.files[entry["archivo"]] = (entry["tamano"], entry["modificado"])
+        self._file = open(path, "a", encoding="utf-8")
+
+    def unchanged(self, path: str, stat: os.stat_result) -> bool:
+        return self.files.get(os.path.abspath(path)) == (stat.st_size, stat.st_mtime_ns)
+
+    def add(self, record: Dict[str, Any], stat: os.stat_result):
+        self.keys.add(record["clave"])
+        entry = {"archivo": os.path.abspath(record["archivo"]), "clave": record["clave"],
+                 "tamano": stat.st_size, "modificado": stat.st_mtime_ns}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlOutput:
+    """Salida JSONL; cada registro queda escrito (y se puede anotar en el checkpoint) al momento."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Escribe el registro y devuelve los registros que ya son definitivos."""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        return [record]
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._file.close()
+        return []
+
+
+def parquet_schema(pa):
+    text = pa.string()
+    return pa.schema([
+        ("archivo", text), ("clave", text), ("estado", text), ("error", text), ("segundos", pa.float64()),
+        ("titulo_examen", text),
+        ("info_paciente", pa.struct([(field, text) for field in patient_matcher.fields])),
+        ("info_medica", pa.struct([(field, text) for field in medical_matcher.fields])),
+        ("datos_estructurados", pa.list_(pa.struct([
+            ("categoria", text), ("examen", text), ("valor", text), ("unidad", text),
+            ("rango_referencia", pa.struct([("min", pa.float64()), ("max", pa.float64())])),
+        ]))),
+        ("conclusiones", text), ("recomendaciones", text), ("texto_original", text), ("texto_limpio", text),
+    ])
+
+
+class ParquetOutput:
+    """Salida Parquet en un directorio, en partes de `rows_per_part` documentos.
+
+    Una parte solo es legible cuando se cierra, así que se escribe con extensión
+    .tmp, se renombra al cerrarla y solo entonces sus documentos pasan al
+    checkpoint. Cada ejecución empieza una parte nueva.
+    """
+
+    def __init__(self, directory: str, rows_per_part: int):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = parquet_schema(pa)
+        self.directory = directory
+        self.rows_per_part = rows_per_part
+        os.makedirs(directory, exist_ok=True)
+        self._part = sum(1 for name in os.listdir(directory) if name.endswith(".parquet"))
+        self._rows: List[Dict[str, Any]] = []
+
+    def write(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self._rows.append(record)
+        if len(self._rows) >= self.rows_per_part:
+            return self._flush()
+        return []
+
+    def _flush(self) -> List[Dict[str, Any]]:
+        import pyarrow.parquet as pq
+
+        rows, self._rows = self._rows, []
+        if not rows:
+            return []
+        self._part += 1
+        path = os.path.join(self.directory, f"parte-{self._part:05d}.parquet")
+        pq.write_table(self._pa.Table.from_pylist(rows, schema=self.schema), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return rows
+
+    def close(self) -> List[Dict[str, Any]]:
+        return self._flush()
+
+
+class Progress:
+    """Contadores de la ingesta y su ritmo en documentos por segundo."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.start = self._last = time.perf_counter()
+        self.processed = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def count(self, state: str):
+        if state == OK:
+            self.processed += 1
+        elif state == ERROR:
+            self.errors += 1
+        else:
+            self.skipped += 1
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            logger.info(self.summary())
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        done = self.processed + self.errors
+        return (f"{self.processed} procesados, {self.errors} errores, {self.skipped} omitidos en {elapsed:.1f} s"
+                f" ({done / elapsed if elapsed else 0.0:.2f} docs/s)")
+
+
+def run(paths: Iterator[str], output, checkpoint: Checkpoint, workers: int, with_text: bool,
+        progress: Progress):
+    """Reparte los archivos entre los procesos con un número acotado de tareas en vuelo."""
+    pending: Dict[Future, os.stat_result] = {}
+    stats: Dict[str, os.stat_result] = {}
+
+    def commit(records: List[Dict[str, Any]]):
+        for record in records:
+            if record["estado"] == OK:
+                checkpoint.add(record, stats.pop(record["archivo"]))
+            else:
+                stats.pop(record["archivo"], None)
+
+    def collect(futures):
+        for future in futures:
+            stat = pending.pop(future)
+            record = future.result()
+            if record["estado"] == OMITIDO:
+                # Contenido ya escrito en una ejecución anterior: se anota la ruta para no volver a leerla
+                checkpoint.add(record, stat)
+            # Un contenido repetido en esta misma ejecución se escribe una sola vez
+            elif record["estado"] == OK and record["clave"] in checkpoint.keys:
+                record["estado"] = OMITIDO
+            if record["estado"] != OMITIDO:
+                stats[record["archivo"]] = stat
+                if record["estado"] == OK:
+                    checkpoint.keys.add(record["clave"])
+                commit(output.write(record))
+            progress.count(record["estado"])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(frozenset(checkpoint.keys),)) as pool:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                # Una ruta del manifiesto que no existe no detiene la ingesta
+                error = f"{type(e).__name__}: {str(e)}"
+                commit(output.write({"archivo": path, "clave": None, "estado": ERROR, "error": error}))
+                progress.count(ERROR)
+                continue
+            if checkpoint.unchanged(path, stat):
+                progress.count(OMITIDO)
+                continue
+            if len(pending) >= workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(ingest_file, path, with_text)] = stat
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    commit(output.close())
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entrada", nargs="?", help="directorio con los informes")
+    parser.add_argument("--manifiesto", help="archivo con una ruta por línea, en lugar del directorio")
+    parser.add_argument("--salida", required=True, help="archivo JSONL o directorio de Parquet")
+    parser.add_argument("--formato", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--checkpoint", help="por defecto <salida>.checkpoint")
+    parser.add_argument("--procesos", type=int, default=CPU_WORKERS)
+    parser.add_argument("--sin-texto", action="store_true", help="no guarda el texto extraído de cada documento")
+    parser.add_argument("--filas-por-parte", type=int, default=5000, help="documentos por archivo Parquet")
+    parser.add_argument("--intervalo", type=float, default=10, help="segundos entre informes de progreso")
+    args = parser.parse_args(argv)
+    if (args.entrada is None) == (args.manifiesto is None):
+        parser.error("indica un directorio o un --manifiesto")
+    if args.formato == "parquet" and not PYARROW_INSTALLED:
+        parser.error("la salida Parquet necesita pyarrow (pip install pyarrow)")
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    if lab_templates:
+        logger.info(describe_lab_templates())
+    if args.formato == "parquet":
+        output = ParquetOutput(args.salida, args.filas_por_parte)
+    else:
+        output = JsonlOutput(args.salida)
+    # Junto a la salida y no dentro del directorio de Parquet, que así se lee entero como un dataset
+    checkpoint = Checkpoint(args.checkpoint or f"{args.salida.rstrip(os.sep)}.checkpoint")
+    if checkpoint.keys:
+        logger.info(f"Reanudando: {len(checkpoint.keys)} documentos ya procesados en {checkpoint.path}")
+    paths = iter_manifest(args.manifiesto) if args.manifiesto else iter_directory(args.entrada)
+    progress = Progress(args.intervalo)
+    try:
+        run(paths, output, checkpoint, max(1, args.procesos), not args.sin_texto, progress)
+    except KeyboardInterrupt:
+        logger.warning("Ingesta interrumpida; se reanuda repitiendo la misma orden")
+        sys.exit(130)
+    finally:
+        checkpoint.close()
+        logger.info(progress.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Trabajos de extracción en segundo plano con estado consultable y eventos de progreso."""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+FINALES = (COMPLETADO, ERROR)
+
+
+class JobStoreFull(Exception):
+    """No caben más trabajos: todos los guardados siguen en curso."""
+
+
+class Job:
+    """Estado de un trabajo y colas de los clientes suscritos a sus eventos."""
+
+    def __init__(self, filename: str, content_type: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.content_type = content_type
+        self.state = PENDIENTE
+        self.pages_total = 0
+        self.pages_done = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error = ""
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINALES
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "archivo": self.filename,
+            "estado": self.state,
+            "progreso": {"paginas_total": self.pages_total, "paginas_procesadas": self.pages_done},
+            "creado": self.created_at,
+            "finalizado": self.finished_at,
+        }
+        if self.state == ERROR:
+            data["error"] = self.error
+        if include_result and self.state == COMPLETADO:
+            data["resultado"] = self.result
+        return data
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def _publish(self, event: str):
+        data = self.to_dict(include_result=event == COMPLETADO)
+        for queue in self._subscribers:
+            queue.put_nowait((event, data))
+
+    def start(self):
+        self.state = PROCESANDO
+        self._publish("estado")
+
+    def progress(self, done: int, total: int):
+        """Registra las páginas procesadas; se llama desde el event loop."""
+        self.pages_done = done
+        self.pages_total = total
+        self._publish("progreso")
+
+    def complete(self, result: Dict[str, Any]):
+        self.state = COMPLETADO
+        self.result = result
+        self.pages_done = self.pages_total
+        self.finished_at = time.time()
+        self._publish(COMPLETADO)
+
+    def fail(self, error: str):
+        self.state = ERROR
+        self.error = error
+        self.finished_at = time.time()
+        self._publish(ERROR)
+
+
+class JobStore:
+    """Trabajos guardados en memoria con un máximo de entradas y vencimiento.
+
+    Los trabajos terminados vencen `ttl_minutes` después de terminar. Si se llega
+    al máximo se descartan los terminados más antiguos; los que siguen en curso
+    nunca se descartan.
+    """
+
+    def __init__(self, max_jobs: int = 1000, ttl_minutes: float = 60):
+        self.max_jobs = max_jobs
+        self.ttl = ttl_minutes * 60
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self, filename: str, content_type: str) -> Job:
+        with self._lock:
+            if len(self._jobs) >= self.max_jobs:
+                for job_id, job in list(self._jobs.items()):
+                    if job.finished:
+                        del self._jobs[job_id]
+                        self.evictions += 1
+                        if len(self._jobs) < self.max_jobs:
+                            break
+                else:
+                    raise JobStoreFull(f"Hay {len(self._jobs)} trabajos en curso; inténtalo más tarde")
+            job = Job(filename, content_type)
+            self._jobs[job.id] = job
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished and job.finished_at + self.ttl <= time.time():
+                del self._jobs[job_id]
+                self.expirations += 1
+                return None
+            return job
+
+    def purge_expired(self) -> int:
+        """Elimina los trabajos terminados que ya vencieron y devuelve cuántos."""
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at <= limit]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states: Dict[str, int] = {PENDIENTE: 0, PROCESANDO: 0, COMPLETADO: 0, ERROR: 0}
+            for job in self._jobs.values():
+                states[job.state] += 1
+            return {
+                "trabajos": len(self._jobs),
+                "max_trabajos": self.max_jobs,
+                "por_estado": states,
+                "descartados": self.evictions,
+                "expirados": self.expirations,
+            }
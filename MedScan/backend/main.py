@@ -1,42 +1,80 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import pytesseract
-import pdfplumber
-from PIL import Image
-import io
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import asyncio
 import os
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Callable, Literal, Optional, Set, Tuple
 import re
-from datetime import datetime, timedelta
-import requests
-import fitz  # PyMuPDF
-import hashlib
 import logging
 import time
 
+from .admission import AdmissionController, Lane, Overloaded
+from .cache import Cache, SQLiteCache, TieredCache
+from .exam_lines import split_spaced
+from .executor import CPU_WORKERS, execution
+from .extraction import (
+    PDF_MAX_PAGES,
+    check_pdf_engine,
+    image_bytes_to_text,
+    ocr_pdf_page,
+    pdf_text_layer,
+)
+from .history import HistoryStore
+from .inference import CircuitBreaker, InferenceBatcher, InferenceClient
+from .jobs import COMPLETADO, FINALES, Job, JobStore, JobStoreFull
+from .metrics import analysis_seconds, analysis_total, registry as metrics_registry, track
+from .normalization import canonical_unit, parse_range, preprocess_text
+from .ocr import TESSERACT_PATH, backend_name as ocr_backend_name, check_tesseract
+from .pipeline import (
+    ALLOWED_EXTENSIONS,
+    build_extraction_response,
+    describe_lab_templates,
+    get_document_key,
+    get_text_hash,
+    lab_templates,
+    process_text_with_rules,
+)
+from .readiness import Readiness
+from .responses import MODO_COMPLETO, ExamResult, dumps, encode, render
+from .sections import SectionIndex
+from .singleflight import SingleFlight
+
 # Configurar logging
-logging.basicConfig(level=logging.INFO)
+# LOG_LEVEL=DEBUG muestra el detalle de cada etapa; con INFO esos mensajes no se formatean
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
-# Configurar la ruta de Tesseract y el directorio de datos
-TESSERACT_PATH = r'C:\Program Files\Tesseract-OCR'
-pytesseract.pytesseract.tesseract_cmd = os.path.join(TESSERACT_PATH, 'tesseract.exe')
-os.environ['TESSDATA_PREFIX'] = os.path.join(TESSERACT_PATH, 'tessdata')
-
-# Verificar que Tesseract está instalado correctamente
-try:
-    pytesseract.get_tesseract_version()
-    logger.info("Tesseract está funcionando correctamente")
-except Exception as e:
-    logger.error(f"Error al inicializar Tesseract: {str(e)}")
-    print(f"Por favor, asegúrate de que Tesseract está instalado en: {TESSERACT_PATH}")
-    print(f"Y que el archivo spa.traineddata está en: {os.path.join(TESSERACT_PATH, 'tessdata')}")
+# Las dependencias pesadas (PyMuPDF, Tesseract, httpx) no se cargan al importar
+# este módulo: se comprueban en segundo plano al arrancar y su estado se
+# consulta en /api/ready
+readiness = Readiness(required=("cache", "ejecucion", "pdf", "ocr"), optional=("inferencia",))
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", 30))  # segundos entre reintentos
 
 # Configuración de Hugging Face
-HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/facebook/mbart-large-50-many-to-many-mmt"
+HUGGINGFACE_API_URL = os.getenv(
+    "HUGGINGFACE_API_URL",
+    "https://api-inference.huggingface.co/models/facebook/mbart-large-50-many-to-many-mmt"
+)
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
+HF_CONNECT_TIMEOUT = float(os.getenv("HF_CONNECT_TIMEOUT", 3))  # segundos
+HF_READ_TIMEOUT = float(os.getenv("HF_READ_TIMEOUT", 20))  # segundos
+HF_MAX_CONNECTIONS = int(os.getenv("HF_MAX_CONNECTIONS", 20))
+HF_BREAKER_FAILURES = int(os.getenv("HF_BREAKER_FAILURES", 5))
+HF_BREAKER_RESET = float(os.getenv("HF_BREAKER_RESET", 30))  # segundos
+
+inference_client = InferenceClient(
+    HUGGINGFACE_API_URL,
+    HUGGINGFACE_API_KEY,
+    connect_timeout=HF_CONNECT_TIMEOUT,
+    read_timeout=HF_READ_TIMEOUT,
+    max_connections=HF_MAX_CONNECTIONS,
+    breaker=CircuitBreaker(failure_threshold=HF_BREAKER_FAILURES, reset_timeout=HF_BREAKER_RESET),
+)
+# Agrupación de textos en lotes: ventana de espera y tamaño máximo. Desactivada
+# por defecto (1): el endpoint tiene que aceptar una lista en "inputs"
+HF_BATCH_WINDOW_MS = float(os.getenv("HF_BATCH_WINDOW_MS", 10))
+HF_MAX_BATCH = int(os.getenv("HF_MAX_BATCH", 1))
+inference_batcher = InferenceBatcher(inference_client, window_ms=HF_BATCH_WINDOW_MS, max_batch=HF_MAX_BATCH)
 
 SYSTEM_PROMPT = """Eres un asistente especializado en procesar informes médicos de laboratorio.
 Tu tarea es extraer y estructurar la información en un formato JSON consistente.
@@ -86,90 +124,160 @@ app.add_middleware(
 
 # Cargar configuración
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 5242880))  # 5MB por defecto
-ALLOWED_EXTENSIONS = json.loads(os.getenv("ALLOWED_EXTENSIONS", '["pdf","jpg","jpeg","png"]'))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 262144))  # bytes leídos por bloque
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 50))
+# Archivos de un mismo lote que se procesan a la vez
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", CPU_WORKERS))
+
+# Plantillas de laboratorios conocidos, cargadas en backend/pipeline.py
+if lab_templates:
+    logger.info(describe_lab_templates())
 
 # Sistema de caché
-class Cache:
-    def __init__(self, max_size=100, ttl_hours=24):
-        self.cache = {}
-        self.max_size = max_size
-        self.ttl = timedelta(hours=ttl_hours)
-    
-    def get(self, key: str) -> Dict:
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if datetime.now() - timestamp < self.ttl:
-                return data
-            del self.cache[key]
-        return None
-    
-    def set(self, key: str, value: Dict):
-        if len(self.cache) >= self.max_size:
-            # Eliminar la entrada más antigua
-            oldest_key = min(self.cache.items(), key=lambda x: x[1][1])[0]
-            del self.cache[oldest_key]
-        self.cache[key] = (value, datetime.now())
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", 100))
+CACHE_TTL_HOURS = float(os.getenv("CACHE_TTL_HOURS", 24))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))  # 64MB por defecto
+CACHE_PURGE_INTERVAL = float(os.getenv("CACHE_PURGE_INTERVAL", 60))  # segundos
+# "memory" (por defecto) o "sqlite" para compartir la caché entre workers y reinicios
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "medscan_cache.db")
+CACHE_DISK_MAX_SIZE = int(os.getenv("CACHE_DISK_MAX_SIZE", 10000))
+CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))  # 512MB por defecto
 
 # Inicializar caché
 try:
-    cache = Cache()
-    logger.info("Sistema de caché inicializado correctamente")
+    persistent_cache = None
+    if CACHE_BACKEND == "sqlite":
+        # La caché en memoria queda delante de la persistente compartida por los workers
+        persistent_cache = SQLiteCache(
+            CACHE_PATH,
+            max_size=CACHE_DISK_MAX_SIZE,
+            ttl_hours=CACHE_TTL_HOURS,
+            max_bytes=CACHE_DISK_MAX_BYTES,
+        )
+    cache = TieredCache(
+        Cache(max_size=CACHE_MAX_SIZE, ttl_hours=CACHE_TTL_HOURS, max_bytes=CACHE_MAX_BYTES),
+        persistent_cache,
+        # Las consultas a SQLite se hacen en el pool de E/S, no en el event loop
+        run=lambda func, *args: execution.run("cache", func, *args),
+    )
+    logger.info(f"Sistema de caché inicializado correctamente (backend={CACHE_BACKEND})")
+    readiness.mark("cache", True, CACHE_BACKEND)
 except Exception as e:
     logger.error(f"Error al inicializar caché: {str(e)}")
+    readiness.mark("cache", False, str(e))
+
+# Trabajos en segundo plano
+JOBS_MAX = int(os.getenv("JOBS_MAX", 1000))
+JOBS_TTL_MINUTES = float(os.getenv("JOBS_TTL_MINUTES", 60))
+JOBS_SSE_KEEPALIVE = float(os.getenv("JOBS_SSE_KEEPALIVE", 15))  # segundos entre comentarios de keep-alive
+jobs = JobStore(max_jobs=JOBS_MAX, ttl_minutes=JOBS_TTL_MINUTES)
+job_tasks: Set[asyncio.Task] = set()
+
+# Historial longitudinal por paciente (opcional)
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "0") == "1"
+HISTORY_PATH = os.getenv("HISTORY_PATH", "medscan_history.db")
+history: Optional[HistoryStore] = None
+if HISTORY_ENABLED:
+    try:
+        history = HistoryStore(HISTORY_PATH)
+        logger.info(f"Historial de resultados inicializado en {HISTORY_PATH}")
+    except Exception as e:
+        logger.error(f"Error al inicializar el historial: {str(e)}")
+history_tasks: Set[asyncio.Task] = set()
+
+# Control de admisión: carril ligero para documentos pequeños con capa de texto
+# y carril pesado para imágenes y PDF grandes, que suelen necesitar OCR
+ADMISSION_LIGHT_MAX_BYTES = int(os.getenv("ADMISSION_LIGHT_MAX_BYTES", 1024 * 1024))  # 1MB por defecto
+ADMISSION_LIGHT_CONCURRENCY = int(os.getenv("ADMISSION_LIGHT_CONCURRENCY", CPU_WORKERS * 2))
+ADMISSION_LIGHT_QUEUE = int(os.getenv("ADMISSION_LIGHT_QUEUE", 64))
+ADMISSION_HEAVY_CONCURRENCY = int(os.getenv("ADMISSION_HEAVY_CONCURRENCY", CPU_WORKERS))
+ADMISSION_HEAVY_QUEUE = int(os.getenv("ADMISSION_HEAVY_QUEUE", 16))
+admission = AdmissionController({
+    "ligero": Lane("ligero", ADMISSION_LIGHT_CONCURRENCY, ADMISSION_LIGHT_QUEUE, initial_seconds=0.5),
+    "pesado": Lane("pesado", ADMISSION_HEAVY_CONCURRENCY, ADMISSION_HEAVY_QUEUE, initial_seconds=5.0),
+})
+
+async def purge_expired_periodically():
+    """Elimina en segundo plano las entradas vencidas de la caché y los trabajos vencidos."""
+    while True:
+        await asyncio.sleep(CACHE_PURGE_INTERVAL)
+        # La compactación de la caché persistente solo se hace aquí, en el pool de E/S
+        purged = await cache.purge_expired()
+        if purged:
+            logger.info(f"Caché: {purged} entradas vencidas eliminadas")
+        purged = jobs.purge_expired()
+        if purged:
+            logger.info(f"Trabajos: {purged} trabajos vencidos eliminados")
+
+background_tasks: List[asyncio.Task] = []
 
 @app.on_event("startup")
 async def startup_event():
     """Evento que se ejecuta al iniciar la aplicación."""
     try:
         logger.info("Iniciando aplicación...")
-        # Verificar que Tesseract está instalado
-        pytesseract.get_tesseract_version()
-        logger.info("Tesseract está funcionando correctamente")
-        
-        # Verificar que PyMuPDF está instalado
-        fitz.__version__
-        logger.info("PyMuPDF está funcionando correctamente")
-        
-        # Verificar conexión con Hugging Face
-        headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
-        response = requests.get(HUGGINGFACE_API_URL, headers=headers)
-        if response.status_code == 200:
-            logger.info("Conexión con Hugging Face establecida correctamente")
-        else:
-            logger.error(f"Error al conectar con Hugging Face: {response.text}")
-            
+        execution.start()
+        readiness.mark("ejecucion", True, f"modo={execution.mode}")
+        background_tasks.append(asyncio.create_task(purge_expired_periodically()))
+        # Las comprobaciones no bloquean el arranque: el worker acepta tráfico ya
+        background_tasks.append(asyncio.create_task(warm_up()))
     except Exception as e:
         logger.error(f"Error durante el inicio de la aplicación: {str(e)}")
         raise
 
+async def check_inference() -> str:
+    status_code = await inference_client.check()
+    if status_code != 200:
+        raise Exception(f"El modelo de inferencia respondió {status_code}")
+    return HUGGINGFACE_API_URL
+
+# Subsistema -> comprobación; las de PDF y OCR se ejecutan en el pool de trabajo,
+# así que además arrancan los trabajadores y cargan sus motores
+WARMUP_CHECKS: Dict[str, Callable[[], Any]] = {
+    "pdf": lambda: execution.run("pdf", check_pdf_engine),
+    "ocr": lambda: execution.run("ocr", check_tesseract),
+    "inferencia": check_inference,
+}
+
+async def check_subsystem(name: str):
+    try:
+        detail = await WARMUP_CHECKS[name]()
+        readiness.mark(name, True, str(detail))
+        logger.info(f"Subsistema {name} listo: {detail}")
+    except Exception as e:
+        readiness.mark(name, False, str(e))
+        logger.error(f"Subsistema {name} no disponible: {str(e)}")
+        if name == "ocr":
+            logger.error(f"Por favor, asegúrate de que Tesseract está instalado en: {TESSERACT_PATH}")
+            logger.error(f"Y que el archivo spa.traineddata está en: {os.path.join(TESSERACT_PATH, 'tessdata')}")
+
+async def warm_up():
+    """Comprueba las dependencias en segundo plano y reintenta las que fallan."""
+    await asyncio.gather(*(check_subsystem(name) for name in WARMUP_CHECKS))
+    while True:
+        failed = [name for name in readiness.pending() if name in WARMUP_CHECKS]
+        if not failed:
+            return
+        await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+        await asyncio.gather(*(check_subsystem(name) for name in failed))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento que se ejecuta al detener la aplicación."""
+    for task in [*background_tasks, *job_tasks, *history_tasks]:
+        task.cancel()
+    await inference_batcher.close()
+    await inference_client.close()
+    execution.shutdown()
+
 @app.get("/")
 async def root():
     """Endpoint de prueba."""
     return {"message": "API funcionando correctamente"}
 
-def get_text_hash(text: str) -> str:
-    """Genera un hash único para el texto."""
-    return hashlib.md5(text.encode()).hexdigest()
-
-def preprocess_text(text: str) -> str:
-    """Preprocesa el texto para mejorar la detección."""
-    # Eliminar espacios múltiples
-    text = re.sub(r'\s+', ' ', text)
-    # Normalizar caracteres especiales
-    text = text.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-    # Eliminar caracteres no deseados
-    text = re.sub(r'[^\w\s.,;:()/-]', '', text)
-    return text.strip()
-
-def clean_text(text: str) -> str:
-    """Limpia el texto extraído."""
-    # Eliminar espacios múltiples
-    text = re.sub(r'\s+', ' ', text)
-    # Eliminar caracteres especiales pero mantener puntos y comas
-    text = re.sub(r'[^\w\s.,;:()/-]', '', text)
-    # Corregir errores comunes de OCR
-    text = text.replace('0', 'O').replace('1', 'I').replace('5', 'S')
-    return text.strip()
+# Documentos en procesamiento, por clave de caché
+document_flight = SingleFlight()
 
 def extract_structured_data(text: str) -> List[Dict[str, Any]]:
     """Extrae datos estructurados del texto."""
@@ -225,30 +333,91 @@ def validate_file(file: UploadFile) -> bool:
     
     return True
 
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"El archivo supera el tamaño máximo de {MAX_FILE_SIZE} bytes"
+    )
+
+def server_overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def document_lane(contents: bytes, content_type: str) -> str:
+    """Carril de admisión según el coste esperado del documento.
+
+    Las imágenes siempre pasan por OCR; un PDF pequeño suele tener capa de
+    texto, mientras que los escaneados pesan bastante más por página.
+    """
+    if content_type == "application/pdf" and len(contents) <= ADMISSION_LIGHT_MAX_BYTES:
+        return "ligero"
+    return "pesado"
+
+async def read_upload(file: UploadFile) -> bytearray:
+    """Lee el archivo subido una sola vez, por bloques y con el límite de MAX_FILE_SIZE.
+
+    Starlette ya ha guardado el cuerpo en su archivo temporal antes de llegar
+    aquí: si el tamaño se conoce y supera el límite, se rechaza sin copiarlo a
+    memoria; si no se conoce, la lectura se corta en cuanto se supera. Los
+    bloques se copian en un único buffer (reservado entero si se conoce el
+    tamaño) que se pasa tal cual a la extracción, sin unirlos ni copiarlo otra vez.
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > MAX_FILE_SIZE:
+        raise file_too_large()
+    with track("lectura"):
+        buffer = bytearray(size or 0)
+        total = 0
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            end = total + len(chunk)
+            if end > MAX_FILE_SIZE:
+                raise file_too_large()
+            # Dentro del tamaño reservado sobrescribe; más allá, el buffer crece
+            buffer[total:end] = chunk
+            total = end
+        del buffer[total:]
+        return buffer
+
 async def extract_text_from_pdf(file: UploadFile) -> str:
     """Extrae texto de un archivo PDF usando PyMuPDF."""
-    try:
-        contents = await file.read()
-        doc = fitz.open(stream=contents, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
-    except Exception as e:
-        logger.error(f"Error al procesar PDF: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error al procesar el PDF: {str(e)}"
-        )
+    contents = await read_upload(file)
+    return await extract_text_from_contents(contents, "application/pdf")
 
 async def extract_text_from_image(file: UploadFile) -> str:
     """Extrae texto de una imagen usando Tesseract."""
+    contents = await read_upload(file)
+    return await extract_text_from_contents(contents, "image")
+
+ProgressCallback = Callable[[int, int], None]
+
+async def extract_text_from_contents(contents: bytes, content_type: str,
+                                     progress: Optional[ProgressCallback] = None) -> str:
+    """Extrae texto de un archivo ya leído según su tipo de contenido.
+
+    Si se pasa `progress`, se llama con (páginas procesadas, páginas totales).
+    """
+    if content_type == "application/pdf":
+        try:
+            return await extract_text_from_pdf_pages(contents, progress)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error al procesar PDF: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error al procesar el PDF: {str(e)}"
+            )
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        text = pytesseract.image_to_string(image, lang='spa')
-        image.close()
+        with track("ocr"):
+            text = await execution.run("ocr", image_bytes_to_text, contents)
+        if progress:
+            progress(1, 1)
         return text
     except Exception as e:
         logger.error(f"Error al procesar imagen: {str(e)}")
@@ -257,300 +426,80 @@ async def extract_text_from_image(file: UploadFile) -> str:
             detail=f"Error al procesar la imagen: {str(e)}"
         )
 
-def extract_patient_info(text: str) -> Dict[str, str]:
-    """Extrae información del paciente del texto."""
-    info = {
-        "nombre": "",
-        "edad": "",
-        "sexo": "",
-        "fecha": "",
-        "id": ""
-    }
-    
-    # Patrones mejorados para buscar información del paciente
-    patrones = {
-        "nombre": [
-            r"(?i)(?:paciente|nombre)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|\s*(?:edad|fecha|id|$))",
-            r"(?i)nombre\s+del\s+paciente\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)paciente\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "edad": [
-            r"(?i)(?:edad)\s*[:=]\s*(\d+(?:\s*años)?)",
-            r"(?i)edad\s+del\s+paciente\s*[:=]\s*(\d+(?:\s*años)?)",
-            r"(?i)años\s*[:=]\s*(\d+)"
-        ],
-        "sexo": [
-            r"(?i)(?:sexo)\s*[:=]\s*([MF])",
-            r"(?i)sexo\s+del\s+paciente\s*[:=]\s*([MF])",
-            r"(?i)genero\s*[:=]\s*([MF])"
-        ],
-        "fecha": [
-            r"(?i)(?:fecha)\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
-            r"(?i)fecha\s+del\s+examen\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
-            r"(?i)fecha\s+de\s+muestra\s*[:=]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"
-        ],
-        "id": [
-            r"(?i)(?:id|identificación|cedula|cédula)\s*[:=]\s*([A-Z0-9-]+)",
-            r"(?i)historia\s+clínica\s*[:=]\s*([A-Z0-9-]+)",
-            r"(?i)no\.?\s*de\s+identificación\s*[:=]\s*([A-Z0-9-]+)"
-        ]
-    }
-    
-    for key, patterns in patrones.items():
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                info[key] = match.group(1).strip()
-                break
-    
-    return info
-
-def extract_medical_info(text: str) -> Dict[str, str]:
-    """Extrae información médica del texto."""
-    info = {
-        "medico": "",
-        "especialidad": "",
-        "clinica": "",
-        "numero_registro": "",
-        "tipo_muestra": "",
-        "condiciones": "",
-        "metodo_analisis": ""
-    }
-    
-    # Patrones mejorados para información médica
-    patrones = {
-        "medico": [
-            r"(?i)(?:médico|doctor|dr\.?|dra\.?)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)interpretado\s+por\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)firmado\s+por\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "especialidad": [
-            r"(?i)(?:especialidad)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)especialista\s+en\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "clinica": [
-            r"(?i)(?:clínica|hospital|centro|laboratorio)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)institución\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "numero_registro": [
-            r"(?i)(?:registro|licencia|matrícula)\s*[:=]\s*([A-Z0-9-]+)",
-            r"(?i)no\.?\s*de\s+registro\s*[:=]\s*([A-Z0-9-]+)"
-        ],
-        "tipo_muestra": [
-            r"(?i)(?:tipo\s+de\s+muestra|muestra)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)material\s+analizado\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "condiciones": [
-            r"(?i)(?:condiciones|estado)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)estado\s+de\s+la\s+muestra\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ],
-        "metodo_analisis": [
-            r"(?i)(?:método|metodo)\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)",
-            r"(?i)técnica\s+utilizada\s*[:=]\s*([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?=\n|$)"
-        ]
-    }
-    
-    for key, patterns in patrones.items():
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                info[key] = match.group(1).strip()
-                break
-    
-    return info
+async def extract_text_from_pdf_pages(contents: bytes, progress: Optional[ProgressCallback] = None) -> str:
+    """Extrae el texto de un PDF página a página.
 
-def extract_conclusions_and_recommendations(text: str) -> Dict[str, str]:
-    """Extrae conclusiones y recomendaciones del texto."""
-    result = {
-        "conclusiones": "",
-        "recomendaciones": ""
-    }
-    
-    # Patrones mejorados para conclusiones
-    conclusion_patterns = [
-        r"(?i)conclusi[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
-        r"(?i)interpretaci[óo]n[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
-        r"(?i)resultados?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
-        r"(?i)comentarios?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))"
-    ]
-    
-    # Patrones mejorados para recomendaciones
-    recommendation_patterns = [
-        r"(?i)recomendaci[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:firma|$))",
-        r"(?i)sugerencias?[:\s]+(.*?)(?=\s*(?:firma|$))",
-        r"(?i)observaciones?[:\s]+(.*?)(?=\s*(?:firma|$))"
-    ]
-    
-    # Buscar conclusiones
-    for pattern in conclusion_patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            result["conclusiones"] = match.group(1).strip()
-            break
-    
-    # Buscar recomendaciones
-    for pattern in recommendation_patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            result["recomendaciones"] = match.group(1).strip()
-            break
-    
-    return result
-
-def process_text_with_rules(text: str) -> dict:
-    """Procesa el texto usando reglas y patrones predefinidos."""
-    result = {
-        "titulo_examen": "",
-        "info_paciente": {},
-        "info_medica": {},
-        "datos_estructurados": [],
-        "conclusiones": "",
-        "recomendaciones": ""
-    }
-
-    # Extraer información del paciente
-    result["info_paciente"] = extract_patient_info(text)
-    
-    # Extraer información médica
-    result["info_medica"] = extract_medical_info(text)
-    
-    # Extraer conclusiones y recomendaciones
-    conclusions_data = extract_conclusions_and_recommendations(text)
-    result["conclusiones"] = conclusions_data["conclusiones"]
-    result["recomendaciones"] = conclusions_data["recomendaciones"]
-
-    # Lista de campos a ignorar que no son resultados de análisis
-    campos_ignorar = {
-        'edad', 'fecha', 'nombre', 'sexo', 'paciente', 
-        'médico', 'medico', 'doctor', 'doctora', 'dr', 'dra',
-        'registro', 'cédula', 'cedula', 'identificación', 'identificacion',
-        'muestra', 'método', 'metodo', 'número', 'numero', 'resultado',
-        'parámetro', 'parametro', 'categoría', 'categoria', 'estado',
-        'referencia', 'rango', 'valor', 'unidad', 'interpretación',
-        'interpretacion', 'observaciones', 'notas', 'comentarios'
-    }
-
-    # Lista de categorías comunes en exámenes de laboratorio
-    categorias_comunes = {
-        'HEMOGRAMA', 'BIOQUÍMICA', 'BIOQUIMICA', 'QUÍMICA SANGUÍNEA', 'QUIMICA SANGUINEA',
-        'FUNCIÓN RENAL', 'FUNCION RENAL', 'FUNCIÓN HEPÁTICA', 'FUNCION HEPATICA',
-        'ELECTROLITOS', 'LÍPIDOS', 'LIPIDOS', 'HORMONAS', 'TIROIDES',
-        'COAGULACIÓN', 'COAGULACION', 'UROANÁLISIS', 'UROANALISIS',
-        'CULTIVOS', 'MICROBIOLOGÍA', 'MICROBIOLOGIA', 'INMUNOLOGÍA', 'INMUNOLOGIA'
-    }
-
-    # Dividir el texto en líneas y limpiar
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-    # Detectar título del examen
-    for line in lines[:5]:
-        if re.search(r'(?i)(examen|análisis|informe|reporte)\s+(?:de\s+)?(?:laboratorio|médico|clínico)', line):
-            result["titulo_examen"] = line.strip()
-            break
-
-    # Variables para el procesamiento de categorías y exámenes
-    current_category = ""
-    in_resultados = False
-
-    # Patrones flexibles para detectar exámenes
-    exam_patterns = [
-        # Patrón 1: Nombre Valor Unidad (Rango)
-        r'([^:]+?)\s+([\d,\.]+)\s+((?:mg/dL|g/dL|U/L|%|mg/L|µL|millones/µL|/µL|mEq/L|mm3|g/24h|/hpf|/lpf|/campo|/mm2|/mm3|/dl|/l|/ml|/ul|/mm|/h|/min|/seg|/día|/dia|/semana|/mes|mmol/L)?)\s*(?:\(([^)]+)\))?',
-        
-        # Patrón 2: Nombre: Valor Unidad (Rango)
-        r'([^:]+?)\s*[:=]\s*([\d,\.]+)\s*((?:mg/dL|g/dL|U/L|%|mg/L|µL|millones/µL|/µL|mEq/L|mm3|g/24h|/hpf|/lpf|/campo|/mm2|/mm3|/dl|/l|/ml|/ul|/mm|/h|/min|/seg|/día|/dia|/semana|/mes|mmol/L)?)\s*(?:\(([^)]+)\))?',
-        
-        # Patrón 3: Nombre = Valor Unidad (Rango)
-        r'([^:]+?)\s*=\s*([\d,\.]+)\s*((?:mg/dL|g/dL|U/L|%|mg/L|µL|millones/µL|/µL|mEq/L|mm3|g/24h|/hpf|/lpf|/campo|/mm2|/mm3|/dl|/l|/ml|/ul|/mm|/h|/min|/seg|/día|/dia|/semana|/mes|mmol/L)?)\s*(?:\(([^)]+)\))?'
-    ]
-
-    # Procesar línea por línea
-    for line in lines:
-        # Detectar sección de resultados
-        if re.match(r'(?i)^(?:resultados?|parámetros?|parametros?|valores?|exámenes?|examenes?)', line):
-            in_resultados = True
-            continue
-
-        # Detectar categorías
-        if re.match(r'^[A-ZÁÉÍÓÚÑ][^:]+$', line.strip()) and not ':' in line:
-            if line.strip() in categorias_comunes:
-                current_category = line.strip()
-            continue
+    Las páginas con capa de texto se leen directamente; solo las escaneadas se
+    renderizan y pasan por OCR, repartidas entre los procesos de trabajo. El
+    texto se ensambla en el orden original de las páginas.
+    """
+    with track("pdf"):
+        page_count, pages, scanned = await execution.run("pdf", pdf_text_layer, contents, PDF_MAX_PAGES)
+    if page_count > PDF_MAX_PAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El PDF tiene {page_count} páginas; el máximo permitido es {PDF_MAX_PAGES}"
+        )
 
-        # Procesar línea de examen usando múltiples patrones
-        if in_resultados:
-            for pattern in exam_patterns:
-                exam_match = re.match(pattern, line)
-                if exam_match:
-                    nombre = exam_match.group(1).strip()
-                    # Verificar si el nombre del examen está en la lista de campos a ignorar
-                    if nombre.lower() not in campos_ignorar and not re.match(r'^[A-ZÁÉÍÓÚÑ][^:]+$', nombre):
-                        valor_str = exam_match.group(2).replace(',', '.')
-                        unidad = exam_match.group(3) if exam_match.group(3) else ""
-                        rango_str = exam_match.group(4) if len(exam_match.groups()) > 3 else ""
-
-                        try:
-                            valor = float(valor_str)
-                            rango_min = None
-                            rango_max = None
-
-                            if rango_str:
-                                # Procesar diferentes formatos de rango
-                                if '-' in rango_str:
-                                    rango_parts = [p.strip().replace(',', '.') for p in rango_str.split('-')]
-                                    if len(rango_parts) == 2:
-                                        rango_min = float(rango_parts[0])
-                                        rango_max = float(rango_parts[1])
-                                elif '<' in rango_str:
-                                    rango_max = float(rango_str.replace('<', '').strip().replace(',', '.'))
-                                elif '>' in rango_str:
-                                    rango_min = float(rango_str.replace('>', '').strip().replace(',', '.'))
-
-                            # Solo añadir si tenemos un nombre válido y un valor numérico
-                            if nombre and not nombre.isspace() and valor is not None:
-                                result["datos_estructurados"].append({
-                                    "categoria": current_category,
-                                    "examen": nombre,
-                                    "valor": str(valor),
-                                    "unidad": unidad,
-                                    "rango_referencia": {
-                                        "min": rango_min,
-                                        "max": rango_max
-                                    }
-                                })
-                                break
-                        except (ValueError, IndexError) as e:
-                            print(f"Error procesando valor: {line} - {str(e)}")
-                            continue
-
-    return result
-
-async def process_with_ai(text: str) -> Dict[str, Any]:
-    """Procesa el texto usando el modelo de IA especializado."""
+    done = page_count - len(scanned)
+    if progress:
+        progress(done, page_count)
+
+    async def ocr_page(number: int):
+        nonlocal done
+        with track("ocr"):
+            # Al trabajador solo se envía la página, no el documento entero
+            pages[number] = await execution.run("ocr", ocr_pdf_page, scanned[number])
+        done += 1
+        if progress:
+            progress(done, page_count)
+
+    if scanned:
+        await asyncio.gather(*(ocr_page(number) for number in scanned))
+
+    return "".join(pages)
+
+def count_analysis(path: str, start: float):
+    analysis_total.inc(path)
+    analysis_seconds.observe(path, value=time.perf_counter() - start)
+
+async def process_with_ai(text: str) -> Tuple[Dict[str, Any], str]:
+    """Procesa el texto usando el modelo de IA especializado.
+
+    Los informes de laboratorios con plantilla se extraen directamente con
+    ella, sin pasar por el modelo ni por las reglas genéricas. Devuelve los
+    datos y el camino por el que se obtuvieron: "cache", "plantilla", "modelo"
+    o "reglas" (si falló el modelo).
+    """
+    start = time.perf_counter()
     try:
-        print("Iniciando procesamiento con IA...")
+        logger.debug("Iniciando procesamiento con IA")
         
         # Verificar caché
         text_hash = get_text_hash(text)
-        cached_result = cache.get(text_hash)
+        cached_result = await cache.get(text_hash)
         if cached_result:
-            print("Resultado encontrado en caché")
-            return cached_result
+            logger.debug("Resultado encontrado en caché")
+            count_analysis("cache", start)
+            return cached_result, "cache"
+
+        # Fuera del event loop, como las reglas; sin plantillas cargadas no hay nada que buscar
+        processed_data = None
+        if lab_templates:
+            with track("plantilla"):
+                processed_data = await execution.run("rules", lab_templates.extract, text)
+        if processed_data is not None:
+            await cache.set(text_hash, processed_data)
+            count_analysis("plantilla", start)
+            return processed_data, "plantilla"
 
         # Preprocesar texto
-        print("Preprocesando texto...")
-        processed_text = preprocess_text(text)
+        with track("normalizacion"):
+            processed_text = preprocess_text(text)
         
-        print("Enviando solicitud a Hugging Face...")
-        headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
-        response = requests.post(HUGGINGFACE_API_URL, headers=headers, json={"inputs": processed_text})
-        
-        if response.status_code != 200:
-            print(f"Error en la API de Hugging Face: {response.text}")
-            raise Exception(f"Error en la API de Hugging Face: {response.text}")
-            
-        print("Procesando resultados de la IA...")
-        results = response.json()
+        logger.debug("Enviando solicitud al modelo de inferencia")
+        with track("modelo"):
+            results = await inference_batcher.infer(processed_text)
         
         # Procesar los resultados de la IA
         processed_data = {
@@ -589,7 +538,6 @@ async def process_with_ai(text: str) -> Dict[str, Any]:
                 elif "examen" in entity["word"].lower() or "análisis" in entity["word"].lower():
                     processed_data["titulo_examen"] = entity["word"]
         
-        print("Procesando valores numéricos y rangos...")
         # Procesar valores numéricos y rangos
         lines = processed_text.split('\n')
         for line in lines:
@@ -598,71 +546,116 @@ async def process_with_ai(text: str) -> Dict[str, Any]:
                 current_category = line.strip()
                 continue
                 
-            # Patrón para detectar parámetros con valores y rangos
-            param_match = re.match(r'([^:]+?)\s+([\d,\.]+)\s+((?:mg/dL|g/dL|U/L|%|mg/L|µL|millones/µL|/µL|mEq/L|mm3|g/24h|/hpf|/lpf|/campo|/mm2|/mm3|/dl|/l|/ml|/ul|/mm|/h|/min|/seg|/día|/dia|/semana|/mes|mmol/L)?)\s*(?:\(([^)]+)\))?', line)
-            if param_match:
-                nombre = param_match.group(1).strip()
-                valor = param_match.group(2).replace(',', '.')
-                unidad = param_match.group(3) if param_match.group(3) else ""
-                rango = param_match.group(4) if param_match.group(4) else ""
+            # Detectar parámetros con valores y rangos
+            exam = split_spaced(line)
+            if exam:
+                nombre = exam.nombre
+                valor = exam.valor.replace(',', '.')
+                unidad = canonical_unit(exam.unidad)
                 
                 try:
                     valor_float = float(valor)
-                    rango_min = None
-                    rango_max = None
+                    rango_min, rango_max = parse_range(exam.rango)
                     
-                    if rango and '-' in rango:
-                        rango_parts = [p.strip().replace(',', '.') for p in rango.split('-')]
-                        if len(rango_parts) == 2:
-                            rango_min = float(rango_parts[0])
-                            rango_max = float(rango_parts[1])
-                    
-                    processed_data["datos_estructurados"].append({
-                        "categoria": current_category,
-                        "examen": nombre,
-                        "valor": str(valor_float),
-                        "unidad": unidad,
-                        "rango_referencia": {
-                            "min": rango_min,
-                            "max": rango_max
-                        }
-                    })
+                    processed_data["datos_estructurados"].append(
+                        ExamResult(current_category, nombre, valor_float, unidad, rango_min, rango_max)
+                    )
                 except ValueError:
                     continue
         
-        print("Procesando conclusiones y recomendaciones...")
         # Procesar conclusiones y recomendaciones
-        conclusiones_match = re.search(r'(?i)conclusi[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:recomendaci|$))', processed_text, re.DOTALL)
-        if conclusiones_match:
-            processed_data["conclusiones"] = conclusiones_match.group(1).strip()
-            
-        recomendaciones_match = re.search(r'(?i)recomendaci[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:firma|$))', processed_text, re.DOTALL)
-        if recomendaciones_match:
-            processed_data["recomendaciones"] = recomendaciones_match.group(1).strip()
+        sections = SectionIndex(processed_text)
+        processed_data["conclusiones"] = sections.section(("conclusiones",), until=("recomendaciones",))
+        processed_data["recomendaciones"] = sections.section(("recomendaciones",), until=("firma",))
         
-        print("Guardando resultado en caché...")
         # Guardar en caché
-        cache.set(text_hash, processed_data)
-        print("Procesamiento completado")
-        return processed_data
+        await cache.set(text_hash, processed_data)
+        count_analysis("modelo", start)
+        return processed_data, "modelo"
         
     except Exception as e:
-        print(f"Error en procesamiento con IA: {str(e)}")
-        print("Cambiando a procesamiento basado en reglas...")
-        return process_text_with_rules(text)  # Fallback a reglas si falla la IA
-
-def flatten_structured_data(ai_response: Dict) -> List[Dict]:
-    """Convierte la respuesta estructurada en el formato esperado por el frontend."""
-    if not ai_response:
-        return []
-        
-    # Los datos ya vienen estructurados en el formato correcto
-    return ai_response.get("datos_estructurados", [])
+        logger.warning(f"Error en procesamiento con IA, se usan las reglas: {type(e).__name__}: {str(e)}")
+        with track("reglas"):
+            result = await execution.run("rules", process_text_with_rules, text)  # Fallback a reglas si falla la IA
+        count_analysis("reglas", start)
+        return result, "reglas"
+
+async def process_document(contents: bytes, content_type: str,
+                           progress: Optional[ProgressCallback] = None,
+                           wait: bool = False) -> Dict[str, Any]:
+    """Extrae y procesa un documento ya leído, devolviendo la respuesta completa.
+
+    Si el mismo archivo ya se procesó, se devuelve el resultado guardado sin
+    volver a extraer el texto; si se está procesando, se espera ese resultado.
+    Si el carril del documento está saturado se lanza un 429, salvo con
+    `wait=True`, que espera turno.
+    """
+    document_key = get_document_key(contents)
+    cached_response = await cache.get(document_key)
+    if cached_response:
+        return cached_response
+
+    # Subidas idénticas simultáneas esperan al mismo procesamiento (y solo la
+    # primera recibe el progreso por páginas)
+    try:
+        return await document_flight.do(
+            document_key, lambda: _process_new_document(document_key, contents, content_type, progress, wait)
+        )
+    except Overloaded as e:
+        raise server_overloaded(e)
+
+async def _process_new_document(document_key: str, contents: bytes, content_type: str,
+                                progress: Optional[ProgressCallback] = None,
+                                wait: bool = False) -> Dict[str, Any]:
+    """Procesa un documento que no está en caché y guarda el resultado si no es de las reglas de respaldo."""
+    async with admission.admit(document_lane(contents, content_type), wait=wait):
+        text = await extract_text_from_contents(contents, content_type, progress)
+    processed_data, path = await process_with_ai(text)
+    if not processed_data:
+        raise HTTPException(
+            status_code=500,
+            detail="Error al procesar el texto"
+        )
+    response = build_extraction_response(text, processed_data)
+    # El resultado de las reglas por un fallo del modelo no se guarda: si se
+    # vuelve a subir el documento se intenta otra vez con el modelo
+    if path != "reglas":
+        await cache.set(document_key, response)
+    save_history(document_key, response)
+    return response
+
+async def _record_history(document_key: str, response: Dict[str, Any]):
+    try:
+        await execution.run("history", history.record, document_key, response)
+    except Exception as e:
+        logger.error(f"Error al guardar el historial del documento: {str(e)}")
+
+def save_history(document_key: str, response: Dict[str, Any]):
+    """Guarda los resultados en el historial en segundo plano, sin retrasar la respuesta.
+
+    Solo se llama al procesar un documento, no en los aciertos de caché: lo que
+    está en caché ya se guardó al procesarlo.
+    """
+    if history is None:
+        return
+    task = asyncio.create_task(_record_history(document_key, response))
+    history_tasks.add(task)
+    task.add_done_callback(history_tasks.discard)
+
+# "completo" devuelve también el texto del documento; "ligero" lo omite y
+# envía los resultados como filas (ver backend/responses.py)
+Modo = Literal["completo", "ligero"]
+
+def json_response(content: Any, request: Optional[Request] = None, modo: Modo = MODO_COMPLETO) -> Response:
+    """Serializa la respuesta aquí para medir el tiempo de serialización."""
+    with track("serializacion"):
+        accept_encoding = request.headers.get("accept-encoding", "") if request is not None else ""
+        body, headers = encode(render(content, modo), accept_encoding)
+        return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/api/extract-text")
-async def extract_text(file: UploadFile = File(...)):
+async def extract_text(request: Request, file: UploadFile = File(...), modo: Modo = MODO_COMPLETO):
     """Endpoint para extraer y procesar texto de archivos."""
-    print("Iniciando extracción de texto...")
     if not validate_file(file):
         raise HTTPException(
             status_code=400,
@@ -670,73 +663,323 @@ async def extract_text(file: UploadFile = File(...)):
         )
     
     try:
-        # Extraer texto
-        print(f"Procesando archivo de tipo: {file.content_type}")
-        if file.content_type == "application/pdf":
-            text = await extract_text_from_pdf(file)
-        else:
-            text = await extract_text_from_image(file)
-            
-        print(f"Texto extraído: {text[:200]}...")  # Mostrar primeros 200 caracteres
-        
-        # Procesar con IA
-        print("Iniciando procesamiento con IA...")
-        processed_data = await process_with_ai(text)
-        if not processed_data:
-            raise HTTPException(
-                status_code=500,
-                detail="Error al procesar el texto"
-            )
-            
-        print("Procesamiento completado, enviando respuesta...")
-        return {
-            "texto_original": text,
-            "texto_limpio": text.strip(),
-            "titulo_examen": processed_data.get("titulo_examen", "Análisis de Laboratorio"),
-            "info_paciente": processed_data.get("info_paciente", {}),
-            "info_medica": processed_data.get("info_medica", {}),
-            "datos_estructurados": processed_data.get("datos_estructurados", []),
-            "conclusiones": processed_data.get("conclusiones", ""),
-            "recomendaciones": processed_data.get("recomendaciones", "")
-        }
+        logger.debug("Procesando archivo de tipo: %s", file.content_type)
+        contents = await read_upload(file)
+        response = await process_document(contents, file.content_type)
+        return json_response(response, request, modo)
     
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error en el procesamiento: {str(e)}")
+        logger.error(f"Error en el procesamiento: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error al procesar el archivo: {str(e)}"
         )
 
+async def _process_batch_item(semaphore: asyncio.Semaphore, index: int, filename: str, content_type: str,
+                              contents: Optional[bytes], error: str) -> Dict[str, Any]:
+    """Procesa un archivo del lote y devuelve su registro NDJSON.
+
+    El lote ya pasó la admisión como una unidad: sus archivos esperan turno en
+    el carril (sin rechazos entre ellos) y el semáforo del lote limita cuántos
+    ocupan o esperan un hueco a la vez.
+    """
+    record = {"indice": index, "archivo": filename}
+    if error:
+        record.update({"ok": False, "error": error})
+        return record
+    try:
+        async with semaphore:
+            record.update({"ok": True, "resultado": await process_document(contents, content_type, wait=True)})
+    except HTTPException as e:
+        record.update({"ok": False, "error": e.detail})
+    except Exception as e:
+        logger.error(f"Error procesando {filename} en lote: {str(e)}")
+        record.update({"ok": False, "error": f"Error al procesar el archivo: {str(e)}"})
+    return record
+
+@app.post("/api/extract-text/batch")
+async def extract_text_batch(files: List[UploadFile] = File(...), modo: Modo = MODO_COMPLETO):
+    """Procesa varios archivos en paralelo y transmite un registro NDJSON por archivo.
+
+    Cada línea se envía en cuanto termina su archivo, sin esperar a los demás.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten como máximo {MAX_BATCH_FILES} archivos por lote"
+        )
+
+    # Leer todo antes de responder: los UploadFile pueden cerrarse al iniciar el streaming
+    items = []
+    for index, file in enumerate(files):
+        if not validate_file(file):
+            items.append((index, file.filename, file.content_type, None, "Tipo de archivo no permitido"))
+            continue
+        try:
+            items.append((index, file.filename, file.content_type, await read_upload(file), ""))
+        except HTTPException as e:
+            items.append((index, file.filename, file.content_type, None, e.detail))
+
+    # El lote se admite una sola vez, antes de empezar: si un carril que necesita
+    # está saturado se rechaza entero con 429
+    try:
+        for lane in {document_lane(contents, content_type) for _, _, content_type, contents, error in items
+                     if not error}:
+            admission.check(lane)
+    except Overloaded as e:
+        raise server_overloaded(e)
+
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+    async def stream_results():
+        tasks = [asyncio.ensure_future(_process_batch_item(semaphore, *item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                record = await next_done
+                with track("serializacion"):
+                    if record["ok"]:
+                        record["resultado"] = render(record["resultado"], modo)
+                    line = dumps(record) + b"\n"
+                yield line
+        finally:
+            # Si el cliente se desconecta, no seguir procesando el resto del lote
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+async def run_job(job: Job, contents: bytes):
+    """Procesa el documento de un trabajo e informa de su progreso."""
+    job.start()
+    try:
+        # Los trabajos ya están limitados por JOBS_MAX: esperan turno en vez de fallar
+        job.complete(await process_document(contents, job.content_type, progress=job.progress, wait=True))
+    except HTTPException as e:
+        job.fail(str(e.detail))
+    except Exception as e:
+        logger.error(f"Error en el trabajo {job.id}: {str(e)}")
+        job.fail(f"Error al procesar el archivo: {str(e)}")
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """Crea un trabajo de extracción y devuelve su id sin esperar al resultado."""
+    if not validate_file(file):
+        raise HTTPException(
+            status_code=400,
+            detail="Tipo de archivo no permitido"
+        )
+    contents = await read_upload(file)
+    try:
+        job = jobs.create(file.filename, file.content_type)
+    except JobStoreFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    task = asyncio.create_task(run_job(job, contents))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return {"id": job.id, "estado": job.state, "eventos": f"/jobs/{job.id}/events"}
+
+def get_job_or_404(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o vencido")
+    return job
+
+def job_data(data: Dict[str, Any], modo: Modo) -> Dict[str, Any]:
+    if "resultado" in data:
+        data = {**data, "resultado": render(data["resultado"], modo)}
+    return data
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, modo: Modo = MODO_COMPLETO):
+    """Estado, progreso y, al terminar, resultado de un trabajo."""
+    return json_response(job_data(get_job_or_404(job_id).to_dict(), modo), request)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, modo: Modo = MODO_COMPLETO):
+    """Transmite como Server-Sent Events el progreso de un trabajo hasta su resultado o error."""
+    job = get_job_or_404(job_id)
+
+    async def stream_events():
+        queue = job.subscribe()
+        try:
+            # Estado actual primero, por si el trabajo avanzó o terminó antes de suscribirse
+            if job.finished:
+                yield sse_event(job.state, job_data(job.to_dict(include_result=job.state == COMPLETADO), modo))
+                return
+            yield sse_event("estado", job.to_dict(include_result=False))
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), JOBS_SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(event, job_data(data, modo))
+                if event in FINALES:
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/health")
 async def health_check():
     """Endpoint para verificar el estado de la API."""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "ocr": ocr_backend_name(),
+        "inferencia": {**inference_client.stats(), "lotes": inference_batcher.stats()},
+        "trabajos": jobs.stats(),
+        "admision": admission.stats(),
+        "etapas": execution.stats(),
+        "historial": history.stats() if history is not None else None,
+        "plantillas": lab_templates.stats(),
+    }
+
+def get_history_or_404() -> HistoryStore:
+    if history is None:
+        raise HTTPException(status_code=404, detail="El historial de resultados no está activado")
+    return history
+
+@app.get("/api/patients/{patient_id}/series")
+async def patient_series(patient_id: str, examen: str, desde: Optional[str] = None,
+                         hasta: Optional[str] = None, unidad: str = ""):
+    """Serie temporal de un examen del paciente, con fechas ISO (aaaa-mm-dd) como límites opcionales."""
+    store = get_history_or_404()
+    return await execution.run("history", store.series, patient_id, examen, desde, hasta, unidad)
+
+@app.get("/api/patients/{patient_id}/out-of-range")
+async def patient_out_of_range(patient_id: str, desde: Optional[str] = None, hasta: Optional[str] = None,
+                               limite: int = 500):
+    """Resultados fuera de rango del paciente, del más reciente al más antiguo."""
+    store = get_history_or_404()
+    return {"paciente": patient_id,
+            "resultados": await execution.run("history", store.out_of_range, patient_id, desde, hasta, limite)}
+
+@app.get("/api/patients/{patient_id}/summary")
+async def patient_summary(patient_id: str):
+    """Resumen por examen de todo el historial del paciente."""
+    store = get_history_or_404()
+    return {"paciente": patient_id, "examenes": await execution.run("history", store.summary, patient_id)}
+
+@app.get("/api/ready")
+async def ready_check():
+    """Readiness por subsistema: 200 si los obligatorios están listos y 503 si no."""
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["listo"] else 503, content=report)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Endpoint con las estadísticas de uso de la caché y de las peticiones agrupadas."""
+    return {**cache.stats(), "coalescencia": document_flight.stats()}
+
+def _cache_levels() -> Dict[str, Dict[str, Any]]:
+    stats = cache.stats()
+    return stats if "memoria" in stats else {"memoria": stats}
+
+def _fallback_ratio() -> Dict[Tuple[str, ...], float]:
+    model, rules = analysis_total.value("modelo"), analysis_total.value("reglas")
+    return {(): rules / (model + rules) if model + rules else 0.0}
+
+metrics_registry.gauge(
+    "medscan_cache_lookups_total", "Consultas a la caché de resultados", ("nivel", "resultado"),
+    lambda: {
+        key: value
+        for level, stats in _cache_levels().items()
+        for key, value in (((level, "acierto"), stats["aciertos"]), ((level, "fallo"), stats["fallos"]))
+    },
+    kind="counter",
+)
+metrics_registry.gauge(
+    "medscan_cache_hit_ratio", "Proporción de aciertos de la caché", ("nivel",),
+    lambda: {(level,): stats["tasa_aciertos"] for level, stats in _cache_levels().items()},
+)
+metrics_registry.gauge(
+    "medscan_inference_fallback_ratio", "Proporción de textos analizados con las reglas por fallo del modelo", (),
+    _fallback_ratio,
+)
+metrics_registry.gauge(
+    "medscan_template_lookups_total", "Textos buscados entre las plantillas de laboratorio por resultado",
+    ("resultado",),
+    lambda: {
+        ("acierto",): lab_templates.stats()["aciertos"],
+        ("sin_plantilla",): lab_templates.misses,
+        ("fallo",): lab_templates.failures,
+    },
+    kind="counter",
+)
+metrics_registry.gauge(
+    "medscan_template_hit_ratio", "Proporción de textos extraídos con una plantilla de laboratorio", (),
+    lambda: {(): lab_templates.stats()["tasa_aciertos"]},
+)
+metrics_registry.gauge(
+    "medscan_stage_active", "Tareas en ejecución por etapa del pool de trabajo", ("etapa",),
+    lambda: {(stage,): stats["activos"] for stage, stats in execution.stats().items()},
+)
+metrics_registry.gauge(
+    "medscan_stage_queued", "Tareas esperando turno por etapa del pool de trabajo", ("etapa",),
+    lambda: {(stage,): stats["en_cola"] for stage, stats in execution.stats().items()},
+)
+metrics_registry.gauge(
+    "medscan_admission_active", "Documentos en proceso por carril de admisión", ("carril",),
+    lambda: {(lane,): stats["activos"] for lane, stats in admission.stats().items()},
+)
+metrics_registry.gauge(
+    "medscan_admission_queue_depth", "Documentos esperando turno por carril de admisión", ("carril",),
+    lambda: {(lane,): stats["en_cola"] for lane, stats in admission.stats().items()},
+)
+metrics_registry.gauge(
+    "medscan_admission_rejected_total", "Peticiones rechazadas con 429 por carril de admisión", ("carril",),
+    lambda: {(lane,): stats["rechazadas"] for lane, stats in admission.stats().items()},
+    kind="counter",
+)
+metrics_registry.gauge(
+    "medscan_coalesced_requests_total", "Documentos procesados y peticiones idénticas agrupadas", ("tipo",),
+    lambda: {("ejecutadas",): document_flight.executed, ("agrupadas",): document_flight.coalesced},
+    kind="counter",
+)
+metrics_registry.gauge(
+    "medscan_inference_batch_size_mean", "Tamaño medio de los lotes enviados al modelo", (),
+    lambda: {(): inference_batcher.stats()["tamano_medio"]},
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/process")
-async def process_file(file: UploadFile = File(...)):
+async def process_file(request: Request, file: UploadFile = File(...), modo: Modo = MODO_COMPLETO):
     """Endpoint para procesar archivos."""
     try:
-        logger.info(f"Iniciando procesamiento de archivo: {file.filename}")
+        logger.debug("Iniciando procesamiento de archivo")
         
         # Leer contenido del archivo
-        content = await file.read()
+        content = await read_upload(file)
         
-        # Determinar el tipo de archivo y extraer texto
+        # Determinar el tipo de archivo, extraer y procesar el texto
         if file.filename.lower().endswith('.pdf'):
-            logger.info("Procesando archivo PDF")
-            text = await extract_text_from_pdf(file)
+            logger.debug("Procesando archivo PDF")
+            content_type = "application/pdf"
         else:
-            logger.info("Procesando archivo de imagen")
-            text = await extract_text_from_image(file)
-        
-        logger.info(f"Texto extraído (preview): {text[:200]}...")
+            logger.debug("Procesando archivo de imagen")
+            content_type = "image"
+        response = await process_document(content, content_type)
+        results = {key: value for key, value in response.items() if key not in ("texto_original", "texto_limpio")}
         
-        # Procesar el texto
-        results = await process_with_ai(text)
-        
-        logger.info("Procesamiento completado exitosamente")
-        return results
+        logger.debug("Procesamiento completado exitosamente")
+        return json_response(results, request, modo)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en el procesamiento: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""Métricas del servicio en formato de texto de Prometheus.
+
+Los contadores e histogramas viven en memoria del worker y se exponen en
+`/metrics`. Registrar una observación solo toma un lock y suma a unos pocos
+enteros, así que se puede hacer en cada etapa de cada petición.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Límites superiores en segundos de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Contador acumulado por combinación de etiquetas."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulado por combinación de etiquetas."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> (cuentas por intervalo, suma, total)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        with self._lock:
+            for labels, (counts, total_sum, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (repr(bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total_sum}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Valores calculados en el momento de exponer las métricas.
+
+    `collect` devuelve un valor por combinación de etiquetas. Con
+    `kind="counter"` sirve para exponer contadores que ya lleva otro componente
+    (p. ej. los aciertos de la caché).
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas que se exponen juntas."""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str],
+              collect: Callable[[], Dict[Tuple[str, ...], float]], kind: str = "gauge") -> Gauge:
+        metric = Gauge(name, help_text, label_names, collect, kind)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "medscan_stage_seconds", "Duración de cada etapa del procesamiento en segundos", ("etapa",)
+)
+stage_errors = registry.counter(
+    "medscan_stage_errors_total", "Etapas terminadas con excepción", ("etapa",)
+)
+analysis_total = registry.counter(
+    "medscan_analysis_total",
+    "Textos analizados según el camino que produjo el resultado (cache, plantilla, modelo, reglas)",
+    ("camino",)
+)
+analysis_seconds = registry.histogram(
+    "medscan_analysis_seconds", "Duración del análisis de un texto en segundos según el camino que produjo el resultado",
+    ("camino",)
+)
+
+
+@contextmanager
+def track(stage: str) -> Iterator[None]:
+    """Mide la duración del bloque como una observación de la etapa `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        stage_seconds.observe(stage, value=time.perf_counter() - start)
@@ -0,0 +1,225 @@
+"""Normalización de texto, unidades y rangos de referencia.
+
+- Texto: `preprocess_text` y `clean_text` colapsan los espacios y aplican de una
+  vez los borrados y reemplazos de cada carácter con tablas precalculadas
+  (bytes.translate para ASCII y una tabla memorizada para el resto), en lugar de
+  una cadena de `str.replace` y `re.sub` por documento. El resultado es el mismo
+  que con las expresiones anteriores y se memoriza por texto.
+- Unidades: `canonical_unit` reduce las variantes de escritura ("mg/dl", "uL",
+  "UI/L"...) a una forma canónica y `convert` pasa valores entre unidades
+  compatibles, también de masa a molar (mg/dL <-> mmol/L) con la masa molar del
+  analito.
+- Rangos: `parse_range` lee ``12-16``, ``12,0 – 16,0``, ``<200``, ``hasta 5``...
+  a (mínimo, máximo).
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", 64))  # textos memorizados
+
+_PERMITIDOS = ".,;:()/-"
+_NO_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+class CharTable:
+    """Reemplazos por carácter: se borra lo que no es alfanumérico, '_', espacio o
+    `_PERMITIDOS` (como ``[^\\w\\s.,;:()/-]``) y se aplican `replacements`.
+
+    La parte ASCII se precalcula como tabla de bytes.translate, que trabaja
+    sobre el UTF-8 sin tocar los caracteres multibyte; los demás caracteres se
+    resuelven la primera vez que aparecen y se guardan.
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        self.replacements = dict(replacements)
+        table = bytearray(range(256))
+        delete = bytearray()
+        for code in range(128):
+            char = chr(code)
+            new = self._resolve(char)
+            if not new:
+                delete.append(code)
+            elif new != char:
+                table[code] = ord(new)
+        self._ascii_table = bytes(table)
+        self._ascii_delete = bytes(delete)
+        self._other: Dict[str, str] = {}
+
+    def _resolve(self, char: str) -> str:
+        if char in self.replacements:
+            return self.replacements[char]
+        if char.isalnum() or char == "_" or char.isspace() or char in _PERMITIDOS:
+            return char
+        return ""
+
+    def apply(self, text: str) -> str:
+        text = (
+            text.encode("utf-8", "surrogatepass")
+            .translate(self._ascii_table, self._ascii_delete)
+            .decode("utf-8", "surrogatepass")
+        )
+        if text.isascii():
+            return text
+        for char in set(_NO_ASCII.findall(text)):
+            new = self._other.get(char)
+            if new is None:
+                new = self._other[char] = self._resolve(char)
+            if new != char:
+                text = text.replace(char, new)
+        return text
+
+
+# Tildes y eñe (solo minúsculas, como antes) para el texto que se envía al modelo
+_PREPROCESO = CharTable({"á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u", "ñ": "n"})
+# Confusiones típicas del OCR de dígitos por letras
+_LIMPIEZA = CharTable({"0": "O", "1": "I", "5": "S"})
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def preprocess_text(text: str) -> str:
+    """Preprocesa el texto para mejorar la detección."""
+    # Los espacios se colapsan antes de borrar: un símbolo borrado entre dos
+    # espacios deja los dos, igual que con las expresiones anteriores
+    return _PREPROCESO.apply(" ".join(text.split())).strip()
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def clean_text(text: str) -> str:
+    """Limpia el texto extraído."""
+    return _LIMPIEZA.apply(" ".join(text.split())).strip()
+
+
+# Variante en minúsculas -> unidad canónica
+UNIDADES_CANONICAS: Dict[str, str] = {
+    "mg/dl": "mg/dL", "mg%": "mg/dL", "g/dl": "g/dL", "g/l": "g/L", "mg/l": "mg/L",
+    "mmol/l": "mmol/L", "µmol/l": "µmol/L", "μmol/l": "µmol/L", "umol/l": "µmol/L",
+    "meq/l": "mEq/L", "u/l": "U/L", "ui/l": "U/L", "iu/l": "U/L", "mu/l": "mU/L", "mui/l": "mU/L",
+    "µl": "µL", "μl": "µL", "ul": "µL", "/µl": "/µL", "/μl": "/µL", "/ul": "/µL",
+    "millones/µl": "millones/µL", "millones/μl": "millones/µL", "millones/ul": "millones/µL",
+    "/mm3": "/mm3", "/mm³": "/mm3", "mm3": "mm3", "mm³": "mm3",
+    "/dl": "/dL", "/l": "/L", "/ml": "/mL",
+}
+
+# Unidad canónica -> (magnitud, factor a la unidad base de la magnitud)
+MAGNITUDES: Dict[str, Tuple[str, float]] = {
+    "g/L": ("masa", 1.0), "g/dL": ("masa", 10.0), "mg/dL": ("masa", 0.01), "mg/L": ("masa", 0.001),
+    "mmol/L": ("molar", 1.0), "µmol/L": ("molar", 0.001),
+    "mEq/L": ("equivalentes", 1.0),
+    "/µL": ("recuento", 1.0), "/mm3": ("recuento", 1.0), "millones/µL": ("recuento", 1e6),
+    "/L": ("recuento", 1e-6), "/mL": ("recuento", 1e-3), "/dL": ("recuento", 1e-4),
+    "U/L": ("actividad", 1.0),
+}
+
+# Analito (sin tildes, en minúsculas) -> masa molar en g/mol
+MASAS_MOLARES: Dict[str, float] = {
+    "glucosa": 180.16, "colesterol": 386.65, "trigliceridos": 885.7, "creatinina": 113.12,
+    "urea": 60.06, "acido urico": 168.11, "bilirrubina": 584.66, "calcio": 40.08, "sodio": 22.99,
+    "potasio": 39.10, "cloro": 35.45, "magnesio": 24.31, "fosforo": 30.97, "hierro": 55.85,
+}
+
+# Analito -> valencia, para pasar de mEq/L a mmol/L
+VALENCIAS: Dict[str, int] = {"sodio": 1, "potasio": 1, "cloro": 1, "bicarbonato": 1, "calcio": 2, "magnesio": 2}
+
+# Analitos conocidos, los de nombre más largo primero
+_ANALITOS = tuple(sorted({**MASAS_MOLARES, **VALENCIAS}, key=len, reverse=True))
+
+
+@lru_cache(maxsize=1024)
+def canonical_unit(unit: str) -> str:
+    """Forma canónica de una unidad; las desconocidas se devuelven sin espacios en los extremos."""
+    unit = unit.strip()
+    return UNIDADES_CANONICAS.get(unit.lower(), unit)
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """Nombre de un examen en minúsculas, sin tildes ni símbolos y con los espacios colapsados."""
+    return _PREPROCESO.apply(" ".join(name.lower().split())).strip()
+
+
+@lru_cache(maxsize=1024)
+def analyte_key(name: str) -> str:
+    """Analito conocido que aparece en el nombre de un examen ("Colesterol total" -> "colesterol"), o ""."""
+    words = f" {normalize_name(name)} "
+    for analyte in _ANALITOS:
+        if f" {analyte} " in words:
+            return analyte
+    return ""
+
+
+def convert(value: float, unit: str, target: str, analyte: str = "") -> Optional[float]:
+    """Convierte `value` de `unit` a `target`, o devuelve None si no son compatibles.
+
+    Entre masa y concentración molar hace falta la masa molar del analito, y
+    entre equivalentes y molar su valencia.
+    """
+    unit, target = canonical_unit(unit), canonical_unit(target)
+    if unit == target:
+        return value
+    if unit not in MAGNITUDES or target not in MAGNITUDES:
+        return None
+    (source_kind, source_factor), (target_kind, target_factor) = MAGNITUDES[unit], MAGNITUDES[target]
+    base = value * source_factor
+    analyte = analyte_key(analyte) if analyte else ""
+    if source_kind != target_kind:
+        # Se pasa por mmol/L como magnitud común
+        molar = _to_molar(base, source_kind, analyte)
+        base = None if molar is None else _from_molar(molar, target_kind, analyte)
+        if base is None:
+            return None
+    return base / target_factor
+
+
+def _to_molar(base: float, kind: str, analyte: str) -> Optional[float]:
+    if kind == "molar":
+        return base
+    if kind == "masa" and analyte in MASAS_MOLARES:
+        return base / MASAS_MOLARES[analyte] * 1000
+    if kind == "equivalentes" and analyte in VALENCIAS:
+        return base / VALENCIAS[analyte]
+    return None
+
+
+def _from_molar(molar: float, kind: str, analyte: str) -> Optional[float]:
+    if kind == "molar":
+        return molar
+    if kind == "masa" and analyte in MASAS_MOLARES:
+        return molar * MASAS_MOLARES[analyte] / 1000
+    if kind == "equivalentes" and analyte in VALENCIAS:
+        return molar * VALENCIAS[analyte]
+    return None
+
+
+_NUMERO = re.compile(r"\d+(?:[.,]\d+)?")
+# Texto entre los dos números de un rango cerrado
+_SEPARADORES = {"-", "–", "—", "a", "..."}
+# Texto delante del único número -> límite que fija
+_COMPARADORES = (
+    ("<=", "max"), ("≤", "max"), ("<", "max"), ("hasta", "max"), ("menor a", "max"), ("menor de", "max"),
+    (">=", "min"), ("≥", "min"), (">", "min"), ("desde", "min"), ("mayor a", "min"), ("mayor de", "min"),
+)
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+@lru_cache(maxsize=4096)
+def parse_range(text: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Lee un rango de referencia como (mínimo, máximo); lo que no se reconoce queda en None."""
+    if not text:
+        return None, None
+    numbers = list(_NUMERO.finditer(text))
+    if len(numbers) == 2:
+        first, second = numbers
+        if text[first.end():second.start()].strip().lower() in _SEPARADORES:
+            return _number(first.group()), _number(second.group())
+    elif len(numbers) == 1:
+        prefix = text[:numbers[0].start()].strip().lower()
+        for comparator, bound in _COMPARADORES:
+            if prefix == comparator:
+                value = _number(numbers[0].group())
+                return (None, value) if bound == "max" else (value, None)
+    return None, None
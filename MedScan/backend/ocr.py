@@ -0,0 +1,256 @@
+"""Motores de OCR: un pool de motores Tesseract ya inicializados y pytesseract como respaldo.
+
+pytesseract lanza un proceso `tesseract` por imagen que vuelve a cargar
+`spa.traineddata` cada vez; con imágenes pequeñas ese arranque cuesta tanto
+como el propio OCR. Con `tesserocr` instalado, cada proceso de trabajo mantiene
+un pool de motores con el idioma ya cargado y los reutiliza entre llamadas.
+
+Como el resto de la extracción, este módulo no depende de FastAPI para que los
+procesos del pool de trabajo puedan importarlo, y carga pytesseract, tesserocr y
+Pillow solo al usarlos.
+"""
+import importlib.util
+import logging
+import os
+import queue
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Configurar la ruta de Tesseract y el directorio de datos.
+# Se hace aquí para que cada proceso trabajador herede la misma configuración.
+TESSERACT_PATH = r'C:\Program Files\Tesseract-OCR'
+os.environ['TESSDATA_PREFIX'] = os.path.join(TESSERACT_PATH, 'tessdata')
+# tesserocr es una dependencia opcional
+TESSEROCR_INSTALLED = importlib.util.find_spec("tesserocr") is not None
+
+_pytesseract = None
+
+
+def load_pytesseract():
+    """Importa pytesseract la primera vez y le indica dónde está el ejecutable."""
+    global _pytesseract
+    if _pytesseract is None:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = os.path.join(TESSERACT_PATH, 'tesseract.exe')
+        _pytesseract = pytesseract
+    return _pytesseract
+
+OCR_LANG = "spa"
+# Modo de segmentación de página de Tesseract (3 = automático, 4 = una columna, 6 = un bloque)
+OCR_PSM = int(os.getenv("OCR_PSM", 3))
+# auto: tesserocr si está instalado y, si no, pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", 1))  # motores por proceso de trabajo
+OCR_HEALTH_CHECK_EVERY = int(os.getenv("OCR_HEALTH_CHECK_EVERY", 200))  # usos entre comprobaciones
+
+
+def tesseract_config(psm: int = OCR_PSM) -> str:
+    """Opciones de línea de comandos de Tesseract."""
+    return f"--psm {psm}"
+
+
+class PytesseractEngine:
+    """OCR con un proceso `tesseract` nuevo por imagen."""
+
+    name = "pytesseract"
+
+    def recognize(self, image: "Image.Image", psm: int = OCR_PSM) -> str:
+        return load_pytesseract().image_to_string(image, lang=OCR_LANG, config=tesseract_config(psm))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"motor": self.name}
+
+
+class TesserocrEngine:
+    """Motor de Tesseract cargado en memoria con el idioma ya inicializado."""
+
+    def __init__(self):
+        import tesserocr
+
+        self._api = tesserocr.PyTessBaseAPI(path=os.environ['TESSDATA_PREFIX'], lang=OCR_LANG)
+        self.uses = 0
+
+    def recognize(self, image: "Image.Image", psm: int = OCR_PSM) -> str:
+        self.uses += 1
+        try:
+            self._api.SetPageSegMode(psm)
+            self._api.SetImage(image)
+            return self._api.GetUTF8Text()
+        finally:
+            self._api.Clear()
+
+    def healthy(self) -> bool:
+        """Comprueba que el motor responde con una imagen en blanco."""
+        from PIL import Image
+
+        try:
+            self._api.SetImage(Image.new("L", (32, 32), 255))
+            self._api.GetUTF8Text()
+            self._api.Clear()
+            return self._api.GetInitLanguagesAsString() == OCR_LANG
+        except Exception:
+            return False
+
+    def close(self):
+        self._api.End()
+
+
+class EnginePool:
+    """Pool de motores reutilizables de un proceso.
+
+    Los motores se crean al necesitarse, hasta `size`. Un motor que falla se
+    descarta y se crea otro; cada `health_check_every` usos se comprueba antes
+    de entregarlo.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, size: int = OCR_POOL_SIZE, health_check_every: int = OCR_HEALTH_CHECK_EVERY):
+        self.size = max(1, size)
+        self.health_check_every = health_check_every
+        self._idle: "queue.LifoQueue[TesserocrEngine]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.replaced = 0
+
+    def _acquire(self) -> TesserocrEngine:
+        with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return TesserocrEngine()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        engine = self._idle.get()
+        if self.health_check_every and engine.uses and engine.uses % self.health_check_every == 0:
+            if not engine.healthy():
+                logger.warning("Motor de OCR sin respuesta; se reemplaza")
+                return self._replace(engine)
+        return engine
+
+    def _replace(self, engine: TesserocrEngine) -> TesserocrEngine:
+        self.replaced += 1
+        try:
+            engine.close()
+        except Exception:
+            pass
+        try:
+            return TesserocrEngine()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def recognize(self, image: "Image.Image", psm: int = OCR_PSM) -> str:
+        engine = self._acquire()
+        try:
+            text = engine.recognize(image, psm)
+        except Exception:
+            # El motor puede haber quedado en mal estado: se descarta
+            with self._lock:
+                self._created -= 1
+            self.replaced += 1
+            try:
+                engine.close()
+            except Exception:
+                pass
+            raise
+        self._idle.put(engine)
+        return text
+
+    def warm_up(self):
+        """Crea los motores que faltan hasta llenar el pool."""
+        engines = []
+        while self._created < self.size:
+            engines.append(self._acquire())
+        for engine in engines:
+            self._idle.put(engine)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+        self._created = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "motor": self.name,
+            "motores": self._created,
+            "libres": self._idle.qsize(),
+            "max_motores": self.size,
+            "reemplazados": self.replaced,
+        }
+
+
+_engine: Optional[Any] = None
+_engine_lock = threading.Lock()
+
+
+def backend_name() -> str:
+    """Motor que se usará en este proceso según OCR_BACKEND y las dependencias instaladas."""
+    if OCR_BACKEND == "pytesseract" or (OCR_BACKEND == "auto" and not TESSEROCR_INSTALLED):
+        return PytesseractEngine.name
+    return EnginePool.name
+
+
+def get_engine():
+    """Devuelve el motor de OCR del proceso, creándolo la primera vez."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if backend_name() == EnginePool.name:
+                    if not TESSEROCR_INSTALLED:
+                        raise RuntimeError("OCR_BACKEND=tesserocr requiere instalar el paquete tesserocr")
+                    _engine = EnginePool()
+                else:
+                    _engine = PytesseractEngine()
+    return _engine
+
+
+def image_to_text(image: "Image.Image", psm: int = OCR_PSM) -> str:
+    """Aplica OCR en español a una imagen con el motor configurado."""
+    engine = get_engine()
+    if isinstance(engine, EnginePool) and OCR_BACKEND == "auto":
+        try:
+            return engine.recognize(image, psm)
+        except Exception as e:
+            # En modo automático se recurre a pytesseract si el pool no funciona
+            logger.warning(f"Error en el motor de OCR en memoria, se usa pytesseract: {str(e)}")
+            return PytesseractEngine().recognize(image, psm)
+    return engine.recognize(image, psm)
+
+
+def warm_up():
+    """Carga los motores de OCR del proceso antes de la primera imagen.
+
+    Se usa como inicializador de los trabajadores de CPU; un error no impide que
+    el trabajador arranque, el motor se volverá a intentar crear al usarse.
+    """
+    try:
+        engine = get_engine()
+        if isinstance(engine, EnginePool):
+            engine.warm_up()
+    except Exception as e:
+        logger.error(f"Error al cargar los motores de OCR: {str(e)}")
+
+
+def check_tesseract() -> str:
+    """Comprueba que Tesseract responde y devuelve su versión (comprobación de arranque)."""
+    engine = get_engine()
+    if isinstance(engine, EnginePool):
+        engine.warm_up()
+        import tesserocr
+
+        return f"tesserocr {tesserocr.tesseract_version().splitlines()[0]}"
+    return f"tesseract {load_pytesseract().get_tesseract_version()}"
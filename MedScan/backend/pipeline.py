@@ -0,0 +1,199 @@
+"""Análisis de un documento sin dependencias del servidor.
+
+Reúne lo que comparten la API (backend/main.py) y la ingesta masiva
+(backend/ingest.py): las plantillas de laboratorio, las versiones y claves de
+caché, el procesamiento por reglas y el armado de la respuesta. Importarlo no
+crea la aplicación, el cliente del modelo, la caché ni el historial, así que
+los procesos de trabajo de la ingesta lo cargan sin levantar el servidor.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from .exam_lines import iter_exam_candidates
+from .extraction import EXTRACTOR_VERSION
+from .fields import header_matcher, medical_matcher, patient_matcher
+from .normalization import canonical_unit, parse_range
+from .responses import ExamResult
+from .sections import conclusions_and_recommendations
+from .templates import TemplateRegistry
+
+logger = logging.getLogger(__name__)
+
+# Extensiones de archivo admitidas
+ALLOWED_EXTENSIONS = json.loads(os.getenv("ALLOWED_EXTENSIONS", '["pdf","jpg","jpeg","png"]'))
+
+# Plantillas de laboratorios conocidos (ver backend/templates.py)
+LAB_TEMPLATES_PATH = os.getenv("LAB_TEMPLATES_PATH", "")
+lab_templates = TemplateRegistry([])
+if LAB_TEMPLATES_PATH:
+    try:
+        # Quien importa el módulo informa de las plantillas cargadas (ver `describe_lab_templates`)
+        lab_templates = TemplateRegistry.from_file(LAB_TEMPLATES_PATH)
+    except Exception as e:
+        logger.error(f"Error al cargar las plantillas de laboratorio: {str(e)}")
+
+# Versión de las reglas de extracción; cambiarla invalida los resultados en caché.
+# Las plantillas cargadas forman parte de las reglas
+RULES_VERSION = "2" + (f"+{lab_templates.version}" if lab_templates else "")
+PIPELINE_VERSION = f"{EXTRACTOR_VERSION}.{RULES_VERSION}"
+
+
+def describe_lab_templates() -> str:
+    """Mensaje de arranque con las plantillas de laboratorio cargadas."""
+    return f"{len(lab_templates)} plantillas de laboratorio cargadas de {LAB_TEMPLATES_PATH}"
+
+
+def get_text_hash(text: str) -> str:
+    """Genera un hash único para el texto."""
+    return f"txt:{RULES_VERSION}:{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}"
+
+
+def get_document_key(contents: bytes) -> str:
+    """Genera la clave de caché de un archivo subido a partir de sus bytes.
+
+    Incluye la versión del extractor y de las reglas para que un cambio en
+    cualquiera de los dos invalide los resultados guardados.
+    """
+    return f"doc:{PIPELINE_VERSION}:{hashlib.blake2b(contents, digest_size=16).hexdigest()}"
+
+
+def extract_patient_info(text: str) -> Dict[str, str]:
+    """Extrae información del paciente del texto."""
+    return patient_matcher.extract(text)
+
+
+def extract_medical_info(text: str) -> Dict[str, str]:
+    """Extrae información médica del texto."""
+    return medical_matcher.extract(text)
+
+
+def extract_header_info(text: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Extrae la información del paciente y la médica en una sola pasada."""
+    fields = header_matcher.extract(text)
+    patient = {key: fields[key] for key in patient_matcher.fields}
+    medical = {key: fields[key] for key in medical_matcher.fields}
+    return patient, medical
+
+
+def extract_conclusions_and_recommendations(text: str) -> Dict[str, str]:
+    """Extrae conclusiones y recomendaciones del texto."""
+    return conclusions_and_recommendations(text)
+
+
+def process_text_with_rules(text: str) -> dict:
+    """Procesa el texto usando reglas y patrones predefinidos."""
+    result = {
+        "titulo_examen": "",
+        "info_paciente": {},
+        "info_medica": {},
+        "datos_estructurados": [],
+        "conclusiones": "",
+        "recomendaciones": ""
+    }
+
+    # Extraer información del paciente y médica
+    result["info_paciente"], result["info_medica"] = extract_header_info(text)
+    
+    # Extraer conclusiones y recomendaciones
+    conclusions_data = extract_conclusions_and_recommendations(text)
+    result["conclusiones"] = conclusions_data["conclusiones"]
+    result["recomendaciones"] = conclusions_data["recomendaciones"]
+
+    # Lista de campos a ignorar que no son resultados de análisis
+    campos_ignorar = {
+        'edad', 'fecha', 'nombre', 'sexo', 'paciente', 
+        'médico', 'medico', 'doctor', 'doctora', 'dr', 'dra',
+        'registro', 'cédula', 'cedula', 'identificación', 'identificacion',
+        'muestra', 'método', 'metodo', 'número', 'numero', 'resultado',
+        'parámetro', 'parametro', 'categoría', 'categoria', 'estado',
+        'referencia', 'rango', 'valor', 'unidad', 'interpretación',
+        'interpretacion', 'observaciones', 'notas', 'comentarios'
+    }
+
+    # Lista de categorías comunes en exámenes de laboratorio
+    categorias_comunes = {
+        'HEMOGRAMA', 'BIOQUÍMICA', 'BIOQUIMICA', 'QUÍMICA SANGUÍNEA', 'QUIMICA SANGUINEA',
+        'FUNCIÓN RENAL', 'FUNCION RENAL', 'FUNCIÓN HEPÁTICA', 'FUNCION HEPATICA',
+        'ELECTROLITOS', 'LÍPIDOS', 'LIPIDOS', 'HORMONAS', 'TIROIDES',
+        'COAGULACIÓN', 'COAGULACION', 'UROANÁLISIS', 'UROANALISIS',
+        'CULTIVOS', 'MICROBIOLOGÍA', 'MICROBIOLOGIA', 'INMUNOLOGÍA', 'INMUNOLOGIA'
+    }
+
+    # Dividir el texto en líneas y limpiar
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+
+    # Detectar título del examen
+    for line in lines[:5]:
+        if re.search(r'(?i)(examen|análisis|informe|reporte)\s+(?:de\s+)?(?:laboratorio|médico|clínico)', line):
+            result["titulo_examen"] = line.strip()
+            break
+
+    # Variables para el procesamiento de categorías y exámenes
+    current_category = ""
+    in_resultados = False
+
+    # Procesar línea por línea
+    for line in lines:
+        # Detectar sección de resultados
+        if re.match(r'(?i)^(?:resultados?|parámetros?|parametros?|valores?|exámenes?|examenes?)', line):
+            in_resultados = True
+            continue
+
+        # Detectar categorías
+        if re.match(r'^[A-ZÁÉÍÓÚÑ][^:]+$', line.strip()) and not ':' in line:
+            if line.strip() in categorias_comunes:
+                current_category = line.strip()
+            continue
+
+        # Procesar línea de examen probando sus lecturas posibles en orden
+        if in_resultados:
+            for exam in iter_exam_candidates(line):
+                nombre = exam.nombre
+                # Verificar si el nombre del examen está en la lista de campos a ignorar
+                if nombre.lower() not in campos_ignorar and not re.match(r'^[A-ZÁÉÍÓÚÑ][^:]+$', nombre):
+                    valor_str = exam.valor.replace(',', '.')
+                    unidad = canonical_unit(exam.unidad)
+
+                    try:
+                        valor = float(valor_str)
+                        rango_min, rango_max = parse_range(exam.rango)
+
+                        # Solo añadir si tenemos un nombre válido y un valor numérico
+                        if nombre and not nombre.isspace() and valor is not None:
+                            result["datos_estructurados"].append(
+                                ExamResult(current_category, nombre, valor, unidad, rango_min, rango_max)
+                            )
+                            break
+                    except (ValueError, IndexError) as e:
+                        # Sin el contenido de la línea: puede tener datos del paciente
+                        logger.debug("Línea de examen con valor no numérico: %s", type(e).__name__)
+                        continue
+
+    return result
+
+
+def flatten_structured_data(ai_response: Dict) -> List[Dict]:
+    """Convierte la respuesta estructurada en el formato esperado por el frontend."""
+    if not ai_response:
+        return []
+        
+    # Los datos ya vienen estructurados en el formato correcto
+    return ai_response.get("datos_estructurados", [])
+
+
+def build_extraction_response(text: str, processed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Arma la respuesta de extracción a partir del texto y los datos procesados."""
+    return {
+        "texto_original": text,
+        "texto_limpio": text.strip(),
+        "titulo_examen": processed_data.get("titulo_examen", "Análisis de Laboratorio"),
+        "info_paciente": processed_data.get("info_paciente", {}),
+        "info_medica": processed_data.get("info_medica", {}),
+        "datos_estructurados": processed_data.get("datos_estructurados", []),
+        "conclusiones": processed_data.get("conclusiones", ""),
+        "recomendaciones": processed_data.get("recomendaciones", "")
+    }
@@ -0,0 +1,41 @@
+"""Estado de preparación de cada subsistema para el endpoint de readiness."""
+import time
+from typing import Any, Dict, Iterable
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+ERROR = "error"
+
+
+class Readiness:
+    """Resultado de la última comprobación de cada subsistema.
+
+    El servicio está listo cuando todos los subsistemas obligatorios lo están;
+    los opcionales (p. ej. el modelo de inferencia, que tiene respaldo por
+    reglas) se informan pero no bloquean.
+    """
+
+    def __init__(self, required: Iterable[str], optional: Iterable[str] = ()):
+        self._subsystems: Dict[str, Dict[str, Any]] = {}
+        for name in required:
+            self._subsystems[name] = {"estado": PENDIENTE, "detalle": "", "obligatorio": True, "comprobado": None}
+        for name in optional:
+            self._subsystems[name] = {"estado": PENDIENTE, "detalle": "", "obligatorio": False, "comprobado": None}
+
+    def mark(self, name: str, ready: bool, detail: str = ""):
+        self._subsystems[name].update({
+            "estado": LISTO if ready else ERROR,
+            "detalle": detail,
+            "comprobado": time.time(),
+        })
+
+    def pending(self) -> list:
+        """Subsistemas que aún no están listos."""
+        return [name for name, state in self._subsystems.items() if state["estado"] != LISTO]
+
+    @property
+    def ready(self) -> bool:
+        return all(state["estado"] == LISTO for state in self._subsystems.values() if state["obligatorio"])
+
+    def report(self) -> Dict[str, Any]:
+        return {"listo": self.ready, "subsistemas": {name: dict(state) for name, state in self._subsystems.items()}}
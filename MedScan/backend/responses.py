@@ -0,0 +1,141 @@
+"""Registros de resultados y serialización de las respuestas.
+
+Las respuestas se serializan con orjson (incluido en requirements.txt) y, si no
+está instalado, con json de la biblioteca estándar. En modo ligero se omite el
+texto del documento y cada resultado se envía como una fila de `COLUMNAS` en
+lugar de un objeto anidado, con el valor como número. Si se activa la compresión, las
+respuestas grandes se comprimen con gzip cuando el cliente lo acepta.
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+RESPONSE_GZIP = os.getenv("RESPONSE_GZIP", "0") == "1"
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 5))
+
+MODO_COMPLETO = "completo"
+MODO_LIGERO = "ligero"
+
+# Campos de la respuesta completa que no se envían en modo ligero
+TEXTOS = ("texto_original", "texto_limpio")
+# Orden de los campos en las filas de resultados del modo ligero
+COLUMNAS = ("categoria", "examen", "valor", "unidad", "min", "max")
+
+
+class ExamResult(NamedTuple):
+    """Resultado de un examen: valor numérico, unidad y rango de referencia.
+
+    Es la forma interna de los resultados hasta que se envían: sus campos van en
+    el orden de COLUMNAS, así que en modo ligero es directamente la fila, y solo
+    la respuesta completa lo convierte en el objeto anidado. En la caché
+    persistente se guarda como lista.
+    """
+
+    categoria: str
+    examen: str
+    valor: float
+    unidad: str
+    minimo: Optional[float]
+    maximo: Optional[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Formato de la respuesta completa (el valor como texto, como espera el frontend)."""
+        return {
+            "categoria": self.categoria,
+            "examen": self.examen,
+            "valor": str(self.valor),
+            "unidad": self.unidad,
+            "rango_referencia": {
+                "min": self.minimo,
+                "max": self.maximo
+            }
+        }
+
+
+def _number(value: Any) -> Any:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def row_from_dict(record: Dict[str, Any]) -> List[Any]:
+    """Fila del modo ligero, en el orden de COLUMNAS, a partir de un resultado en formato completo."""
+    rango = record.get("rango_referencia") or {}
+    return [record.get("categoria", ""), record.get("examen", ""), _number(record.get("valor")),
+            record.get("unidad", ""), rango.get("min"), rango.get("max")]
+
+
+def full_record(record: Any) -> Dict[str, Any]:
+    """Resultado en formato completo a partir de un ExamResult (o su lista, si viene de la caché)."""
+    if isinstance(record, ExamResult):
+        return record.to_dict()
+    if isinstance(record, dict):
+        return record
+    return ExamResult._make(record).to_dict()
+
+
+def lean_row(record: Any) -> Tuple[Any, ...]:
+    """Fila del modo ligero; un ExamResult ya lo es (orjson no serializa subclases de tupla)."""
+    if isinstance(record, dict):
+        return tuple(row_from_dict(record))
+    return tuple(record)
+
+
+def full_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Respuesta completa: los resultados como objetos anidados."""
+    if not response.get("datos_estructurados"):
+        return response
+    return {**response, "datos_estructurados": [full_record(record) for record in response["datos_estructurados"]]}
+
+
+def lean_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Respuesta en modo ligero: sin el texto del documento y con los resultados como filas."""
+    lean: Dict[str, Any] = {}
+    for key, value in response.items():
+        if key in TEXTOS:
+            continue
+        if key == "datos_estructurados":
+            lean["columnas"] = COLUMNAS
+            value = [lean_row(record) for record in value]
+        lean[key] = value
+    return lean
+
+
+def render(content: Any, modo: str = MODO_COMPLETO) -> Any:
+    """Aplica el modo de respuesta a un resultado de documento."""
+    return lean_response(content) if modo == MODO_LIGERO else full_response(content)
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa a JSON en UTF-8 (compacto y sin escapar los caracteres no ASCII)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def encode(content: Any, accept_encoding: str = "") -> Tuple[bytes, Dict[str, str]]:
+    """Cuerpo JSON y cabeceras, comprimido con gzip si está activado, es grande y el cliente lo acepta."""
+    body = dumps(content)
+    if not RESPONSE_GZIP:
+        return body, {}
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= RESPONSE_GZIP_MIN_BYTES and accepts_gzip(accept_encoding):
+        body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
@@ -0,0 +1,127 @@
+"""Segmentador de secciones del informe: conclusiones, recomendaciones y afines.
+
+Reemplaza a las búsquedas ``encabezado[:\\s]+(.*?)(?=\\s*(?:recomendaci|firma|$))``
+con re.DOTALL, que se lanzaban una tras otra sobre el documento entero: cada
+una lo volvía a recorrer y el `\\s*` de la anticipación se reintentaba en cada
+posición de un tramo de espacios, con tiempo cuadrático en su longitud. Aquí el
+texto se recorre una sola vez para anotar dónde aparece cada encabezado y cada
+marca de fin (índice de posiciones) y las secciones se recortan de ese índice.
+
+Los resultados coinciden con los de las expresiones anteriores: la sección
+empieza tras la primera aparición del encabezado seguida de ':' o espacios y
+termina en la primera marca de fin posterior (aunque esté dentro de una
+palabra, como antes) o al final del texto.
+"""
+import re
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Marca -> raíz que se busca en el recorrido (sin distinguir mayúsculas)
+_RAICES = {
+    "conclusiones": r"conclusi[óo]n",
+    "interpretacion": r"interpretaci[óo]n",
+    "resultados": r"resultado",
+    "comentarios": r"comentario",
+    "recomendaciones": r"recomendaci",
+    "sugerencias": r"sugerencia",
+    "observaciones": r"observacione",
+    "firma": r"firma",
+}
+
+# Marca -> encabezado completo, comprobado solo donde aparece su raíz
+_ENCABEZADOS = {
+    name: re.compile(pattern, re.IGNORECASE)
+    for name, pattern in (
+        ("conclusiones", r"conclusi[óo]n(?:es)?[:\s]+"),
+        ("interpretacion", r"interpretaci[óo]n[:\s]+"),
+        ("resultados", r"resultados?[:\s]+"),
+        ("comentarios", r"comentarios?[:\s]+"),
+        ("recomendaciones", r"recomendaci[óo]n(?:es)?[:\s]+"),
+        ("sugerencias", r"sugerencias?[:\s]+"),
+        ("observaciones", r"observaciones?[:\s]+"),
+    )
+}
+
+# Recorrido sobre el texto en minúsculas: la alternativa factorizada y sin
+# distinguir mayúsculas es varias veces más rápida que la de _RAICES con
+# re.IGNORECASE, que se usa solo si el texto tiene letras cuyo paso a minúsculas
+# no coincide con la comparación de `re` (cambian de longitud, 'ſ' o 'ı')
+_MARCAS = re.compile(r"c(?:onclusi[óo]n|omentario)|interpretaci[óo]n|re(?:sultado|comendaci)|sugerencia|observacione|firma")
+_MARCA_POR_INICIO = {pattern[:3]: name for name, pattern in _RAICES.items()}
+_MARCAS_UNICODE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _RAICES.items()), re.IGNORECASE)
+
+
+def _scan(text: str) -> Iterator[Tuple[str, int]]:
+    """Genera (marca, posición) de cada raíz en orden, incluidas las que se solapan."""
+    lowered = text.lower()
+    fast = len(lowered) == len(text) and "ſ" not in lowered and "ı" not in lowered
+    pattern, subject = (_MARCAS, lowered) if fast else (_MARCAS_UNICODE, text)
+    match = pattern.search(subject)
+    while match is not None:
+        position = match.start()
+        yield (_MARCA_POR_INICIO[lowered[position:position + 3]] if fast else match.lastgroup), position
+        # Se sigue desde el carácter siguiente y no desde el final: la 'o' final
+        # de "resultado" puede ser la inicial de "observacione"
+        match = pattern.search(subject, position + 1)
+
+
+# Encabezados de cada sección en orden de preferencia
+CONCLUSIONES = ("conclusiones", "interpretacion", "resultados", "comentarios")
+RECOMENDACIONES = ("recomendaciones", "sugerencias", "observaciones")
+
+
+class SectionIndex:
+    """Posiciones de los encabezados y marcas de fin de un texto, calculadas en un solo recorrido."""
+
+    __slots__ = ("text", "marks", "headings")
+
+    def __init__(self, text: str):
+        self.text = text
+        # Marca -> posiciones (crecientes) donde aparece su raíz
+        self.marks: Dict[str, List[int]] = {name: [] for name in _RAICES}
+        # Encabezado -> (inicio, inicio del contenido) de su primera aparición
+        self.headings: Dict[str, Tuple[int, int]] = {}
+        for name, position in _scan(text):
+            self.marks[name].append(position)
+            heading = _ENCABEZADOS.get(name)
+            if heading is not None and name not in self.headings:
+                found = heading.match(text, position)
+                if found is not None:
+                    self.headings[name] = (position, found.end())
+
+    def start_of(self, headings: Sequence[str]) -> Optional[int]:
+        """Inicio del contenido del primer encabezado presente, en orden de preferencia."""
+        for name in headings:
+            if name in self.headings:
+                return self.headings[name][1]
+        return None
+
+    def end_of(self, start: int, until: Sequence[str]) -> int:
+        """Primera marca de `until` en `start` o después, o el final del texto."""
+        end = len(self.text)
+        for name in until:
+            positions = self.marks[name]
+            index = bisect_left(positions, start)
+            if index < len(positions) and positions[index] < end:
+                end = positions[index]
+        return end
+
+    def section(self, headings: Sequence[str], until: Sequence[str]) -> str:
+        """Texto de la sección (sin espacios en los extremos), o "" si no aparece ningún encabezado."""
+        start = self.start_of(headings)
+        if start is None:
+            return ""
+        return self.text[start:self.end_of(start, until)].strip()
+
+
+def conclusions_and_recommendations(text: str) -> Dict[str, str]:
+    """Conclusiones y recomendaciones del texto.
+
+    Las conclusiones terminan donde empieza una recomendación o la firma, y
+    las recomendaciones en la firma.
+    """
+    sections = SectionIndex(text)
+    return {
+        "conclusiones": sections.section(CONCLUSIONES, until=("recomendaciones", "firma")),
+        "recomendaciones": sections.section(RECOMENDACIONES, until=("firma",)),
+    }
@@ -0,0 +1,44 @@
+"""Agrupación de peticiones idénticas que están en curso al mismo tiempo."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Ejecuta una sola vez el trabajo de cada clave mientras está en curso.
+
+    La primera petición de una clave lanza el trabajo como tarea independiente;
+    las que llegan mientras tanto esperan esa misma tarea en lugar de repetirlo.
+    Si quien lanzó el trabajo se desconecta, la tarea sigue para los demás.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Marcar la excepción como recuperada aunque todos los que esperaban se hayan ido
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executed + self.coalesced
+        return {
+            "en_curso": len(self._inflight),
+            "ejecutadas": self.executed,
+            "agrupadas": self.coalesced,
+            "tasa_agrupadas": self.coalesced / total if total else 0.0,
+        }
@@ -0,0 +1,58 @@
+"""Servidor local que imita el endpoint de inferencia de Hugging Face.
+
+Sirve para probar el cliente de inferencia, el circuit breaker y los lotes sin
+salir a la red. Acepta `inputs` como texto o como lista de textos; con una
+lista responde una lista de resultados en el mismo orden. Uso desde la carpeta MedScan:
+
+    STUB_LATENCY_MS=200 STUB_FAIL_RATE=0.2 uvicorn backend.stub_inference:app --port 8001
+    HUGGINGFACE_API_URL=http://127.0.0.1:8001/ uvicorn backend.main:app
+
+Variables:
+- STUB_LATENCY_MS: latencia simulada por petición.
+- STUB_ITEM_LATENCY_MS: latencia adicional por cada texto de la petición.
+- STUB_FAIL_RATE: proporción de peticiones que responden 503.
+- STUB_HANG: si vale 1, las peticiones no responden nunca (para probar timeouts).
+"""
+import asyncio
+import os
+import random
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", 50))
+STUB_ITEM_LATENCY_MS = float(os.getenv("STUB_ITEM_LATENCY_MS", 5))
+STUB_FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", 0))
+STUB_HANG = os.getenv("STUB_HANG", "0") == "1"
+
+app = FastAPI(title="MedScan stub de inferencia")
+
+
+def fake_entities(text: str) -> List[Dict[str, Any]]:
+    """Devuelve entidades con el mismo formato que el modelo de NER."""
+    entities = []
+    for word in text.split():
+        if word.isupper() and len(word) > 3:
+            entities.append({"entity": "MISC", "word": word, "score": 0.9})
+    return entities
+
+
+@app.post("/")
+async def infer(request: Request):
+    payload = await request.json()
+    inputs = payload.get("inputs", "")
+    texts = inputs if isinstance(inputs, list) else [inputs]
+    if STUB_HANG:
+        await asyncio.Event().wait()
+    await asyncio.sleep((STUB_LATENCY_MS + STUB_ITEM_LATENCY_MS * len(texts)) / 1000)
+    if random.random() < STUB_FAIL_RATE:
+        return JSONResponse(status_code=503, content={"error": "Model is currently loading"})
+    if isinstance(inputs, list):
+        return [fake_entities(text) for text in inputs]
+    return fake_entities(inputs)
+
+
+@app.get("/")
+async def status():
+    return {"status": "ok"}
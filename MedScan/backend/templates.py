@@ -0,0 +1,252 @@
+"""Plantillas de laboratorios conocidos: reconocimiento del formato y extracción directa.
+
+La mayoría de los informes llegan de unos pocos laboratorios cuyo formato no
+cambia. Cada plantilla describe uno: las frases fijas de su encabezado que lo
+identifican (la huella), la etiqueta que precede a cada campo del paciente y del
+médico y cómo están dispuestas las columnas de la tabla de resultados. Un
+documento reconocido se extrae leyendo el texto que sigue a cada etiqueta y
+partiendo las filas de la tabla, sin pasar por la cascada de expresiones de las
+reglas genéricas; si no se reconoce, o la plantilla no encuentra resultados, se
+usan las reglas genéricas.
+
+Las plantillas se cargan de un archivo JSON con una lista de objetos::
+
+    {
+        "nombre": "san_rafael",
+        "huella": ["Laboratorio Clínico San Rafael", "Valores de referencia"],
+        "titulo": "Informe de resultados de laboratorio",
+        "campos": {"nombre": "Paciente:", "id": "Documento:", "fecha": "Fecha de toma:",
+                   "medico": "Médico:"},
+        "resultados": {"inicio": "Prueba | Resultado", "fin": ["Conclusión", "Firma"],
+                       "separador": "|", "columnas": ["examen", "valor", "unidad", "rango"]}
+    }
+
+La huella se busca (sin distinguir mayúsculas) en los primeros
+`TEMPLATE_HEADER_CHARS` caracteres. Cada plantilla compila al cargarse una
+expresión que reconoce sus filas, así que la tabla se recorre de una vez. El
+"separador" es un carácter; sin él, las columnas se separan por tabuladores o
+por dos o más espacios. Las filas de una sola celda en mayúsculas son
+categorías y las celdas "-" se leen como vacías.
+
+El "inicio" es el comienzo de la línea de encabezado de la tabla, sin
+distinguir mayúsculas y con cualquier separación donde lleva espacios (p. ej.
+"Examen Resultado Unidades" para columnas alineadas). Conviene que incluya
+varias columnas: una sola palabra como "Examen" puede aparecer antes de la tabla.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Sequence
+
+from .fields import medical_matcher, patient_matcher
+from .normalization import canonical_unit, parse_range
+from .responses import ExamResult
+from .sections import conclusions_and_recommendations
+
+TEMPLATE_HEADER_CHARS = int(os.getenv("TEMPLATE_HEADER_CHARS", 2000))
+
+# Columnas que entiende la tabla de resultados ("-" descarta la celda)
+COLUMNAS = {"categoria", "examen", "valor", "unidad", "rango", "min", "max", "-"}
+
+
+def _alternation(phrases: Sequence[str]) -> Pattern:
+    """Expresión que encuentra cualquiera de las frases; el grupo `fN` indica cuál."""
+    return re.compile(
+        "|".join(f"(?P<f{index}>{re.escape(phrase)})" for index, phrase in enumerate(phrases)),
+        re.IGNORECASE,
+    )
+
+
+def _row_pattern(columns: int, separator: Optional[str]) -> Pattern:
+    """Expresión de una línea de la tabla: una fila de `columns` celdas o una sola celda (categoría).
+
+    Las celdas con separador se capturan con sus espacios (sin cuantificadores
+    perezosos que retrocedan) y se recortan después.
+    """
+    if separator is None:
+        # Palabras separadas por un espacio; entre celdas, un tabulador o dos o más espacios
+        cell, between = r"(\S+(?: \S+)*)", r"(?:\t[ \t]*| [ \t]+)"
+        return re.compile(rf"^[ \t]*(?:{between.join([cell] * columns)}|{cell})[ \t]*$", re.MULTILINE)
+    escaped = re.escape(separator)
+    cell = rf"([^{escaped}\n]*)"
+    row = escaped.join([cell] * columns)
+    return re.compile(rf"^[ \t]*(?:{escaped}?{row}|{escaped}?{cell}){escaped}?[ \t]*$", re.MULTILINE)
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        return float(text.replace(",", ".")) if text else None
+    except ValueError:
+        return None
+
+
+class LabTemplate:
+    """Formato fijo de los informes de un laboratorio."""
+
+    def __init__(self, nombre: str, huella: Sequence[str], campos: Dict[str, str],
+                 resultados: Dict[str, Any], titulo: str = ""):
+        self.name = nombre
+        self.fingerprint = tuple(phrase.lower() for phrase in huella)
+        self.title = titulo
+        if not self.fingerprint:
+            raise ValueError(f"La plantilla {nombre} no tiene huella")
+        unknown = set(campos) - set(patient_matcher.fields) - set(medical_matcher.fields)
+        if unknown:
+            raise ValueError(f"La plantilla {nombre} tiene campos desconocidos: {sorted(unknown)}")
+        self.fields = list(campos)
+        self._anchors = _alternation(list(campos.values())) if campos else None
+        self.columns = list(resultados["columnas"])
+        if not {"examen", "valor"} <= set(self.columns) or not set(self.columns) <= COLUMNAS:
+            raise ValueError(f"Columnas no válidas en la plantilla {nombre}: {self.columns}")
+        self.separator = resultados.get("separador")
+        if self.separator is not None and len(self.separator) != 1:
+            raise ValueError(f"El separador de la plantilla {nombre} debe ser un carácter")
+        self._row = _row_pattern(len(self.columns), self.separator)
+        # Columna -> posición de su celda en la fila
+        self._index = {column: position for position, column in reversed(list(enumerate(self.columns)))}
+        # Solo al principio de una línea, con cualquier separación donde el inicio lleva espacios
+        words = resultados["inicio"].split()
+        self._start = re.compile(r"(?:^|\n)[ \t]*" + r"[ \t]+".join(map(re.escape, words)), re.IGNORECASE)
+        ends = resultados.get("fin") or []
+        # Empieza por el salto de línea literal, que `re` busca rápido, en lugar de por ^ con re.MULTILINE
+        self._end = re.compile(rf"\n[ \t]*(?:{'|'.join(map(re.escape, ends))})", re.IGNORECASE) if ends else None
+
+    def _header(self, text: str, end: int) -> Dict[str, str]:
+        """Texto que sigue a cada etiqueta hasta la siguiente etiqueta de la misma línea o el fin de línea."""
+        values: Dict[str, str] = {}
+        if self._anchors is None:
+            return values
+        found = list(self._anchors.finditer(text, 0, end))
+        for index, match in enumerate(found):
+            field = self.fields[int(match.lastgroup[1:])]
+            if field in values:
+                continue
+            stop = text.find("\n", match.end(), end)
+            stop = end if stop < 0 else stop
+            if index + 1 < len(found):
+                stop = min(stop, found[index + 1].start())
+            values[field] = text[match.end():stop].strip(" \t:=")
+        return values
+
+    def _table_end(self, text: str, start: int) -> int:
+        """Inicio de la primera línea desde `start` que empieza por una marca de fin, o el final del texto."""
+        found = self._end.search(text, start - 1) if self._end is not None else None
+        return len(text) if found is None else found.start() + 1
+
+    def _rows(self, text: str, start: int, end: int) -> List[Dict[str, Any]]:
+        index = self._index
+        name_at, value_at, unit_at = index["examen"], index["valor"], index.get("unidad")
+        range_at, min_at, max_at = index.get("rango"), index.get("min"), index.get("max")
+        category_at = index.get("categoria")
+        results = []
+        category = ""
+        for match in self._row.finditer(text, start, end):
+            cells = match.groups()
+            if cells[0] is None:
+                # Una sola celda: categoría si está en mayúsculas
+                if cells[-1].isupper():
+                    category = cells[-1].strip()
+                continue
+            # "-" marca una celda vacía (p. ej. un examen sin unidad)
+            cells = ["" if cell == "-" else cell for cell in map(str.strip, cells[:-1])]
+            valor = _number(cells[value_at])
+            if valor is None or not cells[name_at]:
+                continue
+            if range_at is not None:
+                minimo, maximo = parse_range(cells[range_at])
+            else:
+                minimo = _number(cells[min_at]) if min_at is not None else None
+                maximo = _number(cells[max_at]) if max_at is not None else None
+            results.append(ExamResult(
+                category if category_at is None else cells[category_at], cells[name_at], valor,
+                canonical_unit(cells[unit_at]) if unit_at is not None else "", minimo, maximo,
+            ))
+        return results
+
+    def extract(self, text: str) -> Optional[Dict[str, Any]]:
+        """Datos del informe en el formato de las reglas, o None si no aparece la tabla de resultados."""
+        table = self._start.search(text)
+        if table is None:
+            return None
+        line_end = text.find("\n", table.end())
+        if line_end < 0:
+            return None
+        end = self._table_end(text, line_end + 1)
+        results = self._rows(text, line_end + 1, end)
+        if not results:
+            return None
+        values = self._header(text, table.start())
+        return {
+            "titulo_examen": self.title,
+            "info_paciente": {key: values.get(key, "") for key in patient_matcher.fields},
+            "info_medica": {key: values.get(key, "") for key in medical_matcher.fields},
+            "datos_estructurados": results,
+            # Las conclusiones y recomendaciones van después de la tabla
+            **conclusions_and_recommendations(text[end:]),
+        }
+
+
+class TemplateRegistry:
+    """Plantillas conocidas, con la búsqueda de sus huellas y estadísticas de aciertos."""
+
+    def __init__(self, templates: Sequence[LabTemplate], version: str = ""):
+        # Las huellas más específicas (más frases) se prueban primero
+        self.templates = sorted(templates, key=lambda template: len(template.fingerprint), reverse=True)
+        self.version = version
+        self._phrases = {phrase for template in self.templates for phrase in template.fingerprint}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+        self.failures = 0
+        self.hits: Dict[str, int] = {template.name: 0 for template in self.templates}
+
+    @classmethod
+    def from_file(cls, path: str) -> "TemplateRegistry":
+        with open(path, "rb") as file:
+            raw = file.read()
+        templates = [LabTemplate(**item) for item in json.loads(raw)]
+        return cls(templates, version=hashlib.blake2b(raw, digest_size=4).hexdigest())
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def match(self, text: str) -> Optional[LabTemplate]:
+        """Plantilla cuya huella aparece completa en el encabezado del texto."""
+        # Cada frase se busca una sola vez aunque esté en varias huellas
+        header = text[:TEMPLATE_HEADER_CHARS].lower()
+        found = {phrase for phrase in self._phrases if phrase in header}
+        for template in self.templates:
+            if found.issuperset(template.fingerprint):
+                return template
+        return None
+
+    def extract(self, text: str) -> Optional[Dict[str, Any]]:
+        """Extrae el texto con su plantilla, o devuelve None si no hay plantilla o no sirvió."""
+        if not self.templates:
+            return None
+        template = self.match(text)
+        result = template.extract(text) if template is not None else None
+        with self._lock:
+            self.lookups += 1
+            if template is None:
+                self.misses += 1
+            elif result is None:
+                self.failures += 1
+            else:
+                self.hits[template.name] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(self.hits.values())
+        return {
+            "plantillas": len(self.templates),
+            "version": self.version,
+            "consultas": self.lookups,
+            "aciertos": hits,
+            "sin_plantilla": self.misses,
+            "fallos": self.failures,
+            "tasa_aciertos": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "por_plantilla": dict(self.hits),
+        }
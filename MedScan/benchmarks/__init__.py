@@ -0,0 +1 @@
+"""Benchmarks del backend de MedScan. Se ejecutan desde la carpeta MedScan con `python -m benchmarks.<nombre>`."""
@@ -0,0 +1,90 @@
+"""Mide el rendimiento del tokenizador de líneas de examen frente a las expresiones regulares anteriores.
+
+Muestra el número de líneas por segundo sobre un corpus de líneas típicas y el
+tiempo con líneas basura de OCR de longitud creciente: con las expresiones
+anteriores el tiempo crece de forma cuadrática, con el tokenizador es lineal.
+
+Uso: python -m benchmarks.bench_exam_lines [--repeticiones 20]
+"""
+import argparse
+import re
+import time
+
+from backend.exam_lines import split_labeled, split_spaced
+
+_UNIDADES = (r"((?:mg/dL|g/dL|U/L|%|mg/L|µL|millones/µL|/µL|mEq/L|mm3|g/24h|/hpf|/lpf|/campo|/mm2|/mm3"
+             r"|/dl|/l|/ml|/ul|/mm|/h|/min|/seg|/día|/dia|/semana|/mes|mmol/L)?)")
+# Expresiones usadas antes por process_text_with_rules
+PATRONES_ANTERIORES = [
+    r"([^:]+?)\s+([\d,\.]+)\s+" + _UNIDADES + r"\s*(?:\(([^)]+)\))?",
+    r"([^:]+?)\s*[:=]\s*([\d,\.]+)\s*" + _UNIDADES + r"\s*(?:\(([^)]+)\))?",
+    r"([^:]+?)\s*=\s*([\d,\.]+)\s*" + _UNIDADES + r"\s*(?:\(([^)]+)\))?",
+]
+
+LINEAS = [
+    "hemoglobina 14.5 g/dL (12.0-16.0)",
+    "hematocrito 42,1 % (36-46)",
+    "leucocitos 7200 /µL (4500-11000)",
+    "glucosa: 95 mg/dL (70-110)",
+    "colesterol total = 180 mg/dL (<200)",
+    "creatinina: 0.9 mg/dL",
+    "tsh 2.1 mU/L (0.4-4.0)",
+    "sodio: 140 mEq/L (135-145)",
+    "Observaciones: muestra ligeramente hemolizada",
+    "VALORES DE REFERENCIA SEGÚN EDAD",
+]
+
+
+def regex_candidates(line: str):
+    """Lecturas de una línea con las expresiones anteriores (None si no coincide)."""
+    results = []
+    for pattern in PATRONES_ANTERIORES:
+        match = re.match(pattern, line)
+        results.append(match and (match.group(1).strip(), match.group(2), match.group(3) or "", match.group(4)))
+    return results
+
+
+def tokenizer_candidates(line: str):
+    """Lecturas de una línea con el tokenizador (el tercer patrón solo repetía lecturas del segundo)."""
+    results = []
+    for exam in (split_spaced(line), split_labeled(line)):
+        results.append(exam and (exam.nombre, exam.valor, exam.unidad, exam.rango))
+    return results
+
+
+def measure(func, lines, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            func(line)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = LINEAS * 1000
+    for line in LINEAS:
+        assert tokenizer_candidates(line) == regex_candidates(line)[:2], line
+
+    before = measure(regex_candidates, corpus, args.repeticiones)
+    after = measure(tokenizer_candidates, corpus, args.repeticiones)
+    total = len(corpus) * args.repeticiones
+    print("Corpus de líneas típicas")
+    print(f"  expresiones regulares: {total / before:>12,.0f} líneas/s")
+    print(f"  tokenizador:           {total / after:>12,.0f} líneas/s ({before / after:.1f}x)")
+
+    print("\nLíneas basura de OCR (tramos largos de espacios)")
+    print(f"{'forma':>16} {'longitud':>10} {'regex (ms)':>12} {'tokenizador (ms)':>17}")
+    for shape, suffix in (("espacios + x", "x"), ("espacios + ':'", ":")):
+        for length in (1000, 2000, 4000, 8000):
+            garbage = ["a" + " " * length + suffix]
+            before = measure(regex_candidates, garbage, 1) * 1000
+            after = measure(tokenizer_candidates, garbage, 1) * 1000
+            print(f"{shape:>16} {length:>10} {before:>12.2f} {after:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
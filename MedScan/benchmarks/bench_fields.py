@@ -0,0 +1,90 @@
+"""Compara la extracción de campos del encabezado: un `re.search` por patrón frente al extractor compilado.
+
+Con el encabezado completo el extractor termina al leer el encabezado; con uno
+parcial (falta algún campo) tiene que recorrer todo el informe, como antes.
+
+Uso: python -m benchmarks.bench_fields [--paginas 1 5 20] [--repeticiones 200]
+"""
+import argparse
+import itertools
+import re
+import time
+
+from backend.fields import PATRONES_MEDICOS, PATRONES_PACIENTE, header_matcher, medical_matcher, patient_matcher
+
+ENCABEZADO = """LABORATORIO CLÍNICO CENTRAL
+Informe de laboratorio clínico
+Paciente: María Fernanda López
+Edad: 45 años
+Sexo: F
+Fecha: 12/03/2024
+Cédula: 12345678-9
+Médico: Carlos Ruiz
+Especialidad: Medicina Interna
+Laboratorio: Central
+Tipo de muestra: Sangre venosa
+Condiciones: Ayuno nocturno
+Método: Automatizado
+"""
+
+# Línea que completa todos los campos: el recorrido termina en el encabezado
+REGISTRO = "Registro: RM-4521\n"
+
+PAGINA = """HEMOGRAMA
+hemoglobina 14.5 g/dL (12.0-16.0)
+hematocrito 42.1 % (36-46)
+leucocitos 7.2 mm3 (4.5-11.0)
+plaquetas 250 mm3 (150-400)
+BIOQUÍMICA
+glucosa: 95 mg/dL (70-110)
+creatinina: 0.9 mg/dL (0.6-1.2)
+colesterol total: 180 mg/dL (<200)
+triglicéridos: 140 mg/dL (<150)
+"""
+
+
+def search_per_pattern(text: str, fields) -> dict:
+    """Implementación anterior: un re.search por patrón sobre el texto completo."""
+    info = {}
+    for key, rules in fields.items():
+        info[key] = ""
+        for _, pattern in rules:
+            match = re.search("(?i)" + pattern, text)
+            if match:
+                info[key] = match.group(1).strip()
+                break
+    return info
+
+
+def build_report(pages: int, complete_header: bool) -> str:
+    header = ENCABEZADO + REGISTRO if complete_header else ENCABEZADO
+    return header + "Resultados\n" + PAGINA * (pages * 5) + "Conclusiones: sin hallazgos\nFirma\n"
+
+
+def timeit(func, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paginas", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'páginas':>8} {'encabezado':>11} {'caracteres':>11} {'re.search (µs)':>15} {'compilado (µs)':>15} {'mejora':>7}")
+    for pages, complete_header in itertools.product(args.paginas, (True, False)):
+        text = build_report(pages, complete_header)
+        for fields, matcher in ((PATRONES_PACIENTE, patient_matcher), (PATRONES_MEDICOS, medical_matcher)):
+            assert search_per_pattern(text, fields) == matcher.extract(text)
+        before = timeit(lambda t: (search_per_pattern(t, PATRONES_PACIENTE), search_per_pattern(t, PATRONES_MEDICOS)),
+                        text, args.repeticiones)
+        after = timeit(header_matcher.extract, text, args.repeticiones)
+        header = "completo" if complete_header else "parcial"
+        print(f"{pages:>8} {header:>11} {len(text):>11} {before:>15.1f} {after:>15.1f} {before / after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
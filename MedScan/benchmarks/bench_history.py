@@ -0,0 +1,142 @@
+"""Mide las consultas del historial de resultados sobre una base con muchas filas.
+
+Llena una base temporal con resultados sintéticos (pacientes x documentos x
+exámenes) y mide los percentiles 50 y 99 de la serie de un examen, de los
+resultados fuera de rango y del resumen de un paciente. Compara además la
+agregación de toda la tabla por paciente y examen con NumPy (la de
+`HistoryStore`) con el mismo cálculo fila a fila en Python.
+
+Uso: python -m benchmarks.bench_history [--filas 1000000] [--consultas 300]
+"""
+import argparse
+import datetime
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.history import ALTO, BAJO, NORMAL, HistoryStore, _aggregate, range_flag
+from backend.normalization import normalize_name
+
+# Examen -> (unidad, mínimo, máximo)
+EXAMENES = {
+    "Hemoglobina": ("g/dL", 12.0, 16.0), "Hematocrito": ("%", 36.0, 48.0), "Leucocitos": ("/µL", 4500, 11000),
+    "Plaquetas": ("/µL", 150000, 450000), "Glucosa": ("mg/dL", 70, 100), "Creatinina": ("mg/dL", 0.6, 1.2),
+    "Urea": ("mg/dL", 15, 45), "Colesterol total": ("mg/dL", 0, 200), "Triglicéridos": ("mg/dL", 0, 150),
+    "Sodio": ("mEq/L", 135, 145),
+}
+DOCUMENTOS_POR_PACIENTE = 20
+
+
+def fill(store: HistoryStore, rows: int, seed: int = 0) -> int:
+    """Inserta `rows` resultados y devuelve el número de pacientes."""
+    rng = random.Random(seed)
+    per_patient = DOCUMENTOS_POR_PACIENTE * len(EXAMENES)
+    patients = max(1, rows // per_patient)
+    start = datetime.date(2015, 1, 1)
+    store._conn.execute("BEGIN")
+    for patient in range(patients):
+        batch = []
+        for document in range(DOCUMENTOS_POR_PACIENTE):
+            date = (start + datetime.timedelta(days=document * 120 + rng.randrange(60))).isoformat()
+            for order, (name, (unit, minimo, maximo)) in enumerate(EXAMENES.items()):
+                value = round(rng.uniform(minimo * 0.8, maximo * 1.2), 2)
+                batch.append((f"P{patient:06d}", normalize_name(name), date, f"doc{patient}-{document}", order,
+                              name, value, unit, minimo, maximo, range_flag(value, minimo, maximo)))
+        store._conn.executemany("INSERT INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    store._conn.execute("COMMIT")
+    return patients
+
+
+def measure(func, arguments):
+    times = []
+    for args in arguments:
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+def python_aggregate(groups, values, days, flags):
+    """Lo mismo que `history._aggregate` recorriendo las filas en Python."""
+    summary = []
+    for start, end in zip(groups, groups[1:] + [len(values)]):
+        group_values, group_days = values[start:end], days[start:end]
+        count = end - start
+        mean, mean_day = sum(group_values) / count, sum(group_days) / count
+        spread = sum((day - mean_day) ** 2 for day in group_days)
+        covariance = sum((day - mean_day) * (value - mean) for day, value in zip(group_days, group_values))
+        summary.append({
+            "n": count, "media": mean, "min": min(group_values), "max": max(group_values),
+            "primero": group_values[0], "ultimo": group_values[-1],
+            "tendencia_anual": covariance / spread * 365.25 if spread else None,
+            "bajos": sum(flag == BAJO for flag in flags[start:end]),
+            "altos": sum(flag == ALTO for flag in flags[start:end]),
+        })
+    return summary
+
+
+def bulk_aggregation(store: HistoryStore):
+    """Agrega toda la tabla por (paciente, examen) con NumPy y en Python y devuelve los dos tiempos."""
+    import numpy as np
+
+    rows = store._query("SELECT paciente, examen, fecha, valor, fuera_rango FROM resultados", ())
+    patients, exams, dates, values, flags = zip(*rows)
+    keys = [patient + "\0" + exam for patient, exam in zip(patients, exams)]
+    groups = [index for index in range(len(keys)) if index == 0 or keys[index] != keys[index - 1]]
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    flags = [NORMAL if flag is None else flag for flag in flags]
+
+    # Como timeit: sin que el recolector recorra las filas cargadas en medio de la medida
+    gc.disable()
+    start = time.perf_counter()
+    vectorized = _aggregate(np, np.asarray(values), days, np.asarray(flags), np.asarray(groups))
+    numpy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    looped = python_aggregate(groups, list(values), days.tolist(), flags)
+    python_time = time.perf_counter() - start
+    gc.enable()
+    assert len(vectorized) == len(looped)
+    assert all(abs(a["media"] - b["media"]) < 1e-6 and a["bajos"] == b["bajos"] for a, b in zip(vectorized, looped))
+    return len(groups), numpy_time, python_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=1000000)
+    parser.add_argument("--consultas", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, "historial.db"))
+        start = time.perf_counter()
+        patients = fill(store, args.filas)
+        count = store._query("SELECT COUNT(*) FROM resultados", ())[0][0]
+        print(f"Filas: {count:,} ({patients:,} pacientes), llenado en {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(1)
+        sample = [f"P{rng.randrange(patients):06d}" for _ in range(args.consultas)]
+        exams = list(EXAMENES)
+        store.summary(sample[0])  # la primera consulta importa NumPy
+        queries = (
+            ("serie", store.series, [(patient, rng.choice(exams)) for patient in sample]),
+            ("serie en mmol/L", store.series, [(patient, "Glucosa", None, None, "mmol/L") for patient in sample]),
+            ("fuera de rango", store.out_of_range, [(patient,) for patient in sample]),
+            ("resumen", store.summary, [(patient,) for patient in sample]),
+        )
+        print(f"{'consulta':>18} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+        for name, func, arguments in queries:
+            p50, p99 = measure(func, arguments)
+            print(f"{name:>18} {p50 * 1e3:>10.2f} {p99 * 1e3:>10.2f}")
+
+        groups, numpy_time, python_time = bulk_aggregation(store)
+        print(f"Agregación de toda la tabla ({groups:,} series): NumPy {numpy_time * 1e3:.0f} ms,"
+              f" Python {python_time * 1e3:.0f} ms ({python_time / numpy_time:.1f}x)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Mide el tiempo de importación de la aplicación y lo compara con un presupuesto.
+
+Importa `backend.main` en procesos nuevos (sin cachés en memoria de una
+importación anterior), informa de la mediana y de los módulos que más tardan
+según `python -X importtime`, y termina con error si la mediana supera el
+presupuesto. También comprueba que las dependencias pesadas no se cargan al
+importar.
+
+Uso: python -m benchmarks.bench_import_time [--repeticiones 5] [--presupuesto-ms 800]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Dependencias que solo deben cargarse al usarse (en los trabajadores o al primer uso)
+PESADAS = ("fitz", "pytesseract", "PIL", "pdfplumber", "httpx", "tesserocr")
+
+MEDIR = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import backend.main\n"
+    "print((time.perf_counter() - start) * 1000)\n"
+    f"print(','.join(m for m in {PESADAS!r} if m in sys.modules))\n"
+)
+
+
+def import_once():
+    output = subprocess.run([sys.executable, "-c", MEDIR], capture_output=True, text=True, check=True).stdout
+    elapsed, loaded = (output.splitlines() + [""])[:2]
+    return float(elapsed), [name for name in loaded.split(",") if name]
+
+
+def slowest_modules(count: int):
+    """Importaciones directas de backend.main (y la propia) con su tiempo acumulado."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.main"],
+                            capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # La sangría del nombre indica la profundidad: un espacio para backend.main, tres para lo que importa
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        if depth <= 1:
+            modules.append((int(parts[1]), parts[2].strip()))
+    return sorted(modules, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--presupuesto-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    times = []
+    loaded = []
+    for _ in range(args.repeticiones):
+        elapsed, loaded = import_once()
+        times.append(elapsed)
+    median = statistics.median(times)
+    print(f"Importación de backend.main: mediana {median:.0f} ms (mín {min(times):.0f}, máx {max(times):.0f})")
+    print("\nMódulos con mayor tiempo acumulado:")
+    for cumulative_us, name in slowest_modules(10):
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"\nDependencias pesadas cargadas al importar: {', '.join(loaded)}")
+        failed = True
+    if median > args.presupuesto_ms:
+        print(f"\nLa importación supera el presupuesto de {args.presupuesto_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"\nDentro del presupuesto de {args.presupuesto_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compara la inferencia con peticiones individuales y con lotes contra el servidor de prueba.
+
+Lanza muchas peticiones concurrentes y mide el tiempo total y los textos por
+segundo con `max_batch=1` (una petición por texto) y con lotes. Requiere el
+servidor de prueba en marcha:
+
+    uvicorn backend.stub_inference:app --port 8001
+
+Uso: python -m benchmarks.bench_inference_batching [--url http://127.0.0.1:8001/] [--peticiones 200]
+"""
+import argparse
+import asyncio
+import time
+
+from backend.inference import InferenceBatcher, InferenceClient
+
+TEXTO = "HEMOGLOBINA 14.5 g/dL (12.0-16.0)\nGLUCOSA 95 mg/dL (70-110)\nCREATININA 0.9 mg/dL"
+
+
+async def run(url: str, requests: int, window_ms: float, max_batch: int, max_connections: int):
+    client = InferenceClient(url, "", max_connections=max_connections)
+    batcher = InferenceBatcher(client, window_ms=window_ms, max_batch=max_batch)
+    await client.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(*[batcher.infer(f"{TEXTO}\nMUESTRA{i}") for i in range(requests)],
+                                   return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await batcher.close()
+    await client.close()
+    errors = sum(isinstance(result, Exception) for result in results)
+    return elapsed, errors, batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8001/")
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--ventana-ms", type=float, default=10)
+    parser.add_argument("--conexiones", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'max_lote':>8} {'total s':>8} {'textos/s':>9} {'lotes':>6} {'tam. medio':>10} "
+          f"{'lat. media ms':>13} {'errores':>7}")
+    for max_batch in (1, 4, 8, 16, 32):
+        elapsed, errors, stats = asyncio.run(
+            run(args.url, args.peticiones, args.ventana_ms, max_batch, args.conexiones))
+        print(f"{max_batch:>8} {elapsed:>8.2f} {args.peticiones / elapsed:>9.1f} {stats['lotes']:>6} "
+              f"{stats['tamano_medio']:>10.1f} {stats['latencia_media_ms']:>13.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compara la latencia por imagen de pytesseract y del pool de motores de tesserocr.
+
+Con imágenes pequeñas (unas pocas líneas de resultados) el arranque del proceso
+`tesseract` y la carga de `spa.traineddata` dominan el tiempo de pytesseract;
+el pool los paga una sola vez. Requiere Tesseract con el idioma español y, para
+la segunda fila, el paquete tesserocr.
+
+Uso: python -m benchmarks.bench_ocr_engines [--imagenes 30]
+"""
+import argparse
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from backend.ocr import TESSEROCR_INSTALLED, EnginePool, PytesseractEngine
+
+LINEAS = [
+    "Glucosa: 95 mg/dL (70-110)",
+    "Creatinina: 0.9 mg/dL (0.6-1.2)",
+    "Hemoglobina 13.8 g/dL (12.0-16.0)",
+]
+
+
+def small_image(index: int) -> Image.Image:
+    image = Image.new("L", (900, 200), 255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 32)
+    except OSError:
+        font = ImageFont.load_default(size=32)
+    for row, line in enumerate(LINEAS):
+        draw.text((20, 20 + row * 55), line.replace("95", str(80 + index)), fill=0, font=font)
+    return image
+
+
+def measure(engine, images) -> list:
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        engine.recognize(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--imagenes", type=int, default=30)
+    args = parser.parse_args()
+
+    images = [small_image(index) for index in range(args.imagenes)]
+    engines = [("pytesseract", PytesseractEngine())]
+    if TESSEROCR_INSTALLED:
+        pool = EnginePool(size=1)
+        start = time.perf_counter()
+        pool.warm_up()
+        print(f"Carga del pool de tesserocr: {(time.perf_counter() - start) * 1000:.1f} ms")
+        engines.append(("tesserocr (pool)", pool))
+    else:
+        print("tesserocr no está instalado: solo se mide pytesseract")
+
+    print(f"\n{'motor':<18}{'media ms':>10}{'mediana ms':>12}{'p95 ms':>10}{'imágenes/s':>12}")
+    for name, engine in engines:
+        latencies = measure(engine, images)
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        print(f"{name:<18}{statistics.mean(latencies):>10.1f}{statistics.median(latencies):>12.1f}"
+              f"{p95:>10.1f}{1000 * len(latencies) / sum(latencies):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
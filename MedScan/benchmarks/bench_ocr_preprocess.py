@@ -0,0 +1,132 @@
+"""Mide la latencia por etapa y la precisión del OCR con distintas opciones de preprocesamiento.
+
+Por defecto genera un corpus sintético de fotos de informes (12 megapíxeles, en
+color, con fondo no blanco y ligeramente inclinadas); con `--corpus` usa una
+carpeta de imágenes, cada una con un `.txt` del mismo nombre con el texto
+esperado. La precisión es la similitud de caracteres (difflib) entre el texto
+esperado y el reconocido, con los espacios normalizados. Requiere Tesseract con
+el idioma español instalado.
+
+Uso: python -m benchmarks.bench_ocr_preprocess [--imagenes 4] [--corpus carpeta]
+"""
+import argparse
+import difflib
+import io
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+
+from backend.extraction import preprocess_image
+from backend.ocr import tesseract_config
+
+LINEAS = [
+    "LABORATORIO CLINICO SAN RAFAEL",
+    "Paciente: Maria Fernanda Lopez",
+    "Edad: 42 años   Sexo: F   Fecha: 12/03/2024",
+    "HEMOGRAMA COMPLETO",
+    "Hemoglobina 13.8 g/dL (12.0-16.0)",
+    "Hematocrito 41.2 % (36-46)",
+    "Leucocitos 7200 /µL (4500-11000)",
+    "Plaquetas 250000 /µL (150000-450000)",
+    "QUIMICA SANGUINEA",
+    "Glucosa: 95 mg/dL (70-110)",
+    "Creatinina: 0.9 mg/dL (0.6-1.2)",
+    "Colesterol total = 185 mg/dL (<200)",
+    "Conclusión: valores dentro de los rangos de referencia",
+]
+
+# Opciones a comparar: nombre -> (preprocesar, argumentos de preprocess_image, psm)
+AJUSTES: List[Tuple[str, bool, Dict, int]] = [
+    ("sin preprocesar", False, {}, 3),
+    ("grises 300 dpi", True, {"target_dpi": 300, "binarize": False, "deskew": False, "crop": False}, 3),
+    ("+ binarizado", True, {"target_dpi": 300, "binarize": True, "deskew": False, "crop": False}, 3),
+    ("+ enderezado", True, {"target_dpi": 300, "binarize": True, "deskew": True, "crop": False}, 3),
+    ("+ recorte", True, {"target_dpi": 300, "binarize": True, "deskew": True, "crop": True}, 3),
+    ("completo psm 4", True, {"target_dpi": 300, "binarize": True, "deskew": True, "crop": True}, 4),
+    ("completo psm 6", True, {"target_dpi": 300, "binarize": True, "deskew": True, "crop": True}, 6),
+    ("completo 200 dpi", True, {"target_dpi": 200, "binarize": True, "deskew": True, "crop": True}, 3),
+]
+
+ETAPAS = ["decodificacion", "escala_grises", "binarizacion", "enderezado", "recorte", "ocr"]
+
+
+def synthetic_photo(seed: int) -> Tuple[bytes, str]:
+    """Dibuja un informe en una foto JPEG de 3024x4032 y devuelve sus bytes y el texto."""
+    rng = random.Random(seed)
+    page = Image.new("RGB", (2480, 3508), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 56)
+    except OSError:
+        font = ImageFont.load_default(size=56)
+    y = 250
+    for line in LINEAS:
+        draw.text((200, y), line, fill=(20, 20, 20), font=font)
+        y += 110
+    photo = Image.new("RGB", (3024, 4032), (rng.randint(150, 190), rng.randint(140, 180), rng.randint(110, 150)))
+    page = page.rotate(rng.uniform(-3, 3), resample=Image.Resampling.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+    photo.paste(page, ((photo.width - page.width) // 2, (photo.height - page.height) // 2))
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue(), "\n".join(LINEAS)
+
+
+def load_corpus(path: str) -> List[Tuple[bytes, str]]:
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        base, ext = os.path.splitext(name)
+        reference = os.path.join(path, base + ".txt")
+        if ext.lower() in (".jpg", ".jpeg", ".png") and os.path.exists(reference):
+            with open(os.path.join(path, name), "rb") as image_file, open(reference, encoding="utf-8") as text_file:
+                corpus.append((image_file.read(), text_file.read()))
+    return corpus
+
+
+def accuracy(expected: str, recognized: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(expected.split()), " ".join(recognized.split())).ratio()
+
+
+def run(contents: bytes, expected: str, preprocess: bool, options: Dict, psm: int) -> Tuple[Dict[str, float], float]:
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(contents))
+    if not preprocess:
+        image.load()
+    timings["decodificacion"] = time.perf_counter() - start
+    if preprocess:
+        image = preprocess_image(image, timings=timings, **options)
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(image, lang="spa", config=tesseract_config(psm))
+    timings["ocr"] = time.perf_counter() - start
+    return timings, accuracy(expected, text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--imagenes", type=int, default=4)
+    parser.add_argument("--corpus", help="carpeta con imágenes y su texto esperado en .txt")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else [synthetic_photo(seed) for seed in range(args.imagenes)]
+    print(f"{len(corpus)} imágenes; tiempos medios en ms por imagen\n")
+    header = f"{'ajuste':<18}" + "".join(f"{stage[:11]:>12}" for stage in ETAPAS) + f"{'total':>10}{'precisión':>11}"
+    print(header)
+    for name, preprocess, options, psm in AJUSTES:
+        totals = {stage: 0.0 for stage in ETAPAS}
+        precision = 0.0
+        for contents, expected in corpus:
+            timings, score = run(contents, expected, preprocess, options, psm)
+            for stage, seconds in timings.items():
+                totals[stage] += seconds
+            precision += score
+        row = "".join(f"{totals[stage] / len(corpus) * 1000:>12.1f}" for stage in ETAPAS)
+        total = sum(totals.values()) / len(corpus) * 1000
+        print(f"{name:<18}{row}{total:>10.1f}{precision / len(corpus):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
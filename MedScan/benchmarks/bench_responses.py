@@ -0,0 +1,62 @@
+"""Mide el tamaño y el tiempo de serialización de las respuestas en modo completo y ligero.
+
+Para cada tamaño de informe sintético compara la respuesta completa serializada
+con json (como JSONResponse) frente a la serializada con `backend.responses`,
+en modo completo y ligero y con y sin gzip. Muestra los bytes y los percentiles
+50 y 99 del tiempo de serialización.
+
+Uso: python -m benchmarks.bench_responses [--repeticiones 500]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from backend import responses
+from backend.pipeline import build_extraction_response, process_text_with_rules
+from benchmarks.reports import TAMANOS, generate_report
+
+
+def json_response_body(content) -> bytes:
+    """Serialización de JSONResponse de Starlette."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def measure(func, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return len(body), statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"Codificador: {'orjson' if responses.orjson is not None else 'json'}")
+    print(f"{'tamaño':>8} {'variante':>24} {'bytes':>9} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+    for size in TAMANOS:
+        # Con la línea "Resultados" las reglas leen los exámenes del informe
+        header, body = generate_report(0, size).split("\n\n", 1)
+        text = f"{header}\n\nResultados\n{body}"
+        response = build_extraction_response(text, process_text_with_rules(text))
+        variants = (
+            ("completo (json)", lambda: json_response_body(responses.render(response))),
+            ("completo", lambda: responses.dumps(responses.render(response))),
+            ("ligero", lambda: responses.dumps(responses.render(response, responses.MODO_LIGERO))),
+            ("ligero + gzip", lambda: gzip.compress(
+                responses.dumps(responses.render(response, responses.MODO_LIGERO)),
+                compresslevel=responses.RESPONSE_GZIP_LEVEL)),
+        )
+        for name, func in variants:
+            length, p50, p99 = measure(func, args.repeticiones)
+            print(f"{size:>8} {name:>24} {length:>9,} {p50 * 1e6:>10.1f} {p99 * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
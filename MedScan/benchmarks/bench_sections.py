@@ -0,0 +1,109 @@
+"""Mide el segmentador de secciones frente a las expresiones regulares anteriores.
+
+Comprueba primero que ambos dan las mismas conclusiones y recomendaciones sobre
+informes sintéticos y textos aleatorios. Después mide el tiempo por documento en
+informes normales y en el peor caso: salida de OCR larga con tramos de espacios
+tras el encabezado, donde las expresiones anteriores tardan un tiempo cuadrático.
+
+Uso: python -m benchmarks.bench_sections [--repeticiones 20] [--aleatorios 20000]
+"""
+import argparse
+import random
+import re
+import time
+
+from backend.sections import CONCLUSIONES, RECOMENDACIONES, SectionIndex
+from benchmarks.reports import TAMANOS, generate_report
+
+# Expresiones usadas antes por extract_conclusions_and_recommendations
+PATRONES_CONCLUSIONES = [
+    r"(?i)conclusi[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
+    r"(?i)interpretaci[óo]n[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
+    r"(?i)resultados?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
+    r"(?i)comentarios?[:\s]+(.*?)(?=\s*(?:recomendaci|firma|$))",
+]
+PATRONES_RECOMENDACIONES = [
+    r"(?i)recomendaci[óo]n(?:es)?[:\s]+(.*?)(?=\s*(?:firma|$))",
+    r"(?i)sugerencias?[:\s]+(.*?)(?=\s*(?:firma|$))",
+    r"(?i)observaciones?[:\s]+(.*?)(?=\s*(?:firma|$))",
+]
+
+# Piezas para generar textos aleatorios con encabezados, marcas y separadores mezclados
+PIEZAS = [
+    "Conclusión", "conclusiones", "CONCLUSION", "Interpretación", "resultado", "Resultados",
+    "comentario", "Recomendación", "recomendaciones", "sugerencia", "Observaciones", "observacion",
+    "Firma", "confirmado", ":", " ", "  ", "\n", "\t", "x", "es", "s", "valor 12", "o", "ó",
+    "reſultado", "İ",  # letras cuyo paso a minúsculas no coincide con re.IGNORECASE
+]
+
+
+def regex_sections(text: str):
+    result = []
+    for patterns in (PATRONES_CONCLUSIONES, PATRONES_RECOMENDACIONES):
+        value = ""
+        for pattern in patterns:
+            match = re.search(pattern, text, re.DOTALL)
+            if match:
+                value = match.group(1).strip()
+                break
+        result.append(value)
+    return result
+
+
+def index_sections(text: str):
+    sections = SectionIndex(text)
+    return [
+        sections.section(CONCLUSIONES, until=("recomendaciones", "firma")),
+        sections.section(RECOMENDACIONES, until=("firma",)),
+    ]
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(PIEZAS) for _ in range(rng.randint(0, 30)))
+
+
+def measure(func, texts, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--aleatorios", type=int, default=20000)
+    args = parser.parse_args()
+
+    reports = [generate_report(seed, size) for seed in range(20) for size in TAMANOS]
+    rng = random.Random(0)
+    for text in reports + [random_text(rng) for _ in range(args.aleatorios)]:
+        assert index_sections(text) == regex_sections(text), repr(text)
+    print(f"Resultados idénticos en {len(reports)} informes y {args.aleatorios} textos aleatorios\n")
+
+    print("Informes sintéticos")
+    for size in TAMANOS:
+        texts = [generate_report(seed, size) for seed in range(20)]
+        before = measure(regex_sections, texts, args.repeticiones) / (len(texts) * args.repeticiones)
+        after = measure(index_sections, texts, args.repeticiones) / (len(texts) * args.repeticiones)
+        print(f"  {size:>8}: regex {before * 1e6:>9.1f} µs  segmentador {after * 1e6:>9.1f} µs ({before / after:.1f}x)")
+
+    print("\nPeor caso: OCR ruidoso con tramos largos de espacios")
+    print(f"{'forma':>22} {'longitud':>10} {'regex (ms)':>12} {'segmentador (ms)':>17}")
+    shapes = (
+        ("conclusión + espacios", lambda n: "Conclusiones: a" + " " * n + "b"),
+        ("ruido sin encabezado", lambda n: ("lorem ipsum 12.3 \n" * (n // 18 + 1))[:n] + " " * n),
+        ("resultados + ruido", lambda n: "Resultados: " + "x  \t " * (n // 5) + "\n" * n),
+    )
+    for shape, build in shapes:
+        for length in (2000, 4000, 8000, 16000):
+            text = build(length)
+            assert index_sections(text) == regex_sections(text)
+            before = measure(regex_sections, [text], 1) * 1000
+            after = measure(index_sections, [text], 1) * 1000
+            print(f"{shape:>22} {length:>10} {before:>12.2f} {after:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Mide la extracción con plantillas de laboratorio frente a las reglas genéricas.
+
+Con las plantillas de `benchmarks/plantillas.json`, compara para cada tamaño los
+percentiles 50 y 99 de `process_text_with_rules` sobre un informe libre con los
+de la extracción de los formatos fijos de `benchmarks.reports` con su plantilla,
+comprobando que la plantilla lee todos los resultados. Mide también lo que
+cuesta buscar la huella en un informe sin plantilla y termina con la tasa de
+aciertos sobre una mezcla de informes.
+
+Uso: python -m benchmarks.bench_templates [--repeticiones 200] [--proporcion 0.8]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from backend.pipeline import process_text_with_rules
+from backend.templates import TemplateRegistry
+from benchmarks.reports import FORMATOS, TAMANOS, generate_lab_report, generate_report
+
+PLANTILLAS = os.path.join(os.path.dirname(__file__), "plantillas.json")
+
+
+def measure(func, text: str, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--proporcion", type=float, default=0.8,
+                        help="proporción de informes con plantilla en la mezcla")
+    args = parser.parse_args()
+
+    registry = TemplateRegistry.from_file(PLANTILLAS)
+    print(f"{'tamaño':>8} {'camino':>22} {'p50 (µs)':>10} {'p99 (µs)':>10} {'resultados':>11} {'µs/resultado':>13}")
+    for size in TAMANOS:
+        # Las reglas genéricas sobre un informe libre del mismo tamaño, con la
+        # línea "Resultados" para que lean los exámenes
+        header, body = generate_report(0, size).split("\n\n", 1)
+        text = f"{header}\n\nResultados\n{body}"
+        cases = [("reglas (informe libre)", process_text_with_rules, text, None)]
+        for lab in FORMATOS:
+            text, expected = generate_lab_report(0, lab, size)
+            cases.append((f"plantilla {lab}", registry.extract, text, expected))
+        for name, func, text, expected in cases:
+            rows = len(func(text)["datos_estructurados"])
+            if expected is not None:
+                assert rows == expected, f"{name}/{size}: la plantilla leyó {rows} de {expected} resultados"
+            p50, p99 = measure(func, text, args.repeticiones)
+            print(f"{size:>8} {name:>22} {p50 * 1e6:>10.1f} {p99 * 1e6:>10.1f} {rows:>11} {p50 * 1e6 / rows:>13.1f}")
+
+    text = generate_report(0, "mediano")
+    p50, p99 = measure(registry.match, text, args.repeticiones)
+    print(f"Búsqueda de huella sin plantilla: p50 {p50 * 1e6:.1f} µs, p99 {p99 * 1e6:.1f} µs")
+
+    registry = TemplateRegistry.from_file(PLANTILLAS)
+    rng = random.Random(1)
+    for seed in range(1000):
+        if rng.random() < args.proporcion:
+            text, _ = generate_lab_report(seed, rng.choice(FORMATOS), rng.choice(list(TAMANOS)))
+        else:
+            text = generate_report(seed, rng.choice(list(TAMANOS)))
+        registry.extract(text)
+    stats = registry.stats()
+    print(f"Mezcla de {stats['consultas']} informes: tasa de aciertos {stats['tasa_aciertos']:.1%},"
+          f" sin plantilla {stats['sin_plantilla']}, fallos {stats['fallos']}, por plantilla {stats['por_plantilla']}")
+
+
+if __name__ == "__main__":
+    main()
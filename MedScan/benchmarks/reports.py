@@ -0,0 +1,197 @@
+"""Generador de informes de laboratorio sintéticos en español.
+
+Cada informe tiene un encabezado con los datos del paciente y del médico,
+categorías de exámenes (hemograma, bioquímica, perfil lipídico...) con valores,
+unidades y rangos de referencia, y conclusiones. Los informes se pueden obtener
+como texto, como PDF con capa de texto o como imagen rasterizada.
+"""
+import io
+import random
+from typing import Dict, List, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+NOMBRES = ["María Fernanda López", "Juan Carlos Pérez", "Ana Lucía Gómez", "Pedro Antonio Ruiz",
+           "Carmen Rosa Díaz", "Luis Alberto Torres", "Sofía Isabel Vargas", "Jorge Enrique Castro"]
+MEDICOS = ["Carlos Ruiz", "Laura Méndez", "Andrés Herrera", "Patricia Molina"]
+ESPECIALIDADES = ["Medicina Interna", "Medicina Familiar", "Endocrinología", "Hematología"]
+LABORATORIOS = ["Central", "San Rafael", "Santa María", "del Norte"]
+
+# Categoría -> exámenes (nombre, unidad, mínimo, máximo, decimales)
+CATEGORIAS: Dict[str, List[Tuple[str, str, float, float, int]]] = {
+    "HEMOGRAMA": [
+        ("hemoglobina", "g/dL", 12.0, 16.0, 1),
+        ("hematocrito", "%", 36, 46, 1),
+        ("leucocitos", "/µL", 4500, 11000, 0),
+        ("neutrófilos", "%", 40, 70, 1),
+        ("linfocitos", "%", 20, 40, 1),
+        ("plaquetas", "/µL", 150000, 450000, 0),
+        ("volumen corpuscular medio", "fL", 80, 100, 1),
+    ],
+    "BIOQUÍMICA": [
+        ("glucosa", "mg/dL", 70, 110, 0),
+        ("urea", "mg/dL", 15, 45, 0),
+        ("creatinina", "mg/dL", 0.6, 1.2, 2),
+        ("ácido úrico", "mg/dL", 2.5, 7.0, 1),
+        ("sodio", "mEq/L", 135, 145, 0),
+        ("potasio", "mEq/L", 3.5, 5.1, 1),
+    ],
+    "PERFIL LIPÍDICO": [
+        ("colesterol total", "mg/dL", 0, 200, 0),
+        ("colesterol hdl", "mg/dL", 40, 60, 0),
+        ("colesterol ldl", "mg/dL", 0, 130, 0),
+        ("triglicéridos", "mg/dL", 0, 150, 0),
+    ],
+    "PERFIL HEPÁTICO": [
+        ("tgo", "U/L", 5, 40, 0),
+        ("tgp", "U/L", 7, 56, 0),
+        ("bilirrubina total", "mg/dL", 0.1, 1.2, 2),
+        ("fosfatasa alcalina", "U/L", 44, 147, 0),
+    ],
+    "UROANÁLISIS": [
+        ("densidad", "", 1.005, 1.030, 3),
+        ("leucocitos en orina", "/campo", 0, 5, 0),
+        ("hematíes en orina", "/campo", 0, 3, 0),
+    ],
+    "HORMONAS": [
+        ("tsh", "mU/L", 0.4, 4.0, 2),
+        ("t4 libre", "ng/dL", 0.8, 1.8, 2),
+    ],
+}
+
+# Tamaño -> (número de categorías, repeticiones del bloque de resultados)
+TAMANOS = {"pequeno": (1, 1), "mediano": (4, 1), "grande": (6, 8)}
+
+
+def _value(rng: random.Random, low: float, high: float, decimals: int) -> str:
+    span = high - low or high or 1
+    value = rng.uniform(low - 0.2 * span, high + 0.2 * span)
+    return f"{max(value, 0):.{decimals}f}"
+
+
+def _exam_line(rng: random.Random, name: str, unit: str, low: float, high: float, decimals: int) -> str:
+    value = _value(rng, low, high, decimals)
+    reference = f"<{high:g}" if low == 0 else f"{low:g}-{high:g}"
+    unit_part = f" {unit}" if unit else ""
+    style = rng.random()
+    if style < 0.5:
+        return f"{name} {value}{unit_part} ({reference})"
+    if style < 0.8:
+        return f"{name}: {value}{unit_part} ({reference})"
+    return f"{name.capitalize()} = {value}{unit_part} ({reference})"
+
+
+def generate_report(seed: int, size: str = "mediano") -> str:
+    """Devuelve el texto de un informe; la misma semilla produce el mismo informe."""
+    rng = random.Random(seed)
+    categories, repeat = TAMANOS[size]
+    lines = [
+        f"LABORATORIO CLÍNICO {rng.choice(LABORATORIOS).upper()}",
+        "Informe de resultados de laboratorio",
+        f"Paciente: {rng.choice(NOMBRES)}",
+        f"Edad: {rng.randint(18, 90)} años",
+        f"Sexo: {rng.choice('MF')}",
+        f"Fecha: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024",
+        f"Cédula: {rng.randint(1000000, 99999999)}",
+        f"Médico: {rng.choice(MEDICOS)}",
+        f"Especialidad: {rng.choice(ESPECIALIDADES)}",
+        "Tipo de muestra: Sangre venosa",
+        "",
+    ]
+    names = rng.sample(list(CATEGORIAS), categories)
+    for block in range(repeat):
+        for category in names:
+            lines.append(category if block == 0 else f"{category} (control {block})")
+            for exam in CATEGORIAS[category]:
+                lines.append(_exam_line(rng, *exam))
+            lines.append("")
+    lines.append("Conclusiones: valores dentro de los rangos de referencia salvo los señalados.")
+    lines.append("Recomendaciones: control en seis meses.")
+    lines.append("Firma")
+    return "\n".join(lines) + "\n"
+
+
+# Laboratorio -> formato fijo de sus informes (descrito en benchmarks/plantillas.json)
+FORMATOS = ("san_rafael", "del_norte")
+
+
+def _reference(low: float, high: float) -> str:
+    return f"< {high:g}" if low == 0 else f"{low:g} - {high:g}"
+
+
+def generate_lab_report(seed: int, lab: str, size: str = "mediano") -> Tuple[str, int]:
+    """Informe con el formato fijo de un laboratorio de `FORMATOS` y su número de resultados."""
+    rng = random.Random(seed)
+    categories, repeat = TAMANOS[size]
+    patient, doctor = rng.choice(NOMBRES), rng.choice(MEDICOS)
+    age, sex, document = rng.randint(18, 90), rng.choice("MF"), rng.randint(1000000, 99999999)
+    date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024"
+    if lab == "san_rafael":
+        lines = [
+            "LABORATORIO CLÍNICO SAN RAFAEL",
+            "RUC 20123456789 - Av. Principal 123",
+            "Informe de resultados de laboratorio",
+            f"Paciente: {patient}    Documento: {document}",
+            f"Edad: {age} años    Sexo: {sex}    Fecha de toma: {date}",
+            f"Médico: {doctor}",
+            "",
+            "Prueba | Resultado | Unidad | Valores de referencia",
+        ]
+    else:
+        lines = [
+            "LABORATORIO DEL NORTE S.A.",
+            "Resultados de análisis clínicos",
+            f"Nombre del paciente: {patient}",
+            f"Historia clínica: {document}        Fecha: {date}",
+            f"Solicitado por: {doctor}",
+            "",
+            f"{'EXAMEN':<28}{'RESULTADO':<12}{'UNIDADES':<12}{'MÍNIMO':<10}MÁXIMO",
+        ]
+    count = 0
+    names = rng.sample(list(CATEGORIAS), categories)
+    for block in range(repeat):
+        for category in names:
+            lines.append(category)
+            for name, unit, low, high, decimals in CATEGORIAS[category]:
+                value = _value(rng, low, high, decimals)
+                if lab == "san_rafael":
+                    lines.append(f"{name} | {value} | {unit} | {_reference(low, high)}")
+                else:
+                    lines.append(f"{name.capitalize():<28}{value:<12}{unit or '-':<12}{low:<10g}{high:g}")
+                count += 1
+    lines.append("")
+    lines.append("Conclusión: valores dentro de los rangos de referencia salvo los señalados.")
+    lines.append("Recomendaciones: control en seis meses.")
+    lines.append("Firma")
+    return "\n".join(lines) + "\n", count
+
+
+def report_pdf(text: str, lines_per_page: int = 55) -> bytes:
+    """PDF A4 con capa de texto, repartiendo las líneas en páginas."""
+    doc = fitz.open()
+    lines = text.splitlines()
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        page = doc.new_page(width=595, height=842)
+        y = 50
+        for line in lines[start:start + lines_per_page]:
+            page.insert_text((50, y), line, fontsize=10)
+            y += 13.5
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def report_image(text: str, dpi: int = 200, image_format: str = "png") -> bytes:
+    """Primera página del informe rasterizada como imagen (sin capa de texto)."""
+    doc = fitz.open(stream=report_pdf(text), filetype="pdf")
+    try:
+        pix = doc[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        if image_format == "png":
+            return pix.tobytes("png")
+        image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+    finally:
+        doc.close()
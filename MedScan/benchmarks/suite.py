@@ -0,0 +1,179 @@
+"""Suite de benchmarks del pipeline completo sobre informes sintéticos.
+
+Mide cada etapa por separado (campos del encabezado, reglas, normalización,
+capa de texto del PDF, OCR) y los endpoints de extremo a extremo con la llamada
+al modelo sustituida por el servidor de prueba en memoria, para informes de
+varios tamaños en texto, PDF e imagen. El resultado se guarda en JSON y se
+puede comparar con una línea base guardada antes:
+
+    python -m benchmarks.suite --salida resultados.json
+    python -m benchmarks.suite --guardar-base benchmarks/baseline.json
+    python -m benchmarks.suite --base benchmarks/baseline.json --tolerancia 0.15
+
+El OCR solo se mide si Tesseract está instalado. EXECUTOR_MODE=thread evita el
+coste de enviar los documentos al pool de procesos.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.reports import TAMANOS, generate_report, report_image, report_pdf
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "iteraciones": len(samples),
+        "mediana_ms": statistics.median(ordered) * 1000,
+        "media_ms": statistics.mean(ordered) * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+        "min_ms": ordered[0] * 1000,
+    }
+
+
+def measure(func: Callable[[int], Any], iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    """Ejecuta `func(i)` varias veces y resume los tiempos de cada llamada."""
+    for index in range(warmup):
+        func(-1 - index)
+    samples = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        func(index)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def ocr_available() -> bool:
+    from backend.ocr import check_tesseract
+    try:
+        check_tesseract()
+        return True
+    except Exception:
+        return False
+
+
+def stub_inference(main_module, latency_ms: float):
+    """Sustituye la llamada al modelo por las entidades del servidor de prueba."""
+    from backend.stub_inference import fake_entities
+
+    async def infer(text: str):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return fake_entities(text)
+
+    main_module.inference_batcher.infer = infer
+
+
+def run_suite(iterations: int, sizes: List[str], model_latency_ms: float, with_ocr: bool) -> Dict[str, Dict]:
+    from fastapi.testclient import TestClient
+
+    from backend import main, pipeline
+    from backend.extraction import image_bytes_to_text, pdf_text_layer
+
+    stub_inference(main, model_latency_ms)
+    # Sin el evento de inicio: no se comprueba Tesseract ni la conexión con Hugging Face
+    client = TestClient(main.app)
+    results: Dict[str, Dict] = {}
+
+    for size in sizes:
+        text = generate_report(0, size)
+        pdf = report_pdf(text)
+        results[f"encabezado/{size}"] = measure(lambda _: pipeline.extract_header_info(text), iterations * 10)
+        results[f"info_paciente/{size}"] = measure(lambda _: pipeline.extract_patient_info(text), iterations * 10)
+        # Sin la memorización por texto, que haría que solo se midiera la primera llamada
+        results[f"normalizacion/{size}"] = measure(lambda _: main.preprocess_text.__wrapped__(text), iterations * 10)
+        results[f"reglas/{size}"] = measure(lambda _: pipeline.process_text_with_rules(text), iterations * 10)
+        results[f"pdf_capa_texto/{size}"] = measure(lambda _: pdf_text_layer(pdf), iterations)
+
+        # Un informe distinto por iteración para no medir la caché de resultados
+        pdfs = {index: report_pdf(generate_report(1000 + index, size)) for index in range(-1, iterations)}
+
+        def post_pdf(index: int, path: str = "/api/extract-text"):
+            response = client.post(path, files={"file": ("informe.pdf", pdfs[index], "application/pdf")})
+            assert response.status_code == 200, response.text
+
+        results[f"endpoint_extract_text_pdf/{size}"] = measure(post_pdf, iterations)
+        pdfs = {index: report_pdf(generate_report(2000 + index, size)) for index in range(-1, iterations)}
+        results[f"endpoint_process_pdf/{size}"] = measure(lambda index: post_pdf(index, "/process"), iterations)
+
+        if with_ocr:
+            for dpi in (150, 300):
+                image = report_image(text, dpi)
+                results[f"ocr_imagen_{dpi}dpi/{size}"] = measure(lambda _: image_bytes_to_text(image), iterations)
+            images = {index: report_image(generate_report(3000 + index, size), 200) for index in range(-1, iterations)}
+
+            def post_image(index: int):
+                response = client.post("/api/extract-text", files={"file": ("informe.png", images[index], "image/png")})
+                assert response.status_code == 200, response.text
+
+            results[f"endpoint_extract_text_imagen/{size}"] = measure(post_image, iterations)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> int:
+    """Imprime la comparación con la línea base y devuelve cuántas mediciones empeoraron."""
+    regressions = 0
+    print(f"\n{'medición':<42}{'base ms':>10}{'actual ms':>11}{'cambio':>9}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<42}{'-':>10}{current['mediana_ms']:>11.3f}{'nuevo':>9}")
+            continue
+        ratio = current["mediana_ms"] / previous["mediana_ms"] if previous["mediana_ms"] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  más lento"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = "  más rápido"
+        print(f"{name:<42}{previous['mediana_ms']:>10.3f}{current['mediana_ms']:>11.3f}{ratio:>8.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=20)
+    parser.add_argument("--tamanos", nargs="+", choices=list(TAMANOS), default=list(TAMANOS))
+    parser.add_argument("--latencia-modelo-ms", type=float, default=0.0)
+    parser.add_argument("--sin-ocr", action="store_true", help="no medir el OCR aunque Tesseract esté instalado")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--guardar-base", help="guardar los resultados como nueva línea base")
+    parser.add_argument("--base", help="línea base con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="cambio relativo que se considera significativo")
+    args = parser.parse_args()
+
+    with_ocr = not args.sin_ocr and ocr_available()
+    results = run_suite(args.iteraciones, args.tamanos, args.latencia_modelo_ms, with_ocr)
+    report = {
+        "meta": {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "iteraciones": args.iteraciones,
+            "ocr": with_ocr,
+        },
+        "resultados": results,
+    }
+
+    print(f"{'medición':<42}{'mediana ms':>11}{'p95 ms':>10}{'n':>6}")
+    for name, summary in results.items():
+        print(f"{name:<42}{summary['mediana_ms']:>11.3f}{summary['p95_ms']:>10.3f}{summary['iteraciones']:>6}")
+    for path in filter(None, (args.salida, args.guardar_base)):
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if args.base:
+        with open(args.base, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["resultados"]
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            print(f"\n{regressions} mediciones empeoraron más de un {args.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Configuración común de las pruebas.
+
+La aplicación se importa con el pool de CPU en hilos y con el modelo de
+inferencia apuntando a un puerto local donde no escucha nadie, así que las
+llamadas al modelo fallan al momento sin salir a la red.
+"""
+import os
+
+os.environ.setdefault("EXECUTOR_MODE", "thread")
+os.environ.setdefault("HUGGINGFACE_API_URL", "http://127.0.0.1:9/")
+os.environ.setdefault("WARMUP_RETRY_INTERVAL", "3600")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.cache import Cache, TieredCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Cliente de la aplicación con una caché vacía."""
+    monkeypatch.setattr(main, "cache", TieredCache(Cache(max_size=100, ttl_hours=1)))
+    with TestClient(main.app) as test_client:
+        yield test_client
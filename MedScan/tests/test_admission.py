@@ -0,0 +1,42 @@
+import json
+import time
+
+from backend import main
+from backend.admission import AdmissionController, Lane
+
+
+def small_lanes(monkeypatch):
+    """Carriles como los de un servidor con CPU_WORKERS=2."""
+    monkeypatch.setattr(main, "admission", AdmissionController({
+        "ligero": Lane("ligero", 4, 4, initial_seconds=0.5),
+        "pesado": Lane("pesado", 2, 2, initial_seconds=5.0),
+    }))
+
+
+def fake_ocr(contents: bytes) -> str:
+    time.sleep(0.02)
+    return f"Paciente: Prueba {contents.decode()}\nRESULTADOS\nGlucosa 90 mg/dL 70 - 100\n"
+
+
+def test_batch_on_idle_server_always_succeeds(client, monkeypatch):
+    small_lanes(monkeypatch)
+    monkeypatch.setattr(main, "image_bytes_to_text", fake_ocr)
+    files = [("files", (f"imagen{index}.png", str(index).encode(), "image/png")) for index in range(30)]
+
+    response = client.post("/api/extract-text/batch", files=files)
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 30
+    assert [record.get("error") for record in records if not record["ok"]] == []
+    assert main.admission.lanes["pesado"].rejected == 0
+
+
+def test_batch_is_rejected_as_a_unit_when_saturated(client, monkeypatch):
+    small_lanes(monkeypatch)
+    monkeypatch.setattr(main.admission.lanes["pesado"], "full", lambda: True)
+    files = [("files", (f"imagen{index}.png", str(index).encode(), "image/png")) for index in range(3)]
+
+    response = client.post("/api/extract-text/batch", files=files)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert main.admission.lanes["pesado"].rejected == 1
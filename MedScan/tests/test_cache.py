@@ -0,0 +1,72 @@
+import asyncio
+
+from backend import main
+from backend.cache import Cache, SQLiteCache, TieredCache
+from backend.metrics import analysis_total
+from benchmarks.reports import generate_report, report_pdf
+
+
+def upload(client, contents: bytes):
+    response = client.post("/api/extract-text", files={"file": ("informe.pdf", contents, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_fallback_result_is_not_served_from_cache(client, monkeypatch):
+    pdf = report_pdf(generate_report(5))
+
+    # El modelo no responde: el documento se analiza con las reglas
+    fallbacks = analysis_total.value("reglas")
+    first = upload(client, pdf)
+    assert analysis_total.value("reglas") == fallbacks + 1
+
+    # La segunda subida vuelve a intentar el análisis en lugar de servir el resultado de respaldo
+    assert upload(client, pdf) == first
+    assert analysis_total.value("reglas") == fallbacks + 2
+
+    # Con el modelo de vuelta, su resultado sí se guarda y la siguiente subida sale de la caché
+    async def infer(text):
+        return []
+
+    monkeypatch.setattr(main.inference_batcher, "infer", infer)
+    models = analysis_total.value("modelo")
+    upload(client, pdf)
+    assert analysis_total.value("modelo") == models + 1
+    upload(client, pdf)
+    assert analysis_total.value("modelo") == models + 1
+    assert analysis_total.value("reglas") == fallbacks + 2
+
+
+def test_sqlite_counters_follow_the_table(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.db"), max_size=2, ttl_hours=1)
+    store.set("a", {"valor": 1})
+    store.set("b", {"valor": 2})
+    store.set("a", {"valor": "más largo"})
+    assert (store.entries, store.bytes) == store._totals()
+
+    # Los límites no se aplican al escribir sino al compactar
+    store.set("c", {"valor": 3})
+    assert store.entries == 3
+    store.compact()
+    assert store.stats()["entradas"] == 2
+    assert (store.entries, store.bytes) == store._totals()
+
+
+def test_persistent_tier_runs_through_the_given_executor(tmp_path):
+    calls = []
+
+    async def run(func, *args):
+        calls.append(func.__name__)
+        return func(*args)
+
+    tiered = TieredCache(Cache(), SQLiteCache(str(tmp_path / "cache.db")), run=run)
+
+    async def scenario():
+        await tiered.set("a", {"valor": 1})
+        tiered.memory = Cache()
+        assert await tiered.get("a") == {"valor": 1}
+        assert await tiered.get("a") == {"valor": 1}  # ya en memoria
+        await tiered.purge_expired()
+
+    asyncio.run(scenario())
+    assert calls == ["set", "get", "purge_expired"]
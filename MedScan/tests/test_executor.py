@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.executor import ExecutionLayer
+
+
+def die():
+    os._exit(1)
+
+
+def wait(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def test_broken_pool_is_replaced_once():
+    layer = ExecutionLayer({"cpu": ("cpu", 4)}, cpu_workers=2, io_workers=1, mode="process")
+    created, shut_down = [], []
+    new_cpu_pool = layer._new_cpu_pool
+
+    def counted():
+        pool = new_cpu_pool()
+        shutdown = pool.shutdown
+
+        def recorded(*args, **kwargs):
+            shut_down.append(pool)
+            shutdown(*args, **kwargs)
+
+        pool.shutdown = recorded
+        created.append(pool)
+        return pool
+
+    layer._new_cpu_pool = counted
+
+    async def scenario():
+        layer.start()
+        await layer.run("cpu", wait, 0)  # arranca los trabajadores
+        broken = layer._cpu_pool
+        # Un trabajador muere con otras llamadas en curso: todas fallan a la vez
+        results = await asyncio.gather(
+            layer.run("cpu", die), layer.run("cpu", wait, 1), layer.run("cpu", wait, 1),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, BrokenProcessPool) for result in results)
+        assert len(created) == 2
+        assert layer._cpu_pool is created[1]
+        assert shut_down == [broken]
+        assert await layer.run("cpu", wait, 0) == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        layer.shutdown()
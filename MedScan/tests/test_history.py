@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from backend import main
+from backend.history import HistoryStore
+from benchmarks.reports import generate_report, report_pdf
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    history = HistoryStore(str(tmp_path / "historial.db"))
+    calls = []
+    record = history.record
+
+    def counted(document_key, response):
+        calls.append(document_key)
+        return record(document_key, response)
+
+    monkeypatch.setattr(history, "record", counted)
+    monkeypatch.setattr(main, "history", history)
+    yield history, calls
+    history.close()
+
+
+def upload(client, contents: bytes):
+    response = client.post("/api/extract-text", files={"file": ("informe.pdf", contents, "application/pdf")})
+    assert response.status_code == 200
+
+
+def test_cache_hits_are_not_recorded_again(client, store, monkeypatch):
+    history, calls = store
+
+    analyze = main.process_with_ai
+
+    # El resultado de las reglas trae la identificación del paciente; se hace
+    # pasar por el del modelo para que se guarde en caché
+    async def process_with_ai(text):
+        data, _ = await analyze(text)
+        return data, "modelo"
+
+    monkeypatch.setattr(main, "process_with_ai", process_with_ai)
+    pdf = report_pdf(generate_report(7))
+    upload(client, pdf)
+    wait_for(lambda: history.documents == 1)
+
+    # La segunda subida sale de la caché y no llega al historial
+    upload(client, pdf)
+    time.sleep(0.1)
+    assert len(calls) == 1
+    assert history.documents == 1
+
+
+def test_recorded_document_skips_the_write(client, store):
+    history, calls = store
+    # Sin modelo, el resultado de las reglas no se guarda en caché y cada subida se procesa de nuevo
+    pdf = report_pdf(generate_report(8))
+    upload(client, pdf)
+    wait_for(lambda: history.documents == 1)
+    statements = []
+    history._conn.set_trace_callback(statements.append)
+
+    upload(client, pdf)
+    wait_for(lambda: history.duplicates == 1)
+    assert len(calls) == 2
+    assert not [sql for sql in statements if not sql.startswith("SELECT")]
@@ -0,0 +1,280 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from backend import main
+from backend.inference import CircuitBreaker, CircuitOpenError, InferenceBatcher, InferenceClient
+from backend.stub_inference import fake_entities
+from backend.metrics import analysis_total
+from benchmarks.reports import generate_report, report_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_stub(**env):
+    """Arranca backend/stub_inference.py en un puerto libre y devuelve (proceso, url)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.stub_inference:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "STUB_LATENCY_MS": "0", "STUB_ITEM_LATENCY_MS": "0", **env},
+    )
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            if httpx.get(url).status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("El servidor de inferencia de prueba no arrancó")
+            time.sleep(0.05)
+
+
+@pytest.fixture(scope="module")
+def stubs():
+    """URL de un stub sano, de uno lento, de uno que siempre responde 503 y de uno que no responde nunca."""
+    started = {
+        "sano": start_stub(),
+        "lento": start_stub(STUB_LATENCY_MS="500"),
+        "falla": start_stub(STUB_FAIL_RATE="1"),
+        "cuelga": start_stub(STUB_HANG="1"),
+    }
+    yield {name: url for name, (_, url) in started.items()}
+    for process, _ in started.values():
+        # Sin apagado ordenado: el stub colgado esperaría para siempre a sus conexiones abiertas
+        process.kill()
+        process.wait()
+
+
+def run_with_client(url, scenario, failures=2, reset=0.2, read_timeout=5.0):
+    client = InferenceClient(url, "", read_timeout=read_timeout,
+                             breaker=CircuitBreaker(failure_threshold=failures, reset_timeout=reset))
+
+    async def wrapper():
+        try:
+            await scenario(client)
+        finally:
+            await client.close()
+
+    asyncio.run(wrapper())
+    return client
+
+
+def test_timeout_counts_as_failure(stubs):
+    async def scenario(client):
+        with pytest.raises(httpx.ReadTimeout):
+            await client.infer("texto")
+
+    client = run_with_client(stubs["cuelga"], scenario, read_timeout=0.2)
+    assert client.breaker.failures == 1
+    assert client.breaker.state == "cerrado"
+
+
+def test_breaker_opens_and_rejects_without_calling(stubs):
+    async def scenario(client):
+        for _ in range(2):
+            with pytest.raises(Exception, match="Hugging Face"):
+                await client.infer("texto")
+        # Con el circuito abierto ni siquiera se intenta la conexión
+        client.url = "http://127.0.0.1:9/"
+        with pytest.raises(CircuitOpenError):
+            await client.infer("texto")
+
+    client = run_with_client(stubs["falla"], scenario, reset=60)
+    assert client.breaker.state == "abierto"
+    assert client.breaker.rejected == 1
+
+
+def test_half_open_trial_closes_or_reopens(stubs):
+    async def scenario(client):
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await client.infer("texto")
+        await asyncio.sleep(0.25)
+        assert client.breaker.state == "semiabierto"
+        # La prueba falla: el circuito vuelve a abrirse
+        with pytest.raises(Exception, match="Hugging Face"):
+            await client.infer("texto")
+        assert client.breaker.state == "abierto"
+        await asyncio.sleep(0.25)
+        # La prueba funciona: el circuito se cierra
+        client.url = stubs["sano"]
+        assert await client.infer("UNO DOS CUATRO") == [{"entity": "MISC", "word": "CUATRO", "score": 0.9}]
+        assert client.breaker.state == "cerrado"
+        assert client.breaker.failures == 0
+
+    run_with_client(stubs["falla"], scenario)
+
+
+def test_cancelled_trial_does_not_block_the_breaker(stubs):
+    async def scenario(client):
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await client.infer("texto")
+        await asyncio.sleep(0.25)
+        client.url = stubs["cuelga"]
+        trial = asyncio.ensure_future(client.infer("texto"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(CircuitOpenError):
+            await client.infer("texto")  # solo hay una llamada de prueba a la vez
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # La prueba cancelada no cuenta como fallo y deja probar de nuevo
+        assert client.breaker.state == "semiabierto"
+        client.url = stubs["sano"]
+        await client.infer("texto")
+        assert client.breaker.state == "cerrado"
+
+    run_with_client(stubs["falla"], scenario)
+
+
+def test_stale_failure_does_not_free_the_trial(stubs):
+    async def scenario(client):
+        # Empieza con el circuito cerrado y falla (por tiempo) con la prueba ya en curso
+        client.url = stubs["cuelga"]
+        stale = asyncio.ensure_future(client.infer("texto"))
+        await asyncio.sleep(0.05)
+        client.url = stubs["falla"]
+        for _ in range(2):
+            with pytest.raises(Exception, match="Hugging Face"):
+                await client.infer("texto")
+        await asyncio.sleep(0.35)
+        client.url = stubs["cuelga"]
+        trial = asyncio.ensure_future(client.infer("texto"))
+        with pytest.raises(httpx.ReadTimeout):
+            await stale
+        assert client.breaker.trial_in_flight
+        with pytest.raises(CircuitOpenError):
+            await client.infer("texto")  # la prueba sigue en curso
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    client = run_with_client(stubs["falla"], scenario, reset=0.3, read_timeout=1.0)
+    assert client.breaker.failures == 2
+
+
+def test_stale_success_does_not_close_the_circuit(stubs):
+    async def scenario(client):
+        client.url = stubs["lento"]
+        stale = asyncio.ensure_future(client.infer("texto"))
+        await asyncio.sleep(0.05)
+        client.url = stubs["falla"]
+        for _ in range(2):
+            with pytest.raises(Exception, match="Hugging Face"):
+                await client.infer("texto")
+        assert client.breaker.state == "abierto"
+        # Responde bien una llamada anterior a la apertura: el circuito sigue abierto
+        await stale
+        assert client.breaker.state == "abierto"
+        assert client.breaker.failures == 2
+
+    run_with_client(stubs["falla"], scenario, reset=60)
+
+
+def test_rules_fallback_and_breaker_state_in_health(client, stubs, monkeypatch):
+    monkeypatch.setattr(main.inference_client, "url", stubs["falla"])
+    monkeypatch.setattr(main.inference_client, "breaker", CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    assert client.get("/api/health").json()["inferencia"]["circuito"]["estado"] == "cerrado"
+
+    fallbacks = analysis_total.value("reglas")
+    response = client.post("/api/extract-text",
+                           files={"file": ("informe.pdf", report_pdf(generate_report(7)), "application/pdf")})
+    assert response.status_code == 200
+    assert response.json()["info_paciente"]["nombre"]  # extraído por las reglas
+    assert analysis_total.value("reglas") == fallbacks + 1
+
+    circuit = client.get("/api/health").json()["inferencia"]["circuito"]
+    assert circuit["estado"] == "abierto"
+    assert circuit["fallos_seguidos"] == 1
+
+
+def run_batcher(url, scenario, window_ms=50, max_batch=8):
+    """Ejecuta `scenario(batcher, payloads)`; `payloads` recoge lo que se envía al modelo."""
+    client = InferenceClient(url, "", breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60))
+    batcher = InferenceBatcher(client, window_ms=window_ms, max_batch=max_batch)
+    payloads = []
+    infer = client.infer
+
+    async def recorded(payload):
+        payloads.append(payload)
+        return await infer(payload)
+
+    client.infer = recorded
+
+    async def wrapper():
+        try:
+            await scenario(batcher, payloads)
+        finally:
+            await batcher.close()
+            await client.close()
+
+    asyncio.run(wrapper())
+    return batcher
+
+
+TEXTS = ["GLUCOSA alta", "UREA normal", "HEMOGLOBINA baja"]
+
+
+def test_batch_results_go_to_their_callers(stubs):
+    async def scenario(batcher, payloads):
+        results = await asyncio.gather(*(batcher.infer(text) for text in TEXTS))
+        assert results == [fake_entities(text) for text in TEXTS]
+        assert payloads == [TEXTS]
+
+    batcher = run_batcher(stubs["sano"], scenario)
+    assert batcher.batches == 1
+    assert batcher.max_size == 3
+
+
+def test_single_text_is_sent_alone(stubs):
+    async def scenario(batcher, payloads):
+        assert await batcher.infer(TEXTS[0]) == fake_entities(TEXTS[0])
+        assert payloads == [TEXTS[0]]
+
+    run_batcher(stubs["sano"], scenario)
+
+
+def test_batch_failure_reaches_every_caller(stubs):
+    async def scenario(batcher, payloads):
+        results = await asyncio.gather(*(batcher.infer(text) for text in TEXTS), return_exceptions=True)
+        assert all(isinstance(result, Exception) and "Hugging Face" in str(result) for result in results)
+        assert len(payloads) == 1
+
+    batcher = run_batcher(stubs["falla"], scenario)
+    assert batcher.failed_batches == 1
+    assert batcher.client.breaker.failures == 1
+
+
+def test_cancelled_caller_does_not_poison_the_batch(stubs):
+    async def scenario(batcher, payloads):
+        # Cancelada mientras espera la ventana: no se envía
+        waiting = [asyncio.ensure_future(batcher.infer(text)) for text in TEXTS]
+        await asyncio.sleep(0.01)
+        waiting[1].cancel()
+        assert await waiting[0] == fake_entities(TEXTS[0])
+        assert await waiting[2] == fake_entities(TEXTS[2])
+        assert payloads == [[TEXTS[0], TEXTS[2]]]
+
+        # Cancelada con el lote ya enviado: las demás reciben su resultado
+        sent = [asyncio.ensure_future(batcher.infer(text)) for text in TEXTS]
+        await asyncio.sleep(0.2)
+        assert len(payloads) == 2
+        sent[0].cancel()
+        assert await sent[1] == fake_entities(TEXTS[1])
+        assert await sent[2] == fake_entities(TEXTS[2])
+        with pytest.raises(asyncio.CancelledError):
+            await sent[0]
+
+    batcher = run_batcher(stubs["lento"], scenario)
+    assert batcher.failed_batches == 0
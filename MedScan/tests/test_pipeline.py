@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_ingest_does_not_load_the_server():
+    # Los procesos de trabajo de la ingesta importan este módulo: no deben crear la aplicación
+    code = (
+        "import sys, backend.ingest; "
+        "print(sorted(m for m in ('backend.main', 'fastapi', 'httpx', 'backend.cache', 'backend.history')"
+        " if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
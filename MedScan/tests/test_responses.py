@@ -0,0 +1,29 @@
+import json
+
+from backend.responses import COLUMNAS, MODO_LIGERO, ExamResult, dumps, render
+
+RESPONSE = {
+    "texto_original": "Glucosa 95 mg/dL",
+    "titulo_examen": "",
+    "datos_estructurados": [ExamResult("QUÍMICA", "Glucosa", 95.0, "mg/dL", 70.0, 100.0)],
+}
+
+
+def test_results_stay_compact_until_rendered():
+    full = json.loads(dumps(render(RESPONSE)))
+    assert full["datos_estructurados"] == [{
+        "categoria": "QUÍMICA", "examen": "Glucosa", "valor": "95.0", "unidad": "mg/dL",
+        "rango_referencia": {"min": 70.0, "max": 100.0},
+    }]
+    lean = json.loads(dumps(render(RESPONSE, MODO_LIGERO)))
+    assert "texto_original" not in lean
+    assert lean["columnas"] == list(COLUMNAS)
+    assert lean["datos_estructurados"] == [["QUÍMICA", "Glucosa", 95.0, "mg/dL", 70.0, 100.0]]
+    assert isinstance(RESPONSE["datos_estructurados"][0], ExamResult)
+
+
+def test_results_read_back_from_the_persistent_cache():
+    # La caché en SQLite guarda los resultados como listas
+    cached = json.loads(json.dumps(RESPONSE))
+    assert render(cached) == render(RESPONSE)
+    assert render(cached, MODO_LIGERO) == render(RESPONSE, MODO_LIGERO)
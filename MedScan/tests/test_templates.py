@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from backend.templates import TemplateRegistry
+from benchmarks.reports import FORMATOS, generate_lab_report
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "plantillas.json")
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return TemplateRegistry.from_file(TEMPLATES)
+
+
+@pytest.mark.parametrize("lab", FORMATOS)
+def test_table_start_ignores_earlier_mentions(registry, lab):
+    text, count = generate_lab_report(3, lab, "pequeno")
+    lines = text.split("\n")
+    # Menciones de "examen" en el encabezado, antes de la tabla y de los campos del paciente
+    lines[2:2] = ["Examen solicitado: perfil completo", "EXAMEN DE CONTROL"]
+    result = registry.extract("\n".join(lines))
+    assert result is not None
+    assert len(result["datos_estructurados"]) == count
+    assert result["info_paciente"]["nombre"]
+    assert result["info_paciente"]["id"]
@@ -0,0 +1,35 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from backend import main
+
+
+def read(data: bytes, size=None):
+    return asyncio.run(main.read_upload(UploadFile(io.BytesIO(data), size=size)))
+
+
+@pytest.mark.parametrize("known_size", [True, False])
+def test_upload_is_read_into_one_buffer(known_size, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 1000)
+    data = bytes(range(256)) * 20
+    contents = read(data, len(data) if known_size else None)
+    assert isinstance(contents, bytearray)
+    assert contents == data
+
+
+def test_upload_shorter_than_announced_is_trimmed():
+    assert read(b"abc", 10) == b"abc"
+
+
+@pytest.mark.parametrize("known_size", [True, False])
+def test_upload_over_the_limit_is_rejected(known_size, monkeypatch):
+    monkeypatch.setattr(main, "MAX_FILE_SIZE", 100)
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 30)
+    data = b"x" * 101
+    with pytest.raises(HTTPException) as error:
+        read(data, len(data) if known_size else None)
+    assert error.value.status_code == 413